@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 """
 Script para Gerar Gráficos Comparativos - Tema B
-Lê o relatório JSON e gera gráficos de comparação de formatos
+Lê o relatório JSON (ou uma execução do histórico SQLite) e gera gráficos de
+comparação de formatos. Consome a seção `resumo` do esquema versionado do
+relatório (ver scripts/historico_resultados.py).
+
+Uso:
+    python gerar_graficos_tema_b.py              # última execução (JSON)
+    python gerar_graficos_tema_b.py --execucao 7 # execução 7 do histórico
 """
 
+import argparse
 import json
+import sqlite3
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
@@ -19,31 +27,61 @@ plt.rcParams['font.size'] = 10
 BASE_DIR = Path("/workspace") if Path("/workspace").exists() else Path("/app")
 OUTPUT_DIR = BASE_DIR / "output"
 RELATORIO_PATH = OUTPUT_DIR / "relatorio_comparativo.json"
+HISTORICO_PATH = OUTPUT_DIR / "historico.sqlite"
 
-def carregar_relatorio():
-    """Carrega o relatório JSON gerado pela análise"""
-    print(f"📂 Carregando relatório: {RELATORIO_PATH}")
-    
-    if not RELATORIO_PATH.exists():
-        print(f"❌ Erro: Relatório não encontrado em {RELATORIO_PATH}")
-        print("   Execute primeiro: ./run.sh full")
+# Versão do esquema do relatório lida por este script
+VERSAO_ESQUEMA = 2
+
+# Cor fixa por formato (mesma cor em todos os gráficos)
+CORES_FORMATOS = {'CSV': '#e74c3c', 'JSON': '#f39c12', 'Parquet': '#3498db', 'ORC': '#2ecc71',
+                  'Arrow': '#9b59b6'}
+
+def cores(formatos):
+    """Cores dos formatos, na ordem informada"""
+    return [CORES_FORMATOS.get(f, '#95a5a6') for f in formatos]
+
+def carregar_relatorio(execucao_id=None):
+    """Carrega o relatório JSON gerado pela análise, ou uma execução do histórico"""
+    if execucao_id is None:
+        print(f"📂 Carregando relatório: {RELATORIO_PATH}")
+        if not RELATORIO_PATH.exists():
+            print(f"❌ Erro: Relatório não encontrado em {RELATORIO_PATH}")
+            print("   Execute primeiro: ./run.sh full")
+            sys.exit(1)
+        with open(RELATORIO_PATH, 'r') as f:
+            dados = json.load(f)
+    else:
+        print(f"📂 Carregando execução {execucao_id} do histórico: {HISTORICO_PATH}")
+        linha = None
+        if HISTORICO_PATH.exists():
+            conexao = sqlite3.connect(str(HISTORICO_PATH))
+            try:
+                linha = conexao.execute("SELECT relatorio FROM execucoes WHERE id = ?",
+                                        (execucao_id,)).fetchone()
+            finally:
+                conexao.close()
+        if linha is None:
+            print(f"❌ Erro: Execução {execucao_id} não encontrada em {HISTORICO_PATH}")
+            sys.exit(1)
+        dados = json.loads(linha[0])
+        dados['metadata']['execucao_id'] = execucao_id
+    
+    versao = dados.get('versao_esquema', 1)
+    if versao != VERSAO_ESQUEMA:
+        print(f"❌ Erro: Relatório no esquema v{versao}; este script lê o esquema v{VERSAO_ESQUEMA}")
+        print("   Execute novamente a análise: ./run.sh exec")
         sys.exit(1)
-    
-    with open(RELATORIO_PATH, 'r') as f:
-        return json.load(f)
+    return dados
 
 def gerar_grafico_tamanho(dados):
     """Gera gráfico de comparação de tamanho em disco"""
     print("📊 Gerando gráfico de tamanho em disco...")
     
-    formatos = list(dados['comparativo_tamanho'].keys())
-    tamanhos_mb = [dados['comparativo_tamanho'][f]['tamanho_mb'] for f in formatos]
-    
-    # Cores para cada formato
-    cores = ['#e74c3c', '#f39c12', '#3498db', '#2ecc71']
+    formatos = list(dados['resumo'].keys())
+    tamanhos_mb = [dados['resumo'][f]['tamanho_mb'] for f in formatos]
     
     fig, ax = plt.subplots(figsize=(10, 6))
-    bars = ax.bar(formatos, tamanhos_mb, color=cores, alpha=0.8, edgecolor='black')
+    bars = ax.bar(formatos, tamanhos_mb, color=cores(formatos), alpha=0.8, edgecolor='black')
     
     # Adicionar valores em cima das barras
     for bar, tamanho in zip(bars, tamanhos_mb):
@@ -70,12 +108,12 @@ def gerar_grafico_performance(dados):
     """Gera gráfico de comparação de performance de leitura"""
     print("📊 Gerando gráfico de performance de leitura...")
     
-    formatos = list(dados['comparativo_performance'].keys())
+    formatos = list(dados['resumo'].keys())
     
-    # Extrair tempos de leitura
-    tempo_leitura = [dados['comparativo_performance'][f]['tempo_leitura_segundos'] for f in formatos]
-    tempo_filtro = [dados['comparativo_performance'][f]['tempo_query_filtro_segundos'] for f in formatos]
-    tempo_agregacao = [dados['comparativo_performance'][f]['tempo_query_agregacao_segundos'] for f in formatos]
+    # Extrair medianas de leitura, filtro e agregação
+    tempo_leitura = [dados['resumo'][f]['leitura_s'] for f in formatos]
+    tempo_filtro = [dados['resumo'][f]['filtro_s'] for f in formatos]
+    tempo_agregacao = [dados['resumo'][f]['agregacao_s'] for f in formatos]
     
     # Configurar gráfico de barras agrupadas
     x = range(len(formatos))
@@ -95,7 +133,7 @@ def gerar_grafico_performance(dados):
         for bar in bars:
             height = bar.get_height()
             ax.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{height:.1f}s',
+                    f'{height:.2f}s',
                     ha='center', va='bottom', fontsize=9)
     
     ax.set_xlabel('Formato de Arquivo', fontsize=12, fontweight='bold')
@@ -119,14 +157,14 @@ def gerar_grafico_reducao(dados):
     """Gera gráfico de redução percentual em relação ao CSV"""
     print("📊 Gerando gráfico de redução de tamanho...")
     
-    formatos = list(dados['comparativo_tamanho'].keys())
-    reducoes = [dados['comparativo_tamanho'][f]['reducao_percentual'] for f in formatos]
+    formatos = list(dados['resumo'].keys())
+    reducoes = [dados['resumo'][f]['reducao_percentual'] for f in formatos]
     
     # Cores: vermelho para aumento, verde para redução
-    cores = ['#e74c3c' if r < 0 else '#2ecc71' for r in reducoes]
+    cores_barras = ['#e74c3c' if r < 0 else '#2ecc71' for r in reducoes]
     
     fig, ax = plt.subplots(figsize=(10, 6))
-    bars = ax.barh(formatos, reducoes, color=cores, alpha=0.8, edgecolor='black')
+    bars = ax.barh(formatos, reducoes, color=cores_barras, alpha=0.8, edgecolor='black')
     
     # Adicionar valores nas barras
     for bar, reducao in zip(bars, reducoes):
@@ -156,18 +194,14 @@ def gerar_grafico_speedup(dados):
     """Gera gráfico de speedup em relação ao CSV"""
     print("📊 Gerando gráfico de speedup...")
     
-    formatos = list(dados['comparativo_performance'].keys())
+    formatos = list(dados['resumo'].keys())
     
     # Calcular speedup (quanto mais rápido em relação ao CSV)
-    tempo_csv = dados['comparativo_performance']['CSV']['tempo_leitura_segundos']
-    speedups = [tempo_csv / dados['comparativo_performance'][f]['tempo_leitura_segundos'] 
-                for f in formatos]
-    
-    # Cores
-    cores = ['#e74c3c', '#f39c12', '#3498db', '#2ecc71']
+    tempo_csv = dados['resumo']['CSV']['leitura_s']
+    speedups = [tempo_csv / dados['resumo'][f]['leitura_s'] for f in formatos]
     
     fig, ax = plt.subplots(figsize=(10, 6))
-    bars = ax.bar(formatos, speedups, color=cores, alpha=0.8, edgecolor='black')
+    bars = ax.bar(formatos, speedups, color=cores(formatos), alpha=0.8, edgecolor='black')
     
     # Adicionar valores em cima das barras
     for bar, speedup in zip(bars, speedups):
@@ -192,6 +226,52 @@ def gerar_grafico_speedup(dados):
     print(f"✅ Gráfico salvo: {output_path}")
     plt.close()
 
+def gerar_grafico_motores(dados):
+    """Gera gráfico de latência e pico de memória por motor de consulta"""
+    print("📊 Gerando gráfico de motores de consulta...")
+    
+    formatos = [f for f, r in dados['formatos'].items() if 'motores' in r]
+    motores = []
+    for f in formatos:
+        for motor, m in dados['formatos'][f]['motores'].items():
+            if 'erro' not in m and motor not in motores:
+                motores.append(motor)
+    
+    fig, (ax_tempo, ax_memoria) = plt.subplots(1, 2, figsize=(16, 6))
+    x = range(len(formatos))
+    width = 0.8 / len(motores)
+    cores_motores = sns.color_palette("Set2", len(motores))
+    
+    for i, motor in enumerate(motores):
+        tempos, picos = [], []
+        for f in formatos:
+            m = dados['formatos'][f]['motores'].get(motor, {})
+            agregacao = m.get('queries', {}).get('agregacao')
+            tempos.append(agregacao['total']['mediana'] if agregacao else 0)
+            picos.append((m.get('memoria_pico_bytes') or 0) / 1024**2)
+        posicoes = [j - 0.4 + width * (i + 0.5) for j in x]
+        ax_tempo.bar(posicoes, tempos, width, label=motor, color=cores_motores[i], alpha=0.8, edgecolor='black')
+        ax_memoria.bar(posicoes, picos, width, label=motor, color=cores_motores[i], alpha=0.8, edgecolor='black')
+    
+    ax_tempo.set_ylabel('Mediana da Agregação (segundos)', fontsize=12, fontweight='bold')
+    ax_tempo.set_title('Latência por Motor', fontsize=14, fontweight='bold')
+    ax_memoria.set_ylabel('Pico de Memória Residente (MB)', fontsize=12, fontweight='bold')
+    ax_memoria.set_title('Memória por Motor', fontsize=14, fontweight='bold')
+    for ax in (ax_tempo, ax_memoria):
+        ax.set_xlabel('Formato de Arquivo', fontsize=12, fontweight='bold')
+        ax.set_xticks(x)
+        ax.set_xticklabels(formatos)
+        ax.legend(loc='upper right', fontsize=10)
+        ax.grid(axis='y', alpha=0.3)
+    
+    plt.tight_layout()
+    
+    # Salvar
+    output_path = OUTPUT_DIR / "grafico_motores.png"
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    print(f"✅ Gráfico salvo: {output_path}")
+    plt.close()
+
 def main():
     """Função principal"""
     print("=" * 80)
@@ -199,11 +279,19 @@ def main():
     print("=" * 80)
     print()
     
+    parser = argparse.ArgumentParser(description="Gera os gráficos comparativos do Tema B")
+    parser.add_argument("--execucao", type=int, metavar="ID",
+                        help="Execução do histórico (output/historico.sqlite) em vez do último relatório")
+    args = parser.parse_args()
+    
     # Carregar dados
-    dados = carregar_relatorio()
-    print(f"✅ Relatório carregado com sucesso!")
+    dados = carregar_relatorio(args.execucao)
+    print(f"✅ Relatório carregado com sucesso! (esquema v{dados['versao_esquema']})")
     print(f"   Data da análise: {dados['metadata']['data_execucao']}")
-    print(f"   Total de registros: {dados['metadata']['total_registros']:,}")
+    if dados['metadata'].get('execucao_id') is not None:
+        print(f"   Execução no histórico: #{dados['metadata']['execucao_id']}")
+    if dados['metadata'].get('total_registros') is not None:
+        print(f"   Total de registros: {dados['metadata']['total_registros']:,}")
     print()
     
     # Criar diretório de saída se não existir
@@ -215,8 +303,11 @@ def main():
     
     gerar_grafico_tamanho(dados)
     gerar_grafico_performance(dados)
-    gerar_grafico_reducao(dados)
-    gerar_grafico_speedup(dados)
+    if 'CSV' in dados['resumo']:
+        gerar_grafico_reducao(dados)
+        gerar_grafico_speedup(dados)
+    if any('motores' in r for r in dados.get('formatos', {}).values()):
+        gerar_grafico_motores(dados)
     
     print()
     print("=" * 80)
@@ -230,6 +321,7 @@ def main():
     print("  2. grafico_performance_leitura.png")
     print("  3. grafico_reducao_tamanho.png")
     print("  4. grafico_speedup.png")
+    print("  5. grafico_motores.png (se houver comparação de motores)")
     print()
     print("💡 Dica: Você pode baixar os gráficos clicando com o botão direito")
     print("         nos arquivos no explorador do VS Code e selecionando 'Download'")
@@ -91,10 +91,21 @@ exec_analysis() {
     
     if [ "$ENVIRONMENT" = "codespaces" ]; then
         # No Codespaces, executar diretamente
-        python3 ${WORKSPACE_DIR}/scripts/tema_b_otimizacao_docker.py
+        python3 ${WORKSPACE_DIR}/scripts/tema_b_otimizacao_docker.py "$@"
     else
         # No Docker local, executar via docker-compose
-        docker-compose exec spark-tema-b python3 /app/scripts/tema_b_otimizacao_docker.py
+        docker-compose exec spark-tema-b python3 /app/scripts/tema_b_otimizacao_docker.py "$@"
+    fi
+}
+
+# Consultar o histórico de execuções (listar / comparar)
+history() {
+    print_info "Consultando histórico de execuções..."
+    
+    if [ "$ENVIRONMENT" = "codespaces" ]; then
+        python3 ${WORKSPACE_DIR}/scripts/historico_resultados.py "$@"
+    else
+        docker-compose exec spark-tema-b python3 /app/scripts/historico_resultados.py "$@"
     fi
 }
 
@@ -123,7 +134,7 @@ clean() {
         fi
         
         # Limpar dados gerados (manter dataset original)
-        rm -rf ${WORKSPACE_DIR}/data/csv ${WORKSPACE_DIR}/data/json ${WORKSPACE_DIR}/data/parquet ${WORKSPACE_DIR}/data/orc 2>/dev/null || true
+        rm -rf ${WORKSPACE_DIR}/data/csv ${WORKSPACE_DIR}/data/json ${WORKSPACE_DIR}/data/parquet ${WORKSPACE_DIR}/data/orc ${WORKSPACE_DIR}/data/snapshot ${WORKSPACE_DIR}/data/layouts ${WORKSPACE_DIR}/data/codecs ${WORKSPACE_DIR}/data/particionado ${WORKSPACE_DIR}/data/clusterizado ${WORKSPACE_DIR}/data/bloom ${WORKSPACE_DIR}/data/escala ${WORKSPACE_DIR}/data/ciclo_vida ${WORKSPACE_DIR}/data/ciclo_vida_base ${WORKSPACE_DIR}/data/streaming ${WORKSPACE_DIR}/data/rollups ${WORKSPACE_DIR}/data/compacto 2>/dev/null || true
         rm -f ${WORKSPACE_DIR}/output/* 2>/dev/null || true
         
         print_info "Ambiente limpo!"
@@ -173,8 +184,11 @@ show_help() {
 Uso: ./run.sh [opção]
 
 Opções:
-  exec        Executa a análise principal (recomendado)
+  exec [modo] Executa a análise principal (recomendado)
+              Modos: completo (padrão), layout, codecs, particoes, clusterizacao, bloom, escala, ciclo_vida, ingestao, compactacao, autoajuste, cache, rollups, esquema_compacto
   full        Executa pipeline completo
+  historico [listar|comparar [BASE NOVA]]
+              Lista execuções registradas ou compara duas (regressões significativas)
   clean       Remove dados gerados (mantém dataset original)
   help        Exibe esta mensagem de ajuda
 
@@ -187,7 +201,24 @@ ${YELLOW}Opções específicas para Docker local:${NC}
 
 Exemplos:
   ./run.sh exec           # Executa apenas a análise
+  ./run.sh exec layout    # Varredura de layout de arquivos
+  ./run.sh exec codecs    # Matriz de codecs de compressão
+  ./run.sh exec particoes # Particionamento e poda de partições
+  ./run.sh exec clusterizacao # Clusterização e blocos pulados
+  ./run.sh exec bloom     # Bloom filters e consultas pontuais
+  ./run.sh exec escala    # Varredura de escala e curvas de vazão
+  ./run.sh exec ciclo_vida # Camadas Hot/Warm/Cold e roteamento
+  ./run.sh exec ingestao  # Ingestão contínua por micro-batches
+  ./run.sh exec compactacao # Compactação de arquivos pequenos
+  ./run.sh exec autoajuste --busca halving # Autoajuste de configurações do Spark
+  ./run.sh exec cache     # Cache por nível de armazenamento x leitura em disco
+  ./run.sh exec rollups   # Rollups incrementais x consultas nos dados brutos
+  ./run.sh exec esquema_compacto --valor float32,decimal # Esquema físico compacto x atual
+  ./run.sh exec --servidor  # Sobe a sessão Spark quente (mantém a JVM aberta)
+  ./run.sh exec layout --remoto # Executa na sessão quente, sem partida a frio
+  ./run.sh exec --parar-servidor # Encerra a sessão quente
   ./run.sh full           # Executa tudo automaticamente
+  ./run.sh historico comparar # Última execução vs anterior
   ./run.sh clean          # Limpa dados gerados
 
 ${BLUE}Ambiente detectado: ${ENVIRONMENT}${NC}
@@ -207,7 +238,7 @@ main() {
             start
             ;;
         exec)
-            exec_analysis
+            exec_analysis "${@:2}"
             ;;
         stop)
             stop
@@ -224,6 +255,9 @@ main() {
         full)
             full_run
             ;;
+        historico)
+            history "${@:2}"
+            ;;
         help|*)
             show_help
             ;;
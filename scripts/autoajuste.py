@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+AUTOAJUSTE DE CONFIGURAÇÕES DO SPARK - TEMA B
+================================================================================
+
+Busca, num espaço de parâmetros SQL do Spark (chave -> valores candidatos),
+a configuração de menor custo para um workload. O custo de uma configuração
+é calculado por uma função `avaliar(config, rodadas)` fornecida por quem
+chama (no script principal: soma das medianas das queries de um formato).
+
+Estratégias:
+
+- grade: todas as combinações do espaço, cada uma com `rodadas` medidas
+- aleatoria: `amostras` combinações sorteadas (sem repetição)
+- halving: successive halving sobre `amostras` combinações sorteadas;
+  todas começam com 1 rodada, e a cada etapa só a fração 1/`eta` de menor
+  custo segue, com `eta` vezes mais rodadas, até restar uma ou atingir
+  `rodadas`
+
+Os parâmetros são configurações de sessão (spark.conf.set): são aplicados
+antes de cada avaliação e os valores anteriores restaurados depois.
+
+================================================================================
+"""
+
+import itertools
+import math
+import random
+
+
+ESTRATEGIAS = ('grade', 'aleatoria', 'halving')
+
+
+# ============================================================================
+# CONFIGURAÇÃO DA SESSÃO
+# ============================================================================
+
+def valor_efetivo(spark, chave):
+    """
+    Valor em vigor na sessão para a chave: o definido ou, se nunca foi
+    definido, o padrão do Spark. None se a chave não tem padrão conhecido.
+    """
+    try:
+        return spark.conf.get(chave)
+    except Exception:
+        pass
+    try:
+        return spark._jsparkSession.sessionState().conf().getConfString(chave)
+    except Exception:
+        return None
+
+
+def configuracao_atual(spark, chaves):
+    """Valores em vigor na sessão para as chaves (padrões do Spark incluídos)."""
+    return {chave: valor_efetivo(spark, chave) for chave in chaves}
+
+
+def configuracao_definida(spark, chaves):
+    """Valores definidos explicitamente na sessão (None se não definidos)."""
+    return {chave: spark.conf.get(chave, None) for chave in chaves}
+
+
+def aplicar_configuracao(spark, config):
+    """
+    Aplica `config` à sessão e retorna os valores definidos antes (None
+    para chaves que estavam no padrão, restauradas com unset).
+    """
+    anteriores = configuracao_definida(spark, config)
+    for chave, valor in config.items():
+        spark.conf.set(chave, str(valor))
+    return anteriores
+
+
+def restaurar_configuracao(spark, anteriores):
+    """Restaura os valores retornados por `aplicar_configuracao`."""
+    for chave, valor in anteriores.items():
+        if valor is None:
+            spark.conf.unset(chave)
+        else:
+            spark.conf.set(chave, valor)
+
+
+# ============================================================================
+# CANDIDATOS
+# ============================================================================
+
+def tamanho_espaco(espaco):
+    """Número de combinações do espaço."""
+    return math.prod(len(valores) for valores in espaco.values())
+
+
+def candidatos_grade(espaco):
+    """Todas as combinações do espaço, em ordem."""
+    chaves = list(espaco)
+    return [dict(zip(chaves, valores)) for valores in itertools.product(*espaco.values())]
+
+
+def candidatos_aleatorios(espaco, amostras, seed):
+    """`amostras` combinações distintas sorteadas (todas, se o espaço for menor)."""
+    total = tamanho_espaco(espaco)
+    if amostras >= total:
+        return candidatos_grade(espaco)
+    rng = random.Random(seed)
+    chaves = list(espaco)
+    sorteados = {}
+    while len(sorteados) < amostras:
+        valores = tuple(rng.choice(espaco[chave]) for chave in chaves)
+        sorteados.setdefault(valores, dict(zip(chaves, valores)))
+    return list(sorteados.values())
+
+
+# ============================================================================
+# BUSCA
+# ============================================================================
+
+def _avaliar_todos(candidatos, avaliar, rodadas, etapa, historico):
+    custos = []
+    for i, config in enumerate(candidatos, 1):
+        custo = avaliar(config, rodadas)
+        historico.append({'etapa': etapa, 'rodadas': rodadas, 'config': config, 'custo': custo})
+        print(f"    [{etapa}] {i}/{len(candidatos)} ({rodadas} rodadas): {custo:.3f}s")
+        custos.append((custo, i, config))
+    return sorted(custos, key=lambda c: (c[0], c[1]))
+
+
+def meia_reducao(candidatos, avaliar, rodadas_max, eta):
+    """
+    Successive halving. Retorna (melhor config, custo com mais rodadas,
+    histórico de avaliações).
+    """
+    historico = []
+    rodadas, etapa = 1, 0
+    while True:
+        ordenados = _avaliar_todos(candidatos, avaliar, rodadas, etapa, historico)
+        if len(ordenados) == 1 or rodadas >= rodadas_max:
+            custo, _, melhor = ordenados[0]
+            return melhor, custo, historico
+        candidatos = [config for _, _, config in ordenados[:max(1, math.ceil(len(ordenados) / eta))]]
+        rodadas, etapa = min(rodadas_max, rodadas * eta), etapa + 1
+
+
+def buscar(espaco, avaliar, estrategia='halving', amostras=16, rodadas=3, eta=2, seed=42):
+    """
+    Busca a configuração de menor custo no espaço pela estratégia
+    informada. Retorna (melhor config, custo, histórico de avaliações).
+    """
+    if estrategia == 'halving':
+        return meia_reducao(candidatos_aleatorios(espaco, amostras, seed), avaliar, rodadas, eta)
+    if estrategia == 'grade':
+        candidatos = candidatos_grade(espaco)
+    elif estrategia == 'aleatoria':
+        candidatos = candidatos_aleatorios(espaco, amostras, seed)
+    else:
+        raise ValueError(f"Estratégia desconhecida: {estrategia} (disponíveis: {', '.join(ESTRATEGIAS)})")
+    historico = []
+    custo, _, melhor = _avaliar_todos(candidatos, avaliar, rodadas, 0, historico)[0]
+    return melhor, custo, historico
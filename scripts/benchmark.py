@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+HARNESS DE BENCHMARK - TEMA B
+================================================================================
+
+Funções de medição e estatística usadas por `analisar_performance`.
+
+Cada medição separa:
+- Planejamento: construção do DataFrame (listagem de arquivos, resolução de
+  schema) + otimização do plano físico
+- Execução: a ação propriamente dita (scan, filtro, agregação)
+
+Os tempos são coletados com `time.perf_counter_ns()` após rodadas de
+aquecimento (warm-up), e resumidos por mediana, p95, desvio padrão e
+intervalo de confiança (bootstrap) da mediana.
+
+A última rodada medida de cada query roda num job group próprio, e suas
+métricas do lado do Spark (stages, tasks, CPU, GC, shuffle, registros lidos)
+são lidas da API REST de monitoramento da sessão local, junto com o plano
+físico executado (filtros empurrados e schema de leitura dos scans).
+
+================================================================================
+"""
+
+import itertools
+import json
+import math
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+
+
+NS_POR_SEGUNDO = 1_000_000_000
+
+# Parâmetros estatísticos
+NIVEL_CONFIANCA = 0.95
+NUM_REAMOSTRAGENS = 2000
+NIVEL_SIGNIFICANCIA = 0.05
+SEED_ESTATISTICA = 42
+
+# Métricas do Spark (API REST da UI)
+TEMPO_MAXIMO_METRICAS = 5.0    # Espera máxima (s) pelo listener bus após a query
+INTERVALO_CONSULTA_METRICAS = 0.05
+TIMEOUT_REST = 5.0
+
+_grupos_benchmark = itertools.count()
+
+
+# ============================================================================
+# MEDIÇÃO
+# ============================================================================
+
+def forcar_planejamento(df):
+    """
+    Força análise, otimização e geração do plano físico sem executar a query.
+    """
+    df._jdf.queryExecution().executedPlan()
+
+
+def _seq(seq_scala):
+    """Converte uma Seq Scala (via py4j) em lista Python."""
+    return [seq_scala.apply(i) for i in range(seq_scala.size())]
+
+
+def plano_final(df):
+    """
+    Plano físico efetivamente executado. Com AQE, desembrulha o
+    AdaptiveSparkPlanExec para o plano final (após a execução).
+    """
+    plano = df._jdf.queryExecution().executedPlan()
+    if plano.getClass().getSimpleName() == "AdaptiveSparkPlanExec":
+        plano = plano.executedPlan()
+    return plano
+
+
+def nos_do_plano(plano):
+    """
+    Percorre todos os nós do plano físico, incluindo os planos internos
+    de query stages do AQE e exchanges reutilizados.
+    """
+    pilha = [plano]
+    while pilha:
+        no = pilha.pop()
+        yield no
+        nome = no.getClass().getSimpleName()
+        if nome == "AdaptiveSparkPlanExec":
+            pilha.append(no.executedPlan())
+        elif nome.endswith("QueryStageExec"):
+            pilha.append(no.plan())
+        else:
+            pilha.extend(_seq(no.children()))
+
+
+def metrica(no, nome):
+    """Valor de uma SQLMetric do nó, ou 0 se não existir."""
+    opcao = no.metrics().get(nome)
+    return opcao.get().value() if opcao.isDefined() else 0
+
+
+def metricas_scan(df):
+    """
+    Arquivos, bytes e partições efetivamente lidos pelos scans de arquivo
+    de uma query já executada (métricas do FileSourceScanExec).
+    """
+    resultado = {'arquivos_lidos': 0, 'bytes_lidos': 0, 'particoes_lidas': 0, 'linhas_saida_scan': 0}
+    for no in nos_do_plano(plano_final(df)):
+        if no.getClass().getSimpleName() == "FileSourceScanExec":
+            resultado['arquivos_lidos'] += metrica(no, "numFiles")
+            resultado['bytes_lidos'] += metrica(no, "filesSize")
+            resultado['particoes_lidas'] += metrica(no, "numPartitions")
+            resultado['linhas_saida_scan'] += metrica(no, "numOutputRows")
+    return resultado
+
+
+def _opcao(opcao_scala):
+    """Valor de uma Option Scala (via py4j), ou None."""
+    return opcao_scala.get() if opcao_scala.isDefined() else None
+
+
+def plano_fisico(df):
+    """
+    Plano físico executado (texto) e, para cada scan de arquivo, o formato,
+    os filtros empurrados para o leitor, os filtros de partição e de dados
+    e o schema efetivamente lido (projection pushdown).
+    """
+    plano = plano_final(df)
+    scans = []
+    for no in nos_do_plano(plano):
+        if no.getClass().getSimpleName() == "FileSourceScanExec":
+            metadados = no.metadata()
+            scans.append({
+                'formato': _opcao(metadados.get("Format")),
+                'filtros_empurrados': _opcao(metadados.get("PushedFilters")),
+                'filtros_particao': _opcao(metadados.get("PartitionFilters")),
+                'filtros_dados': _opcao(metadados.get("DataFilters")),
+                'schema_lido': _opcao(metadados.get("ReadSchema")),
+            })
+    return {'plano': plano.toString(), 'scans': scans}
+
+
+def bytes_lidos_sistema_arquivos(spark):
+    """
+    Total de bytes lidos pelos FileSystems do Hadoop nesta JVM.
+
+    Em modo local os executores rodam na JVM do driver, então a diferença
+    antes/depois de uma query mede o I/O efetivo (incluindo o que foi
+    evitado por row groups/stripes pulados dentro de um arquivo).
+    """
+    estatisticas = spark._jvm.org.apache.hadoop.fs.FileSystem.getAllStatistics()
+    return sum(estatisticas.get(i).getBytesRead() for i in range(estatisticas.size()))
+
+
+def _rest(sc, caminho):
+    """GET na API REST de monitoramento da aplicação Spark corrente."""
+    url = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}/{caminho}"
+    with urllib.request.urlopen(url, timeout=TIMEOUT_REST) as resposta:
+        return json.load(resposta)
+
+
+def _jobs_concluidos(sc, grupo, tempo_maximo=TEMPO_MAXIMO_METRICAS):
+    """
+    Jobs do job group, aguardando o listener bus registrar o fim de todos.
+    """
+    tracker = sc.statusTracker()
+    limite = time.monotonic() + tempo_maximo
+    while True:
+        jobs = [tracker.getJobInfo(j) for j in tracker.getJobIdsForGroup(grupo)]
+        concluidos = jobs and all(j is not None and j.status in ("SUCCEEDED", "FAILED") for j in jobs)
+        if concluidos or time.monotonic() > limite:
+            return [j for j in jobs if j is not None]
+        time.sleep(INTERVALO_CONSULTA_METRICAS)
+
+
+def metricas_spark(spark, grupo, tempo_parede_s):
+    """
+    Métricas agregadas dos stages executados pelos jobs de um job group.
+
+    `tempo_parede_s` é o tempo de execução da query, usado para comparar o
+    tempo de CPU das tasks com o tempo de parede (paralelismo efetivo).
+    Retorna None se a UI do Spark (e portanto a API REST) estiver
+    desabilitada ou inacessível.
+    """
+    sc = spark.sparkContext
+    if not sc.uiWebUrl:
+        return None
+    jobs = _jobs_concluidos(sc, grupo)
+    resultado = {
+        'jobs': len(jobs), 'stages': 0, 'stages_pulados': 0, 'tasks': 0,
+        'registros_lidos': 0, 'bytes_lidos': 0,
+        'shuffle_leitura_bytes': 0, 'shuffle_escrita_bytes': 0,
+        'tempo_tasks_s': 0.0, 'tempo_cpu_tasks_s': 0.0, 'tempo_gc_s': 0.0,
+    }
+    try:
+        for stage_id in sorted({s for j in jobs for s in j.stageIds}):
+            for tentativa in _rest(sc, f"stages/{stage_id}"):
+                if tentativa['status'] == "SKIPPED":
+                    resultado['stages_pulados'] += 1
+                    continue
+                resultado['stages'] += 1
+                resultado['tasks'] += tentativa['numTasks']
+                resultado['registros_lidos'] += tentativa['inputRecords']
+                resultado['bytes_lidos'] += tentativa['inputBytes']
+                resultado['shuffle_leitura_bytes'] += tentativa['shuffleReadBytes']
+                resultado['shuffle_escrita_bytes'] += tentativa['shuffleWriteBytes']
+                resultado['tempo_tasks_s'] += tentativa['executorRunTime'] / 1000
+                resultado['tempo_cpu_tasks_s'] += tentativa['executorCpuTime'] / NS_POR_SEGUNDO
+                resultado['tempo_gc_s'] += tentativa['jvmGcTime'] / 1000
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+    resultado['tempo_parede_s'] = tempo_parede_s
+    # Fração do tempo das tasks gasta em CPU (o restante é I/O, espera, GC)
+    resultado['fracao_cpu'] = (resultado['tempo_cpu_tasks_s'] / resultado['tempo_tasks_s']
+                               if resultado['tempo_tasks_s'] else None)
+    # Tasks simultâneas em média durante a execução
+    resultado['paralelismo_efetivo'] = (resultado['tempo_tasks_s'] / tempo_parede_s
+                                        if tempo_parede_s else None)
+    return resultado
+
+
+def _pid_jvm(spark):
+    return spark.sparkContext._jvm.java.lang.ProcessHandle.current().pid()
+
+
+def reiniciar_pico_memoria(spark):
+    """
+    Zera o pico de memória residente (VmHWM) da JVM do Spark, para que
+    `pico_memoria` meça só o que vier depois. Apenas Linux; sem efeito
+    em outros sistemas.
+    """
+    try:
+        with open(f"/proc/{_pid_jvm(spark)}/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def pico_memoria(spark):
+    """
+    Pico de memória residente (bytes) da JVM do Spark desde o último
+    `reiniciar_pico_memoria`, ou None fora do Linux. Em modo local os
+    executores rodam na JVM do driver, então o valor cobre toda a query.
+    """
+    try:
+        with open(f"/proc/{_pid_jvm(spark)}/status", 'r') as f:
+            for linha in f:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+def medir_execucao(construir_df, grupo=None):
+    """
+    Executa uma única rodada de uma query.
+
+    `construir_df` é uma função sem argumentos que devolve o DataFrame final
+    da query (incluindo a leitura dos arquivos). O resultado é coletado com
+    `collect()`, de modo que o plano medido é exatamente o plano executado.
+    Com `grupo`, os jobs da rodada são marcados com esse job group (ver
+    `metricas_spark`).
+
+    Retorna (planejamento_ns, execucao_ns, df) — o DataFrame executado é
+    devolvido para extração de métricas do plano.
+    """
+    inicio = time.perf_counter_ns()
+    df = construir_df()
+    if grupo:
+        df.sparkSession.sparkContext.setJobGroup(grupo, grupo)
+    try:
+        forcar_planejamento(df)
+        planejado = time.perf_counter_ns()
+        df.collect()
+        fim = time.perf_counter_ns()
+    finally:
+        if grupo:
+            df.sparkSession.sparkContext.setLocalProperty("spark.jobGroup.id", None)
+            df.sparkSession.sparkContext.setLocalProperty("spark.job.description", None)
+    return planejado - inicio, fim - planejado, df
+
+
+def executar_benchmark(construir_df, warmup, trials):
+    """
+    Executa `warmup` rodadas descartadas e `trials` rodadas medidas.
+
+    Retorna um dicionário com as amostras brutas (em segundos), o resumo
+    estatístico de planejamento, execução e tempo total, e, da última
+    rodada, as métricas de scan, o plano físico e as métricas do Spark.
+    """
+    for _ in range(warmup):
+        medir_execucao(construir_df)
+
+    planejamento, execucao, total = [], [], []
+    df = None
+    grupo = f"benchmark-{next(_grupos_benchmark)}"
+    for i in range(trials):
+        plan_ns, exec_ns, df = medir_execucao(construir_df, grupo if i == trials - 1 else None)
+        planejamento.append(plan_ns / NS_POR_SEGUNDO)
+        execucao.append(exec_ns / NS_POR_SEGUNDO)
+        total.append((plan_ns + exec_ns) / NS_POR_SEGUNDO)
+
+    return {
+        'warmup': warmup,
+        'trials': trials,
+        'amostras': total,
+        'total': resumir(total),
+        'planejamento': resumir(planejamento),
+        'execucao': resumir(execucao),
+        'scan': metricas_scan(df) if df is not None else None,
+        'plano': plano_fisico(df) if df is not None else None,
+        'spark': metricas_spark(df.sparkSession, grupo, execucao[-1]) if df is not None else None,
+    }
+
+
+# ============================================================================
+# ESTATÍSTICA
+# ============================================================================
+
+def percentil(amostras, p):
+    """Percentil por interpolação linear (mesmo método do numpy)."""
+    ordenadas = sorted(amostras)
+    if len(ordenadas) == 1:
+        return ordenadas[0]
+    pos = (len(ordenadas) - 1) * p / 100.0
+    baixo = math.floor(pos)
+    alto = math.ceil(pos)
+    if baixo == alto:
+        return ordenadas[baixo]
+    return ordenadas[baixo] + (ordenadas[alto] - ordenadas[baixo]) * (pos - baixo)
+
+
+def ic_mediana(amostras, confianca=NIVEL_CONFIANCA):
+    """
+    Intervalo de confiança da mediana por bootstrap (percentis).
+    """
+    if len(amostras) < 2:
+        return amostras[0], amostras[0]
+    rng = random.Random(SEED_ESTATISTICA)
+    n = len(amostras)
+    medianas = sorted(
+        statistics.median(rng.choices(amostras, k=n))
+        for _ in range(NUM_REAMOSTRAGENS)
+    )
+    alfa = (1 - confianca) / 2
+    return percentil(medianas, alfa * 100), percentil(medianas, (1 - alfa) * 100)
+
+
+def resumir(amostras):
+    """Resumo estatístico de uma lista de tempos (segundos)."""
+    ic_inf, ic_sup = ic_mediana(amostras)
+    return {
+        'n': len(amostras),
+        'mediana': statistics.median(amostras),
+        'media': statistics.fmean(amostras),
+        'p95': percentil(amostras, 95),
+        'desvio_padrao': statistics.stdev(amostras) if len(amostras) > 1 else 0.0,
+        'minimo': min(amostras),
+        'maximo': max(amostras),
+        'ic95_inferior': ic_inf,
+        'ic95_superior': ic_sup,
+    }
+
+
+def _r2(ys, previstos):
+    """Coeficiente de determinação de um ajuste."""
+    media = statistics.fmean(ys)
+    total = sum((y - media) ** 2 for y in ys)
+    residuo = sum((y - p) ** 2 for y, p in zip(ys, previstos))
+    return 1 - residuo / total if total else 1.0
+
+
+def ajustar_linear(xs, ys):
+    """
+    Ajuste por mínimos quadrados de y = overhead + custo * x.
+
+    Para tempo x linhas, `overhead` é o custo fixo (agendamento de jobs,
+    listagem, JVM) e 1 / `custo` a vazão assintótica em linhas/s.
+    Retorna None com menos de 2 pontos distintos.
+    """
+    if len(set(xs)) < 2:
+        return None
+    custo, overhead = statistics.linear_regression(xs, ys)
+    return {
+        'overhead_s': overhead,
+        'custo_por_linha_s': custo,
+        'vazao_assintotica_linhas_s': 1 / custo if custo > 0 else None,
+        'r2': _r2(ys, [overhead + custo * x for x in xs]),
+    }
+
+
+def ajustar_potencia(xs, ys):
+    """
+    Ajuste de y = coeficiente * x^expoente (regressão em escala log-log).
+
+    Expoente próximo de 1 indica escala linear; bem abaixo de 1, que o
+    custo fixo ainda domina nos tamanhos medidos.
+    Retorna None com menos de 2 pontos distintos ou valores não positivos.
+    """
+    if len(set(xs)) < 2 or min(xs) <= 0 or min(ys) <= 0:
+        return None
+    log_x = [math.log(x) for x in xs]
+    log_y = [math.log(y) for y in ys]
+    expoente, intercepto = statistics.linear_regression(log_x, log_y)
+    return {
+        'coeficiente': math.exp(intercepto),
+        'expoente': expoente,
+        'r2': _r2(log_y, [intercepto + expoente * lx for lx in log_x]),
+    }
+
+
+def postos(valores):
+    """Postos (ranks) com média para empates, começando em 1."""
+    ordem = sorted(range(len(valores)), key=lambda i: valores[i])
+    resultado = [0.0] * len(valores)
+    i = 0
+    while i < len(ordem):
+        j = i
+        while j + 1 < len(ordem) and valores[ordem[j + 1]] == valores[ordem[i]]:
+            j += 1
+        posto_medio = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            resultado[ordem[k]] = posto_medio
+        i = j + 1
+    return resultado
+
+
+def teste_permutacao(a, b, reamostragens=NUM_REAMOSTRAGENS):
+    """
+    Teste de permutação bicaudal sobre a soma de postos (Mann-Whitney)
+    entre as amostras `a` e `b`.
+
+    Não assume normalidade, o que é adequado para poucas amostras de tempo
+    (distribuições assimétricas, com caudas causadas por GC e I/O).
+    Retorna o p-valor.
+    """
+    n_a = len(a)
+    rk = postos(list(a) + list(b))
+    esperado = n_a * (len(rk) + 1) / 2
+    observado = abs(sum(rk[:n_a]) - esperado)
+    rng = random.Random(SEED_ESTATISTICA)
+    extremos = 0
+    for _ in range(reamostragens):
+        rng.shuffle(rk)
+        if abs(sum(rk[:n_a]) - esperado) >= observado:
+            extremos += 1
+    return (extremos + 1) / (reamostragens + 1)
+
+
+def p_valor_minimo(n_a, n_b):
+    """
+    Menor p-valor que `teste_permutacao` pode dar com `n_a` e `n_b`
+    amostras: as duas ordenações extremas (todas de `a` antes ou depois das
+    de `b`) entre as comb(n_a + n_b, n_a) possíveis. Ex.: 3 vs 3 -> 0.10,
+    5 vs 5 -> 0.008.
+    """
+    return min(1.0, 2 / math.comb(n_a + n_b, n_a))
+
+
+def amostras_suficientes(n_a, n_b, alfa=NIVEL_SIGNIFICANCIA):
+    """Se `n_a` vs `n_b` amostras podem atingir p < `alfa` no teste de permutação."""
+    return min(n_a, n_b) > 0 and p_valor_minimo(n_a, n_b) < alfa
+
+
+def ranquear(amostras_por_item, alfa=NIVEL_SIGNIFICANCIA):
+    """
+    Ordena itens pela mediana e verifica se cada posição é
+    significativamente mais rápida que a seguinte.
+
+    `amostras_por_item` mapeia nome -> lista de tempos.
+    Retorna lista de dicts (item, mediana, p_valor vs próximo, significativo,
+    amostras_insuficientes). Com amostras insuficientes para atingir `alfa`,
+    `significativo` fica None: o teste não pode separar os dois itens.
+    """
+    ordem = sorted(amostras_por_item, key=lambda k: statistics.median(amostras_por_item[k]))
+    ranking = []
+    for i, item in enumerate(ordem):
+        entrada = {
+            'item': item,
+            'mediana': statistics.median(amostras_por_item[item]),
+            'p_valor_vs_proximo': None,
+            'significativo': None,
+            'amostras_insuficientes': False,
+        }
+        if i + 1 < len(ordem):
+            a, b = amostras_por_item[item], amostras_por_item[ordem[i + 1]]
+            p = teste_permutacao(a, b)
+            entrada['p_valor_vs_proximo'] = p
+            if amostras_suficientes(len(a), len(b), alfa):
+                entrada['significativo'] = p < alfa
+            else:
+                entrada['amostras_insuficientes'] = True
+        ranking.append(entrada)
+    return ranking
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+CICLO DE VIDA HOT/WARM/COLD - TEMA B
+================================================================================
+
+Motor de ciclo de vida que distribui as leituras em camadas de
+armazenamento pela idade do `timestamp` em relação a uma data de
+referência ("agora"):
+
+- hot:  dados recentes, em formato leve de ler (ex.: Parquet snappy por dia)
+- warm: dados intermediários, mais comprimidos (ex.: Parquet zstd por mês)
+- cold: o restante, com compressão máxima (ex.: ORC zlib por mês)
+
+Cada camada é uma lista de dicts com nome, idade máxima em dias (None na
+última), formato (Parquet/ORC), codec, opções de escrita, coluna de
+partição ('dia' ou 'mes') e custo de armazenamento por GB-mês.
+
+O catálogo (`_catalogo.json`) guarda a referência e o início de cada
+camada; é a fonte de verdade do roteador de queries. A migração é
+incremental: apenas as partições afetadas são reescritas, primeiro num
+diretório temporário (ignorado pelo Spark por começar com `_`) e depois
+trocadas com renameat2(RENAME_EXCHANGE) (ver compactacao.trocar_diretorios),
+sem instante em que a partição não exista. A ordem (destino -> catálogo ->
+origem) garante que um leitor que filtre cada camada pelo intervalo do
+catálogo nunca veja linhas duplicadas nem faltando. Sem RENAME_EXCHANGE
+(outro SO ou sistema de arquivos), a troca de uma partição existente cai
+para renames sucessivos, com uma janela curta sem a partição.
+
+================================================================================
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pyspark.sql.functions import col, expr, lit
+
+from compactacao import trocar_diretorios
+
+
+NOME_CATALOGO = "_catalogo.json"
+
+# Coluna de partição -> expressão SQL sobre `timestamp`
+CHAVES_PARTICAO = {
+    'dia': "to_date(`timestamp`)",
+    'mes': "year(`timestamp`) * 100 + month(`timestamp`)",
+}
+
+
+# ============================================================================
+# CATÁLOGO E LIMITES
+# ============================================================================
+
+def inicios_camadas(camadas, referencia):
+    """
+    Início (inclusivo) de cada camada para a referência informada, alinhado
+    à meia-noite. A última camada não tem início (None = desde sempre).
+    """
+    meia_noite = datetime(referencia.year, referencia.month, referencia.day)
+    return {
+        c['nome']: (meia_noite - timedelta(days=c['idade_max_dias'])
+                    if c['idade_max_dias'] is not None else None)
+        for c in camadas
+    }
+
+
+def intervalos(camadas, inicios):
+    """Intervalo [início, fim) de cada camada; o fim é o início da anterior."""
+    resultado = {}
+    fim = None
+    for c in camadas:
+        resultado[c['nome']] = (inicios[c['nome']], fim)
+        fim = inicios[c['nome']]
+    return resultado
+
+
+def ler_catalogo(diretorio):
+    """Catálogo do ciclo de vida, ou None se ainda não houve carga."""
+    path = Path(diretorio) / NOME_CATALOGO
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        catalogo = json.load(f)
+    catalogo['referencia'] = datetime.fromisoformat(catalogo['referencia'])
+    catalogo['inicios'] = {
+        nome: datetime.fromisoformat(v) if v else None
+        for nome, v in catalogo['inicios'].items()
+    }
+    return catalogo
+
+
+def gravar_catalogo(diretorio, referencia, inicios):
+    """Grava o catálogo de forma atômica (arquivo temporário + rename)."""
+    path = Path(diretorio) / NOME_CATALOGO
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'referencia': referencia.isoformat(),
+            'inicios': {nome: v.isoformat() if v else None for nome, v in inicios.items()},
+        }, f, indent=2)
+    tmp_path.replace(path)
+
+
+# ============================================================================
+# PARTIÇÕES
+# ============================================================================
+
+def _dir_camada(diretorio, camada):
+    return Path(diretorio) / camada['nome']
+
+
+def particoes_camada(diretorio, camada):
+    """Diretórios de partição (`coluna=valor`) existentes na camada."""
+    path = _dir_camada(diretorio, camada)
+    if not path.exists():
+        return []
+    prefixo = f"{camada['particao']}="
+    return sorted(p for p in path.iterdir() if p.is_dir() and p.name.startswith(prefixo))
+
+
+def ler_camada(spark, diretorio, camada):
+    """DataFrame da camada (com a coluna de partição), ou None se vazia."""
+    if not particoes_camada(diretorio, camada):
+        return None
+    return spark.read.format(camada['formato'].lower()).load(str(_dir_camada(diretorio, camada)))
+
+
+def _filtro_intervalo(inicio, fim):
+    """Condição sobre `timestamp` para o intervalo [inicio, fim)."""
+    condicao = lit(True)
+    if inicio is not None:
+        condicao = condicao & (col("timestamp") >= lit(inicio))
+    if fim is not None:
+        condicao = condicao & (col("timestamp") < lit(fim))
+    return condicao
+
+
+def _trocar_diretorio(destino, novo):
+    """
+    Substitui `destino` por `novo` (ou apenas remove `destino` se `novo`
+    for None); o conteúdo antigo é apagado por último. Se ambos existem, a
+    troca é atômica (RENAME_EXCHANGE): `destino` nunca deixa de existir.
+    """
+    if novo is not None and destino.exists():
+        trocar_diretorios(destino, novo)
+        shutil.rmtree(novo, ignore_errors=True)
+    elif novo is not None:
+        os.rename(novo, destino)
+    elif destino.exists():
+        lixo = destino.parent / f"_lixo_{destino.name}_{uuid.uuid4().hex[:8]}"
+        os.rename(destino, lixo)
+        shutil.rmtree(lixo, ignore_errors=True)
+
+
+def reescrever_particoes(spark, diretorio, camada, linhas, afetadas=()):
+    """
+    Reescreve partições da camada num diretório temporário.
+
+    `linhas` (com a coluna de partição) é o conteúdo completo das partições
+    reescritas; `afetadas` lista valores de partição que devem ser trocados
+    mesmo que fiquem vazios (e então removidos). Retorna uma função que
+    efetiva a troca e devolve o número de partições trocadas — a troca é
+    separada da escrita para que o chamador controle a ordem em relação ao
+    catálogo.
+    """
+    camada_dir = _dir_camada(diretorio, camada)
+    camada_dir.mkdir(parents=True, exist_ok=True)
+    temporario = camada_dir / f"_tmp_{uuid.uuid4().hex[:8]}"
+    writer = linhas.write.mode("overwrite").partitionBy(camada['particao']) \
+        .option("compression", camada['codec']).options(**camada.get('opcoes', {}))
+    writer.format(camada['formato'].lower()).save(str(temporario))
+
+    prefixo = f"{camada['particao']}="
+    novas = {p.name: p for p in temporario.iterdir() if p.is_dir() and p.name.startswith(prefixo)}
+    nomes = set(novas) | {f"{prefixo}{v}" for v in afetadas}
+
+    def trocar():
+        for nome in sorted(nomes):
+            _trocar_diretorio(camada_dir / nome, novas.get(nome))
+        shutil.rmtree(temporario, ignore_errors=True)
+        return len(nomes)
+    return trocar
+
+
+def _com_chave(df, camada):
+    """Seleciona as colunas de dados e (re)calcula a chave de partição da camada."""
+    dados = [c for c in df.columns if c not in CHAVES_PARTICAO]
+    return df.select(*dados).withColumn(camada['particao'], expr(CHAVES_PARTICAO[camada['particao']]))
+
+
+def _mesclar(spark, diretorio, camada, novas):
+    """
+    Prepara a mescla de `novas` linhas nas partições existentes da camada.
+    Retorna (função de troca, número de linhas novas) ou (None, 0).
+    """
+    novas = _com_chave(novas, camada)
+    valores = [r[0] for r in novas.select(camada['particao']).distinct().collect()]
+    if not valores:
+        return None, 0
+    existentes = ler_camada(spark, diretorio, camada)
+    linhas = novas
+    if existentes is not None:
+        linhas = existentes.filter(col(camada['particao']).isin(valores)) \
+            .unionByName(novas)
+    return reescrever_particoes(spark, diretorio, camada, linhas), novas.count()
+
+
+# ============================================================================
+# API
+# ============================================================================
+
+def distribuir(spark, diretorio, camadas, df, inicios):
+    """
+    Mescla as linhas de `df` na camada a que cada uma pertence pelos
+    `inicios` informados. Retorna {camada: linhas} e a lista de funções de
+    troca pendentes (a serem chamadas pelo chamador).
+    """
+    linhas, trocas = {}, []
+    for camada in camadas:
+        inicio, fim = intervalos(camadas, inicios)[camada['nome']]
+        troca, n = _mesclar(spark, diretorio, camada, df.filter(_filtro_intervalo(inicio, fim)))
+        if troca:
+            trocas.append(troca)
+            linhas[camada['nome']] = n
+    return linhas, trocas
+
+
+def carga_inicial(spark, diretorio, camadas, df, referencia):
+    """
+    Distribui `df` nas camadas a partir do zero (diretório limpo).
+    Apenas linhas anteriores à referência são carregadas.
+    """
+    shutil.rmtree(diretorio, ignore_errors=True)
+    Path(diretorio).mkdir(parents=True, exist_ok=True)
+    inicios = inicios_camadas(camadas, referencia)
+    linhas, trocas = distribuir(spark, diretorio, camadas,
+                                df.filter(col("timestamp") < lit(referencia)), inicios)
+    for troca in trocas:
+        troca()
+    gravar_catalogo(diretorio, referencia, inicios)
+    return linhas
+
+
+def ingerir(spark, diretorio, camadas, df):
+    """Mescla novas leituras nas camadas, pelos limites atuais do catálogo."""
+    catalogo = ler_catalogo(diretorio)
+    linhas, trocas = distribuir(spark, diretorio, camadas, df, catalogo['inicios'])
+    for troca in trocas:
+        troca()
+    return linhas
+
+
+def migrar(spark, diretorio, camadas, referencia):
+    """
+    Avança a referência e move, de forma incremental, as linhas que
+    envelheceram para a camada seguinte (ou além, se a referência saltar).
+
+    As camadas de origem são processadas da mais fria para a mais quente;
+    em cada passo só as partições com linhas anteriores ao novo início da
+    camada são lidas e reescritas. Retorna estatísticas por passo.
+    """
+    catalogo = ler_catalogo(diretorio)
+    inicios = dict(catalogo['inicios'])
+    novos = inicios_camadas(camadas, referencia)
+    passos = []
+
+    for i in reversed(range(len(camadas) - 1)):
+        origem = camadas[i]
+        limite = novos[origem['nome']]
+        if inicios[origem['nome']] is not None and limite <= inicios[origem['nome']]:
+            continue
+        inicio_passo = time.perf_counter()
+
+        # Partições da origem que podem conter linhas anteriores ao novo início
+        afetadas = []
+        for particao in particoes_camada(diretorio, origem):
+            valor = particao.name.split("=", 1)[1]
+            if origem['particao'] == 'dia':
+                pode_conter = datetime.fromisoformat(valor) < limite
+            else:
+                pode_conter = int(valor) <= limite.year * 100 + limite.month
+            if pode_conter:
+                afetadas.append(valor)
+        if not afetadas:
+            inicios[origem['nome']] = limite
+            gravar_catalogo(diretorio, catalogo['referencia'], inicios)
+            continue
+
+        chave = col(origem['particao']).cast("string")
+        linhas_origem = ler_camada(spark, diretorio, origem).filter(chave.isin(afetadas))
+        mover = linhas_origem.filter(col("timestamp") < lit(limite))
+        manter = linhas_origem.filter(col("timestamp") >= lit(limite))
+
+        # Destinos: camadas mais frias, com o novo início da origem
+        inicios_destino = dict(inicios, **{origem['nome']: limite})
+        movidas, trocas_destino = distribuir(spark, diretorio, camadas[i + 1:], mover, inicios_destino)
+        troca_origem = reescrever_particoes(spark, diretorio, origem, manter, afetadas)
+
+        # Destino -> catálogo -> origem
+        particoes_destino = sum(troca() for troca in trocas_destino)
+        inicios = inicios_destino
+        gravar_catalogo(diretorio, referencia, inicios)
+        particoes_origem = troca_origem()
+
+        passos.append({
+            'origem': origem['nome'],
+            'novo_inicio': limite.isoformat(),
+            'linhas_movidas': movidas,
+            'particoes_origem_reescritas': particoes_origem,
+            'particoes_destino_reescritas': particoes_destino,
+            'tempo_s': time.perf_counter() - inicio_passo,
+        })
+
+    gravar_catalogo(diretorio, referencia, inicios)
+    return passos
+
+
+def rotear(spark, diretorio, camadas, inicio, fim):
+    """
+    Leituras no intervalo [inicio, fim), lendo apenas as camadas que o
+    intervalo toca. Em cada camada o filtro inclui a chave de partição
+    (poda de partições) e o intervalo da camada no catálogo.
+
+    Retorna (DataFrame, camadas lidas); o DataFrame é None se nenhuma
+    camada contém o intervalo.
+    """
+    catalogo = ler_catalogo(diretorio)
+    partes, lidas = [], []
+    for camada in camadas:
+        inicio_camada, fim_camada = intervalos(camadas, catalogo['inicios'])[camada['nome']]
+        if (inicio_camada is not None and fim <= inicio_camada) or \
+                (fim_camada is not None and inicio >= fim_camada):
+            continue
+        df = ler_camada(spark, diretorio, camada)
+        if df is None:
+            continue
+        if camada['particao'] == 'dia':
+            poda = col("dia").between(lit(inicio.date()), lit(fim.date()))
+        else:
+            poda = col("mes").between(inicio.year * 100 + inicio.month, fim.year * 100 + fim.month)
+        df = df.filter(poda & _filtro_intervalo(inicio, fim)
+                       & _filtro_intervalo(inicio_camada, fim_camada)) \
+            .drop(camada['particao'])
+        partes.append(df)
+        lidas.append(camada['nome'])
+    if not partes:
+        return None, []
+    resultado = partes[0]
+    for parte in partes[1:]:
+        resultado = resultado.unionByName(parte)
+    return resultado, lidas
+
+
+def custo_armazenamento(diretorio, camadas):
+    """Tamanho, número de arquivos e custo mensal de armazenamento por camada."""
+    resultado = {}
+    for camada in camadas:
+        arquivos = [
+            f for p in particoes_camada(diretorio, camada) for f in p.rglob('*')
+            if f.is_file() and not f.name.startswith(('_', '.'))
+        ]
+        tamanho = sum(f.stat().st_size for f in arquivos)
+        resultado[camada['nome']] = {
+            'particoes': len(particoes_camada(diretorio, camada)),
+            'arquivos': len(arquivos),
+            'bytes': tamanho,
+            'custo_mes': tamanho / 1024**3 * camada['custo_gb_mes'],
+        }
+    return resultado
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+CLUSTERIZAÇÃO DE DADOS ANTES DA ESCRITA - TEMA B
+================================================================================
+
+Estratégias de ordenação física para que as estatísticas min/max de
+row groups (Parquet) e stripes (ORC) fiquem estreitas e o predicate
+pushdown consiga pular blocos:
+
+- linear:  ordenação lexicográfica por uma ou mais colunas
+- zorder:  intercalação de bits (curva Z / Morton) das colunas normalizadas
+- hilbert: índice na curva de Hilbert (2 colunas), com melhor localidade
+           que a curva Z
+
+Cada coluna é normalizada para um inteiro em [0, 2^bits): colunas texto
+pela posição na lista ordenada de valores distintos, colunas numéricas e
+timestamps por escala linear entre mínimo e máximo.
+
+================================================================================
+"""
+
+from pyspark.sql.functions import col, expr, floor, lit, udf
+from pyspark.sql.types import LongType, StringType
+
+
+BITS_POR_DIMENSAO = 10
+COLUNA_CHAVE = "_chave_cluster"
+ESTRATEGIAS = ('nenhuma', 'linear', 'zorder', 'hilbert')
+
+
+# ============================================================================
+# NORMALIZAÇÃO
+# ============================================================================
+
+def normalizar_coluna(df, coluna, bits=BITS_POR_DIMENSAO):
+    """
+    Adiciona `_norm_<coluna>`: inteiro em [0, 2^bits) que preserva a ordem
+    da coluna. Retorna o DataFrame com a nova coluna.
+    """
+    maximo_norm = (1 << bits) - 1
+    destino = f"_norm_{coluna}"
+
+    if isinstance(df.schema[coluna].dataType, StringType):
+        # Posição na lista ordenada de valores distintos (broadcast join)
+        distintos = df.select(coluna).distinct().orderBy(coluna)
+        n = distintos.count()
+        indices = distintos.rdd.zipWithIndex() \
+            .map(lambda par: (par[0][0], par[1])) \
+            .toDF([coluna, "_indice"])
+        indices = indices.withColumn(
+            destino, floor(col("_indice") * (maximo_norm + 1) / lit(max(n, 1))).cast("long")
+        ).drop("_indice")
+        return df.join(indices.hint("broadcast"), on=coluna, how="left")
+
+    numerico = col(coluna).cast("double")
+    limites = df.agg(expr(f"min(cast(`{coluna}` as double))"),
+                     expr(f"max(cast(`{coluna}` as double))")).first()
+    minimo, maximo = limites[0], limites[1]
+    amplitude = (maximo - minimo) or 1.0
+    return df.withColumn(
+        destino, floor((numerico - lit(minimo)) / lit(amplitude) * maximo_norm).cast("long")
+    )
+
+
+# ============================================================================
+# CURVAS
+# ============================================================================
+
+def expressao_zorder(colunas_norm, bits=BITS_POR_DIMENSAO):
+    """
+    Expressão SQL que intercala os bits das colunas normalizadas
+    (bit i da dimensão d vai para a posição i * k + d).
+    """
+    k = len(colunas_norm)
+    termos = [
+        f"shiftleft(shiftright(`{c}`, {i}) & 1, {i * k + d})"
+        for i in range(bits)
+        for d, c in enumerate(colunas_norm)
+    ]
+    return " | ".join(termos)
+
+
+def indice_hilbert(x, y, bits=BITS_POR_DIMENSAO):
+    """Posição de (x, y) na curva de Hilbert de ordem `bits` (algoritmo xy2d)."""
+    if x is None or y is None:
+        return None
+    n = 1 << bits
+    d = 0
+    s = n >> 1
+    while s > 0:
+        rx = 1 if (x & s) > 0 else 0
+        ry = 1 if (y & s) > 0 else 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotação do quadrante
+        if ry == 0:
+            if rx == 1:
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+hilbert_udf = udf(indice_hilbert, LongType())
+
+
+# ============================================================================
+# API
+# ============================================================================
+
+def adicionar_chave_cluster(df, estrategia, colunas, bits=BITS_POR_DIMENSAO):
+    """
+    Prepara o DataFrame para escrita clusterizada.
+
+    Retorna (df, colunas_de_ordenacao). Para 'zorder' e 'hilbert' é
+    adicionada a coluna COLUNA_CHAVE, que deve ser removida após a
+    ordenação (ver `remover_chave_cluster`).
+    """
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estratégia de clusterização desconhecida: {estrategia}")
+    if estrategia == 'nenhuma' or not colunas:
+        return df, []
+    if estrategia == 'linear':
+        return df, list(colunas)
+    if estrategia == 'hilbert' and len(colunas) != 2:
+        raise ValueError("A curva de Hilbert está implementada para exatamente 2 colunas")
+
+    originais = df.columns
+    for coluna in colunas:
+        df = normalizar_coluna(df, coluna, bits)
+    normalizadas = [f"_norm_{c}" for c in colunas]
+
+    if estrategia == 'zorder':
+        df = df.withColumn(COLUNA_CHAVE, expr(expressao_zorder(normalizadas, bits)))
+    else:
+        df = df.withColumn(COLUNA_CHAVE, hilbert_udf(col(normalizadas[0]), col(normalizadas[1])))
+
+    # O join de normalização muda a ordem das colunas: restaura a original
+    return df.select(*originais, COLUNA_CHAVE), [COLUNA_CHAVE]
+
+
+def remover_chave_cluster(df):
+    """Remove a coluna auxiliar de clusterização, se existir."""
+    return df.drop(COLUNA_CHAVE) if COLUNA_CHAVE in df.columns else df
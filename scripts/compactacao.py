@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+COMPACTAÇÃO DE ARQUIVOS PEQUENOS - TEMA B
+================================================================================
+
+Ingestão por append (ver modo "ingestao") deixa milhares de arquivos
+pequenos em data/parquet e data/orc: cada um custa uma listagem, uma
+abertura, um rodapé e uma task, e a latência das queries degrada.
+
+A compactação percorre as partições (diretórios folha com arquivos de
+dados) e, nas que têm ao menos `min_arquivos` arquivos abaixo do limiar de
+tamanho, reescreve apenas esses arquivos pequenos em arquivos do tamanho
+alvo, ordenados pelas colunas de ordenação (repartitionByRange +
+sortWithinPartitions), sem tocar nos arquivos grandes nem no esquema de
+particionamento.
+
+A nova versão da partição é montada num diretório temporário irmão
+(ignorado pelo Spark por começar com `_`): arquivos compactados mais hard
+links dos arquivos mantidos. A troca é feita com renameat2(RENAME_EXCHANGE)
+no Linux, que troca os dois diretórios numa única operação: um leitor que
+liste a partição vê a versão antiga inteira ou a nova inteira, nunca um
+estado intermediário. Sem suporte (outro SO ou sistema de arquivos), a
+troca cai para dois renames, com uma janela curta sem a partição.
+
+Arquivos anexados à partição durante a compactação são levados para a nova
+versão. Partições com escrita em andamento (`_temporary`) são adiadas.
+
+A troca atômica protege apenas a listagem: uma query que listou a partição
+antes da troca ainda abre os arquivos antigos depois dela. Por isso a
+versão antiga não é apagada na troca, e sim movida para um diretório
+`_lixo_<instante>_<partição>` ao lado da partição (também ignorado pelo
+Spark), apagado por uma compactação posterior após `carencia_s` segundos.
+Uma query que dure mais que a carência ainda pode falhar com
+FileNotFoundException.
+
+================================================================================
+"""
+
+import ctypes
+import errno
+import math
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+
+RENAME_EXCHANGE = 2     # linux/fs.h
+AT_FDCWD = -100
+ARQUIVOS_SUCESSO = ("_SUCCESS", "._SUCCESS.crc")
+DIRETORIO_ESCRITA = "_temporary"
+PREFIXO_LIXO = "_lixo_"
+CARENCIA_LIXO_S = 3600  # Tempo mínimo que uma versão antiga sobrevive à troca
+
+
+# ============================================================================
+# TROCA ATÔMICA
+# ============================================================================
+
+def _renameat2():
+    """Função renameat2 da libc, ou None se indisponível."""
+    try:
+        funcao = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return None
+    funcao.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    funcao.restype = ctypes.c_int
+    return funcao
+
+
+def trocar_diretorios(a, b):
+    """
+    Troca o conteúdo dos caminhos `a` e `b` (ambos existentes).
+
+    Retorna True se a troca foi atômica (renameat2 com RENAME_EXCHANGE) e
+    False se foi feita com renames sucessivos.
+    """
+    funcao = _renameat2()
+    if funcao is not None:
+        if funcao(AT_FDCWD, os.fsencode(str(a)), AT_FDCWD, os.fsencode(str(b)), RENAME_EXCHANGE) == 0:
+            return True
+        erro = ctypes.get_errno()
+        if erro not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+            raise OSError(erro, os.strerror(erro), str(a))
+    intermediario = Path(b).parent / f"_troca_{uuid.uuid4().hex[:8]}"
+    os.rename(a, intermediario)
+    os.rename(b, a)
+    os.rename(intermediario, b)
+    return False
+
+
+# ============================================================================
+# VERSÕES ANTIGAS
+# ============================================================================
+
+def descartar_versao(particao, versao):
+    """
+    Move a versão antiga de `particao` (já trocada para `versao`) para um
+    diretório `_lixo_<instante>_<partição>`, em vez de apagá-la: leitores
+    que listaram a partição antes da troca ainda podem abrir seus arquivos.
+    """
+    lixo = particao.parent / f"{PREFIXO_LIXO}{int(time.time())}_{particao.name}_{uuid.uuid4().hex[:8]}"
+    os.rename(versao, lixo)
+    return lixo
+
+
+def limpar_lixo(diretorio, carencia_s=CARENCIA_LIXO_S):
+    """
+    Apaga as versões antigas (`_lixo_*`) de uma tabela descartadas há mais
+    de `carencia_s` segundos. Numa tabela sem partições a versão antiga
+    fica ao lado do próprio diretório da tabela. Retorna o número de
+    diretórios apagados.
+    """
+    diretorio = Path(diretorio)
+    versoes = list(diretorio.parent.glob(f"{PREFIXO_LIXO}*_{diretorio.name}_*"))
+    for raiz, subdirs, _ in os.walk(diretorio):
+        for nome in [d for d in subdirs if d.startswith(PREFIXO_LIXO)]:
+            subdirs.remove(nome)
+            versoes.append(Path(raiz) / nome)
+
+    limite = time.time() - carencia_s
+    apagados = 0
+    for versao in versoes:
+        instante = versao.name[len(PREFIXO_LIXO):].split("_", 1)[0]
+        if instante.isdigit() and int(instante) <= limite:
+            shutil.rmtree(versao, ignore_errors=True)
+            apagados += 1
+    return apagados
+
+
+# ============================================================================
+# PLANEJAMENTO
+# ============================================================================
+
+def eh_arquivo_dados(entrada):
+    """Arquivo de dados do Spark (não oculto, não marcador)."""
+    return entrada.is_file() and not entrada.name.startswith(('_', '.'))
+
+
+def _crc(arquivo):
+    """Checksum que o Hadoop grava ao lado de cada arquivo no sistema local."""
+    return arquivo.parent / f".{arquivo.name}.crc"
+
+
+def particoes_tabela(diretorio):
+    """Diretórios folha de uma tabela que contêm arquivos de dados -> lista de arquivos."""
+    particoes = {}
+    for raiz, subdirs, nomes in os.walk(diretorio):
+        subdirs[:] = [d for d in subdirs if not d.startswith(('_', '.'))]
+        arquivos = [Path(raiz) / n for n in nomes if eh_arquivo_dados(Path(raiz) / n)]
+        if arquivos:
+            particoes[Path(raiz)] = sorted(arquivos)
+    return particoes
+
+
+def colunas_particao(diretorio):
+    """Colunas de particionamento Hive-style (`coluna=valor`) de uma tabela."""
+    for particao in particoes_tabela(diretorio):
+        return [p.split("=", 1)[0] for p in particao.relative_to(diretorio).parts if "=" in p]
+    return []
+
+
+def planejar_compactacao(diretorio, limiar_bytes, min_arquivos):
+    """
+    Partições que precisam de compactação: ao menos `min_arquivos` arquivos
+    com menos de `limiar_bytes`. Retorna uma lista de dicts com a partição,
+    os arquivos pequenos (a reescrever) e os mantidos.
+    """
+    plano = []
+    for particao, arquivos in particoes_tabela(diretorio).items():
+        pequenos = [a for a in arquivos if a.stat().st_size < limiar_bytes]
+        if len(pequenos) < min_arquivos:
+            continue
+        plano.append({
+            'particao': particao,
+            'pequenos': pequenos,
+            'mantidos': [a for a in arquivos if a not in pequenos],
+            'bytes_pequenos': sum(a.stat().st_size for a in pequenos),
+        })
+    return plano
+
+
+# ============================================================================
+# COMPACTAÇÃO
+# ============================================================================
+
+def _ler(spark, formato, arquivos):
+    return spark.read.format(formato.lower()).load([str(a) for a in arquivos])
+
+
+def _montar_versao(particao, versao, novos_dir, substituidos):
+    """
+    Monta a nova versão da partição em `versao`: os arquivos escritos em
+    `novos_dir` (movidos) e hard links de tudo o que há na partição e não
+    foi substituído (arquivos mantidos, checksums, marcadores). Retorna a
+    lista de arquivos de dados novos.
+    """
+    versao.mkdir()
+    novos = []
+    for entrada in novos_dir.iterdir():
+        if entrada.name in ARQUIVOS_SUCESSO:
+            continue
+        if eh_arquivo_dados(entrada):
+            novos.append(versao / entrada.name)
+        os.rename(entrada, versao / entrada.name)
+    _levar_restantes(particao, versao, substituidos, os.link)
+    return novos
+
+
+def _levar_restantes(origem, destino, substituidos, operacao):
+    """Aplica `operacao` (link ou rename) aos arquivos de `origem` ausentes em `destino`."""
+    for entrada in origem.iterdir():
+        if entrada.is_file() and entrada.name not in substituidos \
+                and not (destino / entrada.name).exists():
+            operacao(entrada, destino / entrada.name)
+
+
+def compactar_particao(spark, formato, item, alvo_bytes, ordenacao, codec):
+    """
+    Reescreve os arquivos pequenos de uma partição em arquivos de
+    ~`alvo_bytes` ordenados por `ordenacao` e troca a partição pela nova
+    versão. Retorna as estatísticas da partição, ou None se adiada.
+    """
+    particao = item['particao']
+    if (particao / DIRETORIO_ESCRITA).exists():
+        return None
+    if any(p.is_dir() and not p.name.startswith(('_', '.')) for p in particao.iterdir()):
+        return None  # Diretório com subpartições: a troca levaria as subpartições junto
+
+    temporario = particao.parent / f"_tmp_compactacao_{particao.name}_{uuid.uuid4().hex[:8]}"
+    try:
+        df = _ler(spark, formato, item['pequenos'])
+        linhas = df.count()
+        num_arquivos = max(1, math.ceil(item['bytes_pequenos'] / alvo_bytes))
+        if ordenacao:
+            df = df.repartitionByRange(num_arquivos, *ordenacao).sortWithinPartitions(*ordenacao)
+        else:
+            df = df.coalesce(num_arquivos)
+        novos_dir = temporario / "novos"
+        df.write.mode("overwrite").option("compression", codec) \
+            .format(formato.lower()).save(str(novos_dir))
+        escritos = [a for a in novos_dir.iterdir() if eh_arquivo_dados(a)]
+        escritas = _ler(spark, formato, escritos).count() if escritos else 0
+        if escritas != linhas:
+            raise RuntimeError(f"Compactação de {particao}: {escritas} linhas escritas, {linhas} esperadas")
+
+        substituidos = {a.name for a in item['pequenos']} | {_crc(a).name for a in item['pequenos']}
+        versao = temporario / "versao"
+        novos = _montar_versao(particao, versao, novos_dir, substituidos)
+        bytes_novos = sum(a.stat().st_size for a in novos)
+        atomica = trocar_diretorios(particao, versao)
+        # Arquivos anexados entre a montagem e a troca ficaram na versão antiga
+        _levar_restantes(versao, particao, substituidos, os.rename)
+        descartar_versao(particao, versao)
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+
+    return {
+        'particao': str(particao),
+        'arquivos_antes': len(item['pequenos']) + len(item['mantidos']),
+        'arquivos_depois': len(novos) + len(item['mantidos']),
+        'arquivos_reescritos': len(item['pequenos']),
+        'bytes_reescritos_antes': item['bytes_pequenos'],
+        'bytes_reescritos_depois': bytes_novos,
+        'linhas': linhas,
+        'atomica': atomica,
+    }
+
+
+# ============================================================================
+# API
+# ============================================================================
+
+def compactar_tabela(spark, formato, diretorio, limiar_bytes, alvo_bytes, min_arquivos=2,
+                     ordenacao=None, codec='snappy', carencia_s=CARENCIA_LIXO_S):
+    """
+    Compacta os arquivos pequenos de uma tabela Parquet/ORC (particionada
+    ou não). Antes, apaga as versões antigas de compactações anteriores
+    descartadas há mais de `carencia_s` segundos. Retorna a lista de
+    estatísticas por partição compactada e a lista de partições adiadas.
+    """
+    limpar_lixo(diretorio, carencia_s)
+    compactadas, adiadas = [], []
+    for item in planejar_compactacao(Path(diretorio), limiar_bytes, min_arquivos):
+        estatisticas = compactar_particao(spark, formato, item, alvo_bytes, ordenacao, codec)
+        if estatisticas is None:
+            adiadas.append(str(item['particao']))
+        else:
+            compactadas.append(estatisticas)
+    return compactadas, adiadas
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+ESQUEMA FÍSICO COMPACTO - TEMA B
+================================================================================
+
+Reescreve as leituras com um esquema físico menor, mantendo o esquema
+lógico na leitura:
+
+- colunas derivadas (ex.: unit, função de sensor_type; status, função de
+  battery_level) não são gravadas e são recalculadas na leitura; uma
+  derivada só é removida se a expressão reproduz a coluna em todas as linhas
+- inteiros estreitados para o menor tipo que comporta a faixa observada
+  (tinyint, smallint ou int)
+- a coluna de medida (value) gravada como double, float (float32, com
+  perda) ou decimal com escala fixa (exato se os valores já têm no máximo
+  essa quantidade de casas)
+- categóricas codificadas como inteiros pequenos (posição no dicionário
+  ordenado de valores distintos); a codificação é um broadcast join com a
+  tabela de consulta e a decodificação um acesso por índice a um array
+  literal
+
+O esquema compacto de um diretório (dicionários, derivadas, tipos
+originais e DDL físico) é gravado em `_esquema_compacto.json`, ignorado
+pelo Spark por começar com `_`. `expandir` aplica a decodificação sobre o
+DataFrame lido e devolve as colunas originais, na ordem e nos tipos
+originais, de modo que as queries existentes rodam sem alteração.
+
+================================================================================
+"""
+
+import json
+from pathlib import Path
+
+from pyspark.sql.functions import array, broadcast, col, countDistinct, expr, lit
+from pyspark.sql.functions import max as maximo, min as minimo, sum as soma
+from pyspark.sql.types import IntegralType
+
+
+NOME_ESQUEMA = "_esquema_compacto.json"
+VERSAO_ESQUEMA = 1
+TIPOS_VALOR = ('double', 'float32', 'decimal')
+
+# Tipo inteiro -> (mínimo, máximo), do menor para o maior
+FAIXAS_INTEIROS = {
+    'tinyint': (-2**7, 2**7 - 1),
+    'smallint': (-2**15, 2**15 - 1),
+    'int': (-2**31, 2**31 - 1),
+}
+
+
+def tipo_inteiro(minimo_valor, maximo_valor):
+    """Menor tipo inteiro que comporta [minimo_valor, maximo_valor]."""
+    for tipo, (inferior, superior) in FAIXAS_INTEIROS.items():
+        if inferior <= minimo_valor and maximo_valor <= superior:
+            return tipo
+    return 'bigint'
+
+
+def tipo_decimal(maximo_absoluto, escala):
+    """
+    Decimal com `escala` casas e precisão suficiente para `maximo_absoluto`,
+    com um dígito inteiro de folga: o arredondamento para `escala` casas
+    pode ganhar um dígito (ex.: 99.995 -> 100.00).
+    """
+    inteiros = len(str(int(abs(maximo_absoluto)))) if maximo_absoluto else 1
+    return f"decimal({inteiros + 1 + escala},{escala})"
+
+
+# ============================================================================
+# PLANEJAMENTO
+# ============================================================================
+
+def planejar_esquema(df, categoricas, derivadas, inteiros, coluna_valor='value'):
+    """
+    Estatísticas do DataFrame (uma única agregação) que definem o esquema
+    compacto: dicionários das categóricas, faixas dos inteiros, derivadas
+    que conferem em todas as linhas e faixa/casas da coluna de medida.
+    Retorna o plano base, completado por `esquema_variante`.
+    """
+    agregacoes = [countDistinct(c).alias(f"distintos_{c}") for c in categoricas]
+    agregacoes += [minimo(c).alias(f"min_{c}") for c in inteiros]
+    agregacoes += [maximo(c).alias(f"max_{c}") for c in inteiros]
+    agregacoes += [soma(expr(f"case when `{c}` <=> ({sql}) then 0 else 1 end")).alias(f"divergentes_{c}")
+                   for c, sql in derivadas.items()]
+    agregacoes += [maximo(expr(f"abs(`{coluna_valor}`)")).alias("max_abs_valor"),
+                   soma(expr(f"case when cast(cast(`{coluna_valor}` as float) as double) = `{coluna_valor}` "
+                             f"then 0 else 1 end")).alias("perdas_float32")]
+    estatisticas = df.agg(*agregacoes).first().asDict()
+
+    dicionarios = {}
+    for c in categoricas:
+        if estatisticas[f"distintos_{c}"] <= FAIXAS_INTEIROS['smallint'][1]:
+            # NULL fica fora do dicionário: o left join de `compactar` o mapeia para código NULL
+            dicionarios[c] = sorted(r[0] for r in df.select(c).where(col(c).isNotNull()).distinct().collect())
+    return {
+        'colunas': df.columns,
+        'tipos_originais': {f.name: f.dataType.simpleString() for f in df.schema.fields},
+        'derivadas': {c: sql for c, sql in derivadas.items() if estatisticas[f"divergentes_{c}"] == 0},
+        'dicionarios': dicionarios,
+        'estreitadas': {c: tipo_inteiro(estatisticas[f"min_{c}"], estatisticas[f"max_{c}"])
+                        for c in inteiros
+                        if isinstance(df.schema[c].dataType, IntegralType)},
+        'valor': {'coluna': coluna_valor, 'max_abs': estatisticas['max_abs_valor'],
+                  'perdas_float32': estatisticas['perdas_float32']},
+    }
+
+
+def esquema_variante(df, plano, tipo_valor, escala=2):
+    """
+    Esquema compacto com a coluna de medida em `tipo_valor` (TIPOS_VALOR).
+    Para 'decimal', conta as linhas com mais de `escala` casas ou que
+    estouram a precisão (perda; comparação null-safe, pois o estouro vira
+    NULL com ANSI desligado).
+    """
+    if tipo_valor not in TIPOS_VALOR:
+        raise ValueError(f"Tipo de valor desconhecido: {tipo_valor} (disponíveis: {', '.join(TIPOS_VALOR)})")
+    coluna = plano['valor']['coluna']
+    valor = {'coluna': coluna, 'tipo': None, 'linhas_com_perda': 0}
+    if tipo_valor == 'float32':
+        valor.update(tipo='float', linhas_com_perda=plano['valor']['perdas_float32'])
+    elif tipo_valor == 'decimal':
+        valor['tipo'] = tipo_decimal(plano['valor']['max_abs'], escala)
+        valor['linhas_com_perda'] = df.filter(
+            expr(f"NOT (cast(`{coluna}` as {valor['tipo']}) <=> `{coluna}`)")).count()
+    return dict({k: v for k, v in plano.items() if k != 'valor'}, versao=VERSAO_ESQUEMA,
+                variante=tipo_valor, valor=valor)
+
+
+# ============================================================================
+# CODIFICAÇÃO E DECODIFICAÇÃO
+# ============================================================================
+
+def _tipo_codigo(dicionario):
+    return tipo_inteiro(0, max(len(dicionario) - 1, 0))
+
+
+def compactar(df, esquema):
+    """DataFrame no esquema físico compacto (sem as derivadas, codificado e estreitado)."""
+    spark = df.sparkSession
+    for coluna, valores in esquema['dicionarios'].items():
+        tabela = spark.createDataFrame([(v, i) for i, v in enumerate(valores)],
+                                       f"`{coluna}` string, `_codigo` {_tipo_codigo(valores)}")
+        df = df.join(broadcast(tabela), coluna, "left") \
+            .withColumn(coluna, col("_codigo")).drop("_codigo")
+    for coluna, tipo in esquema['estreitadas'].items():
+        df = df.withColumn(coluna, col(coluna).cast(tipo))
+    valor = esquema['valor']
+    if valor['tipo']:
+        df = df.withColumn(valor['coluna'], col(valor['coluna']).cast(valor['tipo']))
+    return df.select(*[c for c in esquema['colunas'] if c not in esquema['derivadas']])
+
+
+def ddl_fisico(df):
+    """DDL do esquema físico (usado na leitura dos formatos texto)."""
+    return ", ".join(f"`{f.name}` {f.dataType.simpleString()}" for f in df.schema.fields)
+
+
+def expandir(df, esquema):
+    """Leituras no esquema lógico original a partir do esquema compacto."""
+    for coluna, valores in esquema['dicionarios'].items():
+        df = df.withColumn(coluna, array(*[lit(v) for v in valores])[col(coluna).cast("int")])
+    for coluna, sql in esquema['derivadas'].items():
+        df = df.withColumn(coluna, expr(sql))
+    return df.select(*[col(c).cast(esquema['tipos_originais'][c]).alias(c) for c in esquema['colunas']])
+
+
+def tamanho_dicionarios(esquema):
+    """Bytes dos dicionários serializados (custo da tabela de consulta)."""
+    return len(json.dumps(esquema['dicionarios'], ensure_ascii=False).encode('utf-8'))
+
+
+# ============================================================================
+# PERSISTÊNCIA
+# ============================================================================
+
+def gravar_esquema(path, esquema):
+    """Grava o esquema compacto no diretório de dados."""
+    with open(Path(path) / NOME_ESQUEMA, 'w', encoding='utf-8') as f:
+        json.dump(esquema, f, indent=2, ensure_ascii=False, default=str)
+
+
+def ler_esquema(path):
+    """Esquema compacto do diretório, ou None se os dados estão no esquema original."""
+    try:
+        with open(Path(path) / NOME_ESQUEMA, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
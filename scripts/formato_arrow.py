@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+ARROW IPC (FEATHER V2) COMO FORMATO DE ARMAZENAMENTO - TEMA B
+================================================================================
+
+O Spark não tem DataFrameWriter/Reader para Arrow IPC. Este módulo escreve e
+lê arquivos Feather v2 pelas funções Arrow nativas do PySpark:
+
+- escrita: `mapInArrow` recebe os lotes Arrow de cada partição e os grava
+  com pyarrow.ipc (sem compressão, LZ4 ou ZSTD) num diretório temporário;
+  o driver move para o destino apenas os arquivos das tentativas que
+  concluíram (mesmo protocolo de commit dos writers do Spark)
+- leitura: um DataFrame com a lista de arquivos é expandido por
+  `mapInArrow`, que abre cada arquivo por memory mapping; sem compressão,
+  os lotes apontam direto para as páginas mapeadas (zero-copy)
+
+O formato não tem particionamento Hive-style, estatísticas por bloco nem
+pushdown: toda query lê os lotes inteiros.
+
+================================================================================
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+
+EXTENSAO = "arrow"
+DIRETORIO_TEMPORARIO = "_temporary"
+SCHEMA_COMMIT = "arquivo string, linhas long"
+
+
+def _compressao(codec):
+    """Codec do Spark (none/lz4/zstd) -> compressão do pyarrow.ipc."""
+    return None if codec in (None, 'none', 'uncompressed') else codec
+
+
+def arquivos_arrow(path):
+    """Arquivos IPC de um diretório, em ordem."""
+    return sorted(p for p in Path(path).glob(f"*.{EXTENSAO}") if not p.name.startswith(('_', '.')))
+
+
+def escrever_arrow(df, path, codec='none', max_registros=0):
+    """
+    Escreve `df` em arquivos Arrow IPC (um ou mais por partição, com até
+    `max_registros` linhas cada; 0 = sem limite). Sobrescreve `path`.
+    Retorna o total de linhas escritas.
+    """
+    destino = Path(path)
+    shutil.rmtree(destino, ignore_errors=True)
+    temporario = destino / DIRETORIO_TEMPORARIO
+    temporario.mkdir(parents=True)
+    compressao = _compressao(codec)
+
+    def escrever(lotes):
+        import pyarrow as pa
+        from pyspark import TaskContext
+
+        contexto = TaskContext.get()
+        pasta = temporario / f"tentativa_{contexto.partitionId():05d}_{contexto.attemptNumber()}"
+        pasta.mkdir(parents=True, exist_ok=True)
+        opcoes = pa.ipc.IpcWriteOptions(compression=compressao)
+        escritor, gravados, linhas = None, [], 0
+
+        def fechar():
+            escritor.close()
+            return pa.RecordBatch.from_pydict({'arquivo': [str(gravados[-1])], 'linhas': [linhas]})
+
+        for lote in lotes:
+            inicio = 0
+            while inicio < lote.num_rows:
+                if escritor is None:
+                    gravados.append(pasta / f"part-{contexto.partitionId():05d}-{len(gravados):03d}"
+                                            f".{compressao or 'none'}.{EXTENSAO}")
+                    escritor = pa.ipc.new_file(str(gravados[-1]), lote.schema, options=opcoes)
+                    linhas = 0
+                tamanho = lote.num_rows - inicio
+                if max_registros:
+                    tamanho = min(tamanho, max_registros - linhas)
+                escritor.write_batch(lote.slice(inicio, tamanho))
+                inicio += tamanho
+                linhas += tamanho
+                if max_registros and linhas >= max_registros:
+                    yield fechar()
+                    escritor = None
+        if escritor is not None:
+            yield fechar()
+
+    total = 0
+    for commit in df.mapInArrow(escrever, SCHEMA_COMMIT).collect():
+        os.rename(commit['arquivo'], destino / Path(commit['arquivo']).name)
+        total += commit['linhas']
+    shutil.rmtree(temporario, ignore_errors=True)
+    (destino / "_SUCCESS").touch()
+    return total
+
+
+def ler_arrow(spark, path):
+    """
+    DataFrame (lazy) sobre os arquivos IPC de `path`, lidos por memory
+    mapping numa task por arquivo.
+    """
+    import pyarrow as pa
+    from pyspark.sql.pandas.types import from_arrow_schema
+
+    arquivos = [str(a) for a in arquivos_arrow(path)]
+    if not arquivos:
+        raise FileNotFoundError(f"Nenhum arquivo .{EXTENSAO} em {path}")
+    with pa.memory_map(arquivos[0]) as fonte:
+        schema = from_arrow_schema(pa.ipc.open_file(fonte).schema)
+
+    def ler(lotes):
+        import pyarrow as pa
+
+        for lote in lotes:
+            for arquivo in lote.column(0).to_pylist():
+                with pa.memory_map(arquivo) as fonte:
+                    leitor = pa.ipc.open_file(fonte)
+                    for i in range(leitor.num_record_batches):
+                        yield leitor.get_batch(i)
+
+    lista = spark.sparkContext.parallelize([(a,) for a in arquivos], len(arquivos))
+    return spark.createDataFrame(lista, "arquivo string").mapInArrow(ler, schema)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+GERADOR DE LOTES PARA INGESTÃO CONTÍNUA - TEMA B
+================================================================================
+
+Processo independente que grava pequenos lotes CSV ou JSON (um objeto por
+linha) de leituras de sensores num diretório de entrada, a uma taxa
+configurável, simulando sensores que enviam dados continuamente.
+
+Cada lote é gravado com nome oculto (prefixo '.', ignorado pelo leitor de
+streaming do Spark) e renomeado ao final, de modo que nunca é lido pela
+metade. O nome final carrega o instante da entrega em nanossegundos
+(lote_<seq>_<ns>.<ext>), usado para medir a latência ponta a ponta.
+
+Uso:
+    python gerador_arquivos.py DIRETORIO --formato CSV --lotes-por-segundo 2 \\
+        --linhas-por-lote 500 --duracao 120 --config '{"faixas": {...}, ...}'
+
+================================================================================
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+
+FORMATO_TIMESTAMP = "%Y-%m-%d %H:%M:%S"   # Mesmo padrão de TIMESTAMP_FORMAT no Spark
+ATRASO_MAXIMO_LEITURA_S = 5               # Leitura medida até 5s antes do envio
+COLUNAS = ["sensor_id", "sensor_type", "location", "city", "timestamp",
+           "value", "unit", "battery_level", "signal_strength", "status"]
+PADRAO_NOME = re.compile(r"lote_\d+_(\d+)\.\w+$")
+
+
+def instante_entrega(arquivo):
+    """Instante (ns desde a época) em que o lote foi entregue, pelo nome do arquivo."""
+    return int(PADRAO_NOME.search(str(arquivo)).group(1))
+
+
+def gerar_leitura(rng, config, agora):
+    """Uma leitura aleatória no formato do dataset IoT."""
+    tipo = rng.choice(list(config['faixas']))
+    minimo, amplitude, unidade = config['faixas'][tipo]
+    bateria = rng.randint(10, 100)
+    medida = agora - timedelta(seconds=rng.uniform(0, ATRASO_MAXIMO_LEITURA_S))
+    return {
+        'sensor_id': f"SENSOR_{rng.randrange(config['num_sensores']):04d}",
+        'sensor_type': tipo,
+        'location': rng.choice(config['localizacoes']),
+        'city': rng.choice(config['cidades']),
+        'timestamp': medida.strftime(FORMATO_TIMESTAMP),
+        'value': round(minimo + rng.random() * amplitude, 2),
+        'unit': unidade,
+        'battery_level': bateria,
+        'signal_strength': rng.randint(-90, -30),
+        'status': "ACTIVE" if bateria > 20 else "LOW_BATTERY",
+    }
+
+
+def gravar_lote(diretorio, seq, linhas, formato):
+    """Grava o lote num arquivo oculto e o renomeia para o nome final."""
+    extensao = formato.lower()
+    temporario = Path(diretorio) / f".lote_{seq:06d}.{extensao}.tmp"
+    with open(temporario, 'w', encoding='utf-8', newline='') as f:
+        if formato == 'CSV':
+            writer = csv.DictWriter(f, fieldnames=COLUNAS)
+            writer.writeheader()
+            writer.writerows(linhas)
+        else:
+            for linha in linhas:
+                f.write(json.dumps(linha, ensure_ascii=False) + "\n")
+    final = Path(diretorio) / f"lote_{seq:06d}_{time.time_ns()}.{extensao}"
+    os.rename(temporario, final)
+    return final
+
+
+def gerar_lotes(diretorio, formato, linhas_por_lote, lotes_por_segundo, duracao_s, seed, config):
+    """
+    Grava lotes em ritmo constante por `duracao_s` segundos.
+    Retorna o número de lotes gravados.
+    """
+    Path(diretorio).mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    intervalo = 1.0 / lotes_por_segundo
+    inicio = time.monotonic()
+    proximo = inicio
+    seq = 0
+    while time.monotonic() - inicio < duracao_s:
+        agora = datetime.now(timezone.utc).replace(tzinfo=None)
+        gravar_lote(diretorio, seq, [gerar_leitura(rng, config, agora) for _ in range(linhas_por_lote)],
+                    formato)
+        seq += 1
+        proximo += intervalo
+        time.sleep(max(0.0, proximo - time.monotonic()))
+    return seq
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gerador de lotes de leituras IoT para streaming")
+    parser.add_argument("diretorio", help="Diretório de entrada monitorado pelo streaming")
+    parser.add_argument("--formato", choices=["CSV", "JSON"], default="CSV")
+    parser.add_argument("--linhas-por-lote", type=int, default=500)
+    parser.add_argument("--lotes-por-segundo", type=float, default=2.0)
+    parser.add_argument("--duracao", type=float, default=60.0, help="Duração em segundos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--config", required=True,
+                        help="JSON com faixas, localizacoes, cidades e num_sensores")
+    args = parser.parse_args(argv)
+
+    lotes = gerar_lotes(args.diretorio, args.formato, args.linhas_por_lote, args.lotes_por_segundo,
+                        args.duracao, args.seed, json.loads(args.config))
+    print(f"✓ Gerador: {lotes} lotes ({lotes * args.linhas_por_lote:,} leituras) em {args.diretorio}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
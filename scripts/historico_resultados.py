@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+HISTÓRICO DE RESULTADOS (SQLITE, SOMENTE INCLUSÃO) - TEMA B
+================================================================================
+
+Cada execução do modo completo é registrada num banco SQLite local
+(output/historico.sqlite) com:
+
+- a impressão digital do ambiente: versões do Spark, Java e Python, CPUs,
+  sistema, configurações da sessão e do benchmark e hash do dataset
+- o relatório completo, no esquema versionado descrito abaixo
+- as amostras de tempo de cada (formato, query), para comparações
+
+O banco é somente inclusão: gatilhos impedem UPDATE e DELETE.
+
+Esquema do relatório (VERSAO_ESQUEMA_RELATORIO = 2), também gravado em
+output/relatorio_comparativo.json e consumido por gerar_graficos_tema_b.py:
+
+- versao_esquema: int
+- metadata: {data_execucao, total_registros, execucao_id, ambiente_hash}
+- resumo: {formato: {tamanho_mb, reducao_percentual, leitura_s, filtro_s,
+  selecao_s, agregacao_s, leitura_p95_s, memoria_pico_bytes}}
+- formatos: resultados detalhados de `analisar_performance`
+- rankings, escrita, codecs, sessao, workload: seções opcionais
+
+O resumo é o contrato estável: campos novos podem ser acrescentados, mas
+renomear ou remover um campo exige nova versão do esquema.
+
+Uso:
+    python historico_resultados.py listar
+    python historico_resultados.py comparar [BASE NOVA] [--alfa 0.05] [--limiar 0.05]
+
+================================================================================
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+from benchmark import teste_permutacao, amostras_suficientes, NIVEL_SIGNIFICANCIA
+
+
+VERSAO_ESQUEMA_RELATORIO = 2
+BANCO_PADRAO = (Path("/workspace") if Path("/workspace").exists() else Path("/app")) \
+    / "output" / "historico.sqlite"
+LIMIAR_REGRESSAO = 0.05   # Lentidão mínima (fração da mediana) para sinalizar regressão
+# Configurações da sessão registradas na impressão digital
+PREFIXOS_CONFIG_SPARK = ("spark.sql.", "spark.memory.", "spark.driver.memory", "spark.executor.memory",
+                         "spark.scheduler.mode", "spark.master")
+# Queries do resumo: campo -> nome da query em `analisar_performance`
+QUERIES_RESUMO = {'leitura_s': 'leitura', 'filtro_s': 'filtro', 'selecao_s': 'selecao',
+                  'agregacao_s': 'agregacao'}
+
+ESQUEMA_BANCO = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    instante TEXT NOT NULL,
+    modo TEXT NOT NULL,
+    versao_esquema INTEGER NOT NULL,
+    ambiente_hash TEXT NOT NULL,
+    ambiente TEXT NOT NULL,
+    relatorio TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS medidas (
+    execucao_id INTEGER NOT NULL REFERENCES execucoes(id),
+    formato TEXT NOT NULL,
+    query TEXT NOT NULL,
+    mediana_s REAL NOT NULL,
+    amostras TEXT NOT NULL,
+    PRIMARY KEY (execucao_id, formato, query)
+);
+CREATE TRIGGER IF NOT EXISTS execucoes_sem_update BEFORE UPDATE ON execucoes
+BEGIN SELECT RAISE(ABORT, 'historico somente inclusao'); END;
+CREATE TRIGGER IF NOT EXISTS execucoes_sem_delete BEFORE DELETE ON execucoes
+BEGIN SELECT RAISE(ABORT, 'historico somente inclusao'); END;
+CREATE TRIGGER IF NOT EXISTS medidas_sem_update BEFORE UPDATE ON medidas
+BEGIN SELECT RAISE(ABORT, 'historico somente inclusao'); END;
+CREATE TRIGGER IF NOT EXISTS medidas_sem_delete BEFORE DELETE ON medidas
+BEGIN SELECT RAISE(ABORT, 'historico somente inclusao'); END;
+"""
+
+
+# ============================================================================
+# AMBIENTE E ESQUEMA DO RELATÓRIO
+# ============================================================================
+
+def hash_ambiente(ambiente):
+    """SHA-256 da impressão digital do ambiente."""
+    return hashlib.sha256(json.dumps(ambiente, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def impressao_ambiente(spark, dataset, configuracao):
+    """
+    Impressão digital do ambiente de uma execução. `dataset` traz o hash da
+    origem (ver manifesto.hash_origem) e o número de linhas; `configuracao`,
+    os parâmetros do benchmark (rodadas, codecs, layout).
+    """
+    return {
+        'spark': spark.version,
+        'java': spark._jvm.java.lang.System.getProperty("java.version"),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'sistema': platform.platform(),
+        'config_spark': dict(sorted(
+            (chave, valor) for chave, valor in spark.sparkContext.getConf().getAll()
+            if chave.startswith(PREFIXOS_CONFIG_SPARK)
+        )),
+        'config_benchmark': configuracao,
+        'dataset': dataset,
+    }
+
+
+def resumo_relatorio(resultados_performance):
+    """Seção `resumo` do esquema versionado, a partir de `analisar_performance`."""
+    tamanho_csv = resultados_performance.get('CSV', {}).get('size_mb')
+    resumo = {}
+    for formato, r in resultados_performance.items():
+        resumo[formato] = {
+            'tamanho_mb': r['size_mb'],
+            'reducao_percentual': ((tamanho_csv - r['size_mb']) / tamanho_csv * 100
+                                   if tamanho_csv else None),
+            **{campo: r['queries'][nome]['total']['mediana'] if nome in r['queries'] else None
+               for campo, nome in QUERIES_RESUMO.items()},
+            'leitura_p95_s': r['queries']['leitura']['total']['p95'] if 'leitura' in r['queries'] else None,
+            'memoria_pico_bytes': r.get('memoria_pico_bytes'),
+        }
+    return resumo
+
+
+# ============================================================================
+# BANCO
+# ============================================================================
+
+@contextmanager
+def conectar(banco=BANCO_PADRAO):
+    """Conexão ao banco de histórico (criado se preciso), numa transação."""
+    Path(banco).parent.mkdir(parents=True, exist_ok=True)
+    conexao = sqlite3.connect(str(banco))
+    try:
+        conexao.executescript(ESQUEMA_BANCO)
+        with conexao:
+            yield conexao
+    finally:
+        conexao.close()
+
+
+def registrar_execucao(banco, relatorio, ambiente, modo='completo'):
+    """
+    Inclui uma execução no histórico e retorna seu id. `relatorio` segue o
+    esquema versionado e tem as amostras em formatos/<f>/queries/<q>.
+    """
+    with conectar(banco) as conexao:
+        cursor = conexao.execute(
+            "INSERT INTO execucoes (instante, modo, versao_esquema, ambiente_hash, ambiente, relatorio) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (relatorio['metadata']['data_execucao'], modo, relatorio['versao_esquema'],
+             hash_ambiente(ambiente), json.dumps(ambiente, ensure_ascii=False, default=str),
+             json.dumps(relatorio, ensure_ascii=False, default=str)))
+        execucao_id = cursor.lastrowid
+        conexao.executemany(
+            "INSERT INTO medidas (execucao_id, formato, query, mediana_s, amostras) VALUES (?, ?, ?, ?, ?)",
+            [(execucao_id, formato, nome, q['total']['mediana'], json.dumps(q['amostras']))
+             for formato, r in relatorio['formatos'].items()
+             for nome, q in r['queries'].items()])
+    return execucao_id
+
+
+def ultimas_execucoes(conexao, limite):
+    """Execuções mais recentes: (id, instante, modo, ambiente_hash, ambiente)."""
+    return [
+        (execucao_id, instante, modo, ambiente_hash, json.loads(ambiente))
+        for execucao_id, instante, modo, ambiente_hash, ambiente in conexao.execute(
+            "SELECT id, instante, modo, ambiente_hash, ambiente FROM execucoes ORDER BY id DESC LIMIT ?",
+            (limite,))
+    ]
+
+
+def carregar_relatorio_execucao(banco, execucao_id):
+    """Relatório (esquema versionado) de uma execução registrada."""
+    with conectar(banco) as conexao:
+        linha = conexao.execute("SELECT relatorio FROM execucoes WHERE id = ?", (execucao_id,)).fetchone()
+    if linha is None:
+        raise KeyError(f"Execução {execucao_id} não encontrada em {banco}")
+    relatorio = json.loads(linha[0])
+    relatorio['metadata']['execucao_id'] = execucao_id
+    return relatorio
+
+
+def _medidas(conexao, execucao_id):
+    return {
+        (formato, query): json.loads(amostras)
+        for formato, query, amostras in conexao.execute(
+            "SELECT formato, query, amostras FROM medidas WHERE execucao_id = ?", (execucao_id,))
+    }
+
+
+# ============================================================================
+# COMPARAÇÃO ENTRE EXECUÇÕES
+# ============================================================================
+
+def comparar_execucoes(banco, base=None, nova=None, alfa=NIVEL_SIGNIFICANCIA, limiar=LIMIAR_REGRESSAO):
+    """
+    Compara as medidas comuns de duas execuções (por padrão, a última
+    contra a anterior, ou contra `base` se informada). Uma (formato, query) é regressão se a mediana nova for mais
+    de `limiar` maior que a da base e o teste de permutação sobre as
+    amostras der p < `alfa`. Se as amostras são poucas demais para o teste
+    atingir `alfa`, a medida é marcada com `amostras_insuficientes` em vez
+    de passar por "sem regressão".
+    """
+    with conectar(banco) as conexao:
+        if nova is None:
+            ids = [linha[0] for linha in ultimas_execucoes(conexao, 2)]
+            if len(ids) < (1 if base is not None else 2):
+                raise ValueError("São necessárias ao menos duas execuções no histórico")
+            nova, base = ids[0], base if base is not None else ids[1]
+        if base == nova:
+            raise ValueError(f"A execução base ({base}) é a mesma que a nova: informe outra base para comparar")
+        ambientes = dict(conexao.execute(
+            "SELECT id, ambiente_hash FROM execucoes WHERE id IN (?, ?)", (base, nova)))
+        if len(ambientes) < 2:
+            raise KeyError(f"Execuções {base} e {nova} precisam existir em {banco}")
+        medidas_base, medidas_nova = _medidas(conexao, base), _medidas(conexao, nova)
+
+    comparacoes = []
+    for chave in sorted(set(medidas_base) & set(medidas_nova)):
+        a, b = medidas_base[chave], medidas_nova[chave]
+        mediana_a, mediana_b = statistics.median(a), statistics.median(b)
+        p = teste_permutacao(a, b) if len(a) > 1 and len(b) > 1 else None
+        insuficientes = not amostras_suficientes(len(a), len(b), alfa)
+        significativo = p is not None and p < alfa and not insuficientes
+        variacao = mediana_b / mediana_a - 1 if mediana_a else None
+        comparacoes.append({
+            'formato': chave[0],
+            'query': chave[1],
+            'mediana_base_s': mediana_a,
+            'mediana_nova_s': mediana_b,
+            'variacao': variacao,
+            'p_valor': p,
+            'amostras_insuficientes': insuficientes,
+            'regressao': bool(significativo and variacao is not None and variacao > limiar),
+            'melhora': bool(significativo and variacao is not None and variacao < -limiar),
+        })
+    return {
+        'base': base,
+        'nova': nova,
+        'mesmo_ambiente': ambientes[base] == ambientes[nova],
+        'alfa': alfa,
+        'limiar': limiar,
+        'comparacoes': comparacoes,
+    }
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def _listar(banco, limite):
+    with conectar(banco) as conexao:
+        execucoes = ultimas_execucoes(conexao, limite)
+    print(f"{'Id':>5} {'Instante':<20} {'Modo':<10} {'Ambiente':<13} {'Spark':<7} {'Dataset':<13} {'Linhas':>12}")
+    print("-" * 86)
+    for execucao_id, instante, modo, ambiente_hash, ambiente in execucoes:
+        dataset = ambiente.get('dataset') or {}
+        print(f"{execucao_id:>5} {instante[:19]:<20} {modo:<10} {ambiente_hash[:12]:<13} "
+              f"{ambiente.get('spark', '-'):<7} {(dataset.get('hash') or '-')[:12]:<13} "
+              f"{dataset.get('linhas') or 0:>12,}")
+    return 0
+
+
+def _comparar(banco, base, nova, alfa, limiar):
+    resultado = comparar_execucoes(banco, base, nova, alfa, limiar)
+    print(f"Execução {resultado['nova']} vs base {resultado['base']} "
+          f"(alfa {alfa}, limiar {limiar * 100:.0f}%)")
+    if not resultado['mesmo_ambiente']:
+        print("⚠ Ambientes diferentes (versões, configuração ou dataset): "
+              "variações podem não ser regressões do código")
+    print("-" * 80)
+    print(f"{'Formato':<10} {'Query':<24} {'Base (s)':>9} {'Nova (s)':>9} {'Variação':>9} {'p':>7}")
+    print("-" * 80)
+    for c in resultado['comparacoes']:
+        marca = "  ✗ regressão" if c['regressao'] else ("  ✓ melhora" if c['melhora'] else "")
+        if c['amostras_insuficientes']:
+            marca = "  ⚠ amostras insuficientes"
+        variacao = f"{c['variacao'] * 100:+.1f}%" if c['variacao'] is not None else "-"
+        p = f"{c['p_valor']:.3f}" if c['p_valor'] is not None else "-"
+        print(f"{c['formato']:<10} {c['query'][:24]:<24} {c['mediana_base_s']:>9.3f} "
+              f"{c['mediana_nova_s']:>9.3f} {variacao:>9} {p:>7}{marca}")
+    regressoes = sum(c['regressao'] for c in resultado['comparacoes'])
+    insuficientes = sum(c['amostras_insuficientes'] for c in resultado['comparacoes'])
+    print("-" * 80)
+    print(f"{regressoes} regressões significativas em {len(resultado['comparacoes'])} medidas")
+    if insuficientes:
+        print(f"⚠ {insuficientes} medidas com amostras insuficientes para p < {alfa}: "
+              "aumente as rodadas medidas (trials) para poder detectar regressões")
+    return 1 if regressoes else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Histórico de resultados do benchmark (SQLite)")
+    parser.add_argument("--banco", default=str(BANCO_PADRAO), help=f"Banco SQLite (padrão: {BANCO_PADRAO})")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    listar = subparsers.add_parser("listar", help="Lista as execuções registradas")
+    listar.add_argument("--limite", type=int, default=20)
+    comparar = subparsers.add_parser(
+        "comparar", help="Compara duas execuções (padrão: as duas últimas); sai com 1 se houver regressão")
+    comparar.add_argument("base", nargs="?", type=int)
+    comparar.add_argument("nova", nargs="?", type=int)
+    comparar.add_argument("--alfa", type=float, default=NIVEL_SIGNIFICANCIA)
+    comparar.add_argument("--limiar", type=float, default=LIMIAR_REGRESSAO,
+                          help="Lentidão mínima, em fração da mediana base (padrão: 0.05)")
+    args = parser.parse_args(argv)
+
+    if args.comando == "listar":
+        return _listar(args.banco, args.limite)
+    try:
+        return _comparar(args.banco, args.base, args.nova, args.alfa, args.limiar)
+    except (KeyError, ValueError) as e:
+        print(f"❌ ERRO: {e}")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+INSPEÇÃO DE RODAPÉS PARQUET/ORC - TEMA B
+================================================================================
+
+Lê apenas os metadados (rodapés) dos arquivos Parquet e ORC, sem varrer os
+dados, usando as bibliotecas parquet-mr e ORC que já estão no classpath do
+Spark (via py4j).
+
+Cada bloco (row group no Parquet, stripe no ORC) é descrito por número de
+linhas, bytes e, por coluna, estatísticas min/max/nulos, bytes ocupados e
+codificações. Timestamps são normalizados para microssegundos desde a época
+(UTC), de modo que as estatísticas dos dois formatos são comparáveis entre
+si e com predicados.
+
+A anatomia do armazenamento (`anatomia_armazenamento`) agrega os blocos:
+bytes comprimidos e descomprimidos por coluna, codificações, tamanho dos
+blocos, cobertura de estatísticas e o custo dos metadados (rodapés e
+índices) em relação ao tamanho dos arquivos.
+
+================================================================================
+"""
+
+import os
+import statistics
+import struct
+from datetime import datetime
+from pathlib import Path
+
+
+EPOCA = datetime(1970, 1, 1)
+# Streams de índice do ORC (contados como metadados, não como dados da coluna)
+STREAMS_INDICE_ORC = {"ROW_INDEX", "BLOOM_FILTER", "BLOOM_FILTER_UTF8"}
+
+
+# ============================================================================
+# UTILITÁRIOS
+# ============================================================================
+
+def _lista(java_list):
+    """Converte uma java.util.List (via py4j) em lista Python."""
+    return [java_list.get(i) for i in range(java_list.size())]
+
+
+def para_micros(valor):
+    """Normaliza datetime (UTC) para microssegundos desde a época."""
+    if isinstance(valor, datetime):
+        return int((valor - EPOCA).total_seconds() * 1_000_000)
+    return valor
+
+
+def arquivos_do_formato(path, extensao):
+    """Arquivos de dados de um diretório de saída do Spark (recursivo)."""
+    return sorted(
+        str(f) for f in Path(path).rglob(f"*{extensao}")
+        if f.is_file() and not f.name.startswith(('_', '.'))
+    )
+
+
+# ============================================================================
+# PARQUET
+# ============================================================================
+
+def _valor_parquet(coluna, valor):
+    """Converte min/max do parquet-mr para tipo Python comparável."""
+    tipo = coluna.getPrimitiveType()
+    nome_tipo = tipo.getPrimitiveTypeName().name()
+    anotacao = str(tipo.getLogicalTypeAnnotation())
+    if nome_tipo == "BINARY":
+        return valor.toStringUsingUTF8()
+    if nome_tipo == "INT64" and "TIMESTAMP" in anotacao:
+        if "MILLIS" in anotacao:
+            return valor * 1000
+        if "NANOS" in anotacao:
+            return valor // 1000
+    return valor
+
+
+def _codificacoes_parquet(coluna):
+    """Codificações do column chunk e se o dicionário caiu para PLAIN."""
+    codificacoes = sorted(str(e.name()) for e in coluna.getEncodings())
+    stats = coluna.getEncodingStats()
+    fallback = (stats is not None and stats.hasDictionaryEncodedPages()
+                and stats.hasNonDictionaryEncodedPages())
+    return codificacoes, fallback
+
+
+def tamanho_rodape_parquet(arquivo):
+    """Bytes do rodapé de um arquivo Parquet (metadados + comprimento + 'PAR1')."""
+    with open(arquivo, 'rb') as f:
+        f.seek(-8, os.SEEK_END)
+        return struct.unpack('<I', f.read(4))[0] + 8
+
+
+def blocos_parquet(spark, path):
+    """
+    Row groups de todos os arquivos Parquet de `path`, a partir dos rodapés.
+    """
+    jvm = spark._jvm
+    conf = spark._jsc.hadoopConfiguration()
+    blocos = []
+    for arquivo in arquivos_do_formato(path, ".parquet"):
+        entrada = jvm.org.apache.parquet.hadoop.util.HadoopInputFile.fromPath(
+            jvm.org.apache.hadoop.fs.Path(arquivo), conf)
+        leitor = jvm.org.apache.parquet.hadoop.ParquetFileReader.open(entrada)
+        try:
+            rodape = leitor.getFooter()
+        finally:
+            leitor.close()
+        for indice, bloco in enumerate(_lista(rodape.getBlocks())):
+            colunas = {}
+            for coluna in _lista(bloco.getColumns()):
+                stats = coluna.getStatistics()
+                tem_stats = stats is not None and not stats.isEmpty() and stats.hasNonNullValue()
+                codificacoes, fallback = _codificacoes_parquet(coluna)
+                colunas[coluna.getPath().toDotString()] = {
+                    'min': _valor_parquet(coluna, stats.genericGetMin()) if tem_stats else None,
+                    'max': _valor_parquet(coluna, stats.genericGetMax()) if tem_stats else None,
+                    'nulos': stats.getNumNulls() if stats is not None and not stats.isEmpty() else None,
+                    'tem_estatisticas': tem_stats,
+                    'bytes_comprimidos': coluna.getTotalSize(),
+                    'bytes_descomprimidos': coluna.getTotalUncompressedSize(),
+                    'codificacoes': codificacoes,
+                    'fallback_dicionario': fallback,
+                    'indice_paginas': coluna.getColumnIndexReference() is not None,
+                }
+            blocos.append({
+                'arquivo': arquivo,
+                'indice': indice,
+                'linhas': bloco.getRowCount(),
+                'bytes_comprimidos': bloco.getCompressedSize(),
+                'bytes_descomprimidos': bloco.getTotalByteSize(),
+                'colunas': colunas,
+            })
+    return blocos
+
+
+# ============================================================================
+# ORC
+# ============================================================================
+
+def _estatisticas_orc(stats):
+    """Extrai min/max de um ColumnStatistics do ORC, conforme o tipo."""
+    classe = stats.getClass().getSimpleName()
+    if stats.getNumberOfValues() == 0:
+        return None, None
+    if "Timestamp" in classe:
+        return stats.getMinimumUTC().getTime() * 1000, stats.getMaximumUTC().getTime() * 1000
+    if any(t in classe for t in ("String", "Integer", "Double")):
+        return stats.getMinimum(), stats.getMaximum()
+    return None, None
+
+
+def _streams_orc(rodape_stripe):
+    """Bytes de dados por id de coluna, a partir dos streams do rodapé da stripe."""
+    por_coluna = {}
+    for stream in _lista(rodape_stripe.getStreamsList()):
+        if str(stream.getKind().name()) not in STREAMS_INDICE_ORC:
+            por_coluna[stream.getColumn()] = por_coluna.get(stream.getColumn(), 0) + stream.getLength()
+    return por_coluna
+
+
+def blocos_orc(spark, path):
+    """
+    Stripes de todos os arquivos ORC de `path`, a partir dos rodapés.
+
+    Os bytes e a codificação de cada coluna vêm do rodapé da stripe, lido
+    por um RecordReader sem nenhuma stripe selecionada (range vazio), que
+    não lê dados.
+    """
+    jvm = spark._jvm
+    conf = spark._jsc.hadoopConfiguration()
+    blocos = []
+    for arquivo in arquivos_do_formato(path, ".orc"):
+        leitor = jvm.org.apache.orc.OrcFile.createReader(
+            jvm.org.apache.hadoop.fs.Path(arquivo), jvm.org.apache.orc.OrcFile.readerOptions(conf))
+        try:
+            nomes = _lista(leitor.getSchema().getFieldNames())
+            stripes = _lista(leitor.getStripes())
+            stats_stripes = _lista(leitor.getStripeStatistics())
+            linhas_leitor = leitor.rows(leitor.options().range(0, 0))
+            try:
+                rodapes = [linhas_leitor.readStripeFooter(stripe) for stripe in stripes]
+            finally:
+                linhas_leitor.close()
+        finally:
+            leitor.close()
+        for indice, (stripe, stats_stripe, rodape) in enumerate(zip(stripes, stats_stripes, rodapes)):
+            por_coluna = stats_stripe.getColumnStatistics()
+            bytes_coluna = _streams_orc(rodape)
+            colunas = {}
+            # id 0 é a struct raiz; os campos de primeiro nível vêm em seguida
+            for i, nome in enumerate(nomes):
+                stats = por_coluna[i + 1]
+                minimo, maximo = _estatisticas_orc(stats)
+                colunas[nome] = {
+                    'min': minimo,
+                    'max': maximo,
+                    'nulos': stripe.getNumberOfRows() - stats.getNumberOfValues(),
+                    'tem_estatisticas': minimo is not None,
+                    'bytes_comprimidos': bytes_coluna.get(i + 1, 0),
+                    'codificacoes': [str(rodape.getColumns(i + 1).getKind().name())],
+                }
+            blocos.append({
+                'arquivo': arquivo,
+                'indice': indice,
+                'linhas': stripe.getNumberOfRows(),
+                'bytes_comprimidos': stripe.getLength(),
+                'bytes_dados': stripe.getDataLength(),
+                'bytes_indice': stripe.getIndexLength(),
+                'bytes_rodape': stripe.getFooterLength(),
+                'colunas': colunas,
+            })
+    return blocos
+
+
+# ============================================================================
+# PODA POR ESTATÍSTICAS
+# ============================================================================
+
+def bloco_pode_ser_pulado(bloco, predicado):
+    """
+    Verifica, pelas estatísticas min/max, se nenhuma linha do bloco pode
+    satisfazer o predicado.
+
+    `predicado` é uma lista de (coluna, mínimo, máximo) combinados com AND;
+    predicados pontuais usam mínimo == máximo.
+    """
+    for coluna, inferior, superior in predicado:
+        stats = bloco['colunas'].get(coluna)
+        if not stats or not stats['tem_estatisticas']:
+            continue
+        if stats['max'] < para_micros(inferior) or stats['min'] > para_micros(superior):
+            return True
+    return False
+
+
+def contar_blocos_pulados(blocos, predicado):
+    """Retorna (blocos_pulados, total_de_blocos) para o predicado."""
+    pulados = sum(1 for b in blocos if bloco_pode_ser_pulado(b, predicado))
+    return pulados, len(blocos)
+
+
+# ============================================================================
+# ANATOMIA DO ARMAZENAMENTO
+# ============================================================================
+
+def tamanho_bruto_orc(spark, arquivo):
+    """
+    Tamanho bruto (descomprimido, estimado pelo writer do ORC) de cada
+    coluna de primeiro nível de um arquivo.
+    """
+    jvm = spark._jvm
+    leitor = jvm.org.apache.orc.OrcFile.createReader(
+        jvm.org.apache.hadoop.fs.Path(arquivo),
+        jvm.org.apache.orc.OrcFile.readerOptions(spark._jsc.hadoopConfiguration()))
+    try:
+        return {nome: leitor.getRawDataSizeOfColumns([nome])
+                for nome in _lista(leitor.getSchema().getFieldNames())}
+    finally:
+        leitor.close()
+
+
+def _metadados_parquet(blocos_por_arquivo):
+    """Rodapé e demais bytes fora dos column chunks (magic, padding)."""
+    rodape = sum(tamanho_rodape_parquet(a) for a in blocos_por_arquivo)
+    fora_dados = sum(os.path.getsize(a) - sum(b['bytes_comprimidos'] for b in blocos)
+                     for a, blocos in blocos_por_arquivo.items())
+    return {'bytes': fora_dados, 'bytes_rodape': rodape, 'bytes_outros': fora_dados - rodape}
+
+
+def _metadados_orc(blocos_por_arquivo):
+    """Índices e rodapés das stripes, mais rodapé/metadados/postscript do arquivo."""
+    indice = sum(b['bytes_indice'] for blocos in blocos_por_arquivo.values() for b in blocos)
+    rodape_stripes = sum(b['bytes_rodape'] for blocos in blocos_por_arquivo.values() for b in blocos)
+    rodape_arquivo = sum(os.path.getsize(a) - sum(b['bytes_comprimidos'] for b in blocos)
+                         for a, blocos in blocos_por_arquivo.items())
+    return {'bytes': indice + rodape_stripes + rodape_arquivo, 'bytes_indice': indice,
+            'bytes_rodape_stripes': rodape_stripes, 'bytes_rodape': rodape_arquivo}
+
+
+def anatomia_armazenamento(spark, formato, path):
+    """
+    Anatomia de uma tabela Parquet ou ORC, apenas pelos rodapés.
+
+    Retorna arquivos, linhas e bytes totais; quantidade e tamanho dos blocos
+    (row groups/stripes); por coluna, bytes comprimidos e descomprimidos,
+    fração dos bytes de dados, codificações e cobertura de estatísticas
+    min/max; e os bytes de metadados (rodapés, índices) com sua fração do
+    total. No ORC os bytes descomprimidos são o tamanho bruto estimado pelo
+    writer (por arquivo), não o tamanho dos streams descomprimidos.
+    """
+    if formato == 'Parquet':
+        blocos = blocos_parquet(spark, path)
+    elif formato == 'ORC':
+        blocos = blocos_orc(spark, path)
+    else:
+        raise ValueError(f"Anatomia disponível apenas para Parquet e ORC, não {formato}")
+
+    blocos_por_arquivo = {}
+    for bloco in blocos:
+        blocos_por_arquivo.setdefault(bloco['arquivo'], []).append(bloco)
+    bytes_arquivos = sum(os.path.getsize(a) for a in arquivos_do_formato(
+        path, ".parquet" if formato == 'Parquet' else ".orc"))
+
+    colunas = {}
+    for bloco in blocos:
+        for nome, c in bloco['colunas'].items():
+            acumulado = colunas.setdefault(nome, {
+                'bytes_comprimidos': 0, 'bytes_descomprimidos': 0, 'codificacoes': set(),
+                'blocos_com_estatisticas': 0, 'blocos': 0, 'fallback_dicionario': 0,
+            })
+            acumulado['bytes_comprimidos'] += c['bytes_comprimidos']
+            acumulado['bytes_descomprimidos'] += c.get('bytes_descomprimidos') or 0
+            acumulado['codificacoes'].update(c['codificacoes'])
+            acumulado['blocos_com_estatisticas'] += c['tem_estatisticas']
+            acumulado['blocos'] += 1
+            acumulado['fallback_dicionario'] += c.get('fallback_dicionario', False)
+    if formato == 'ORC':
+        for arquivo in blocos_por_arquivo:
+            for nome, bruto in tamanho_bruto_orc(spark, arquivo).items():
+                if nome in colunas:
+                    colunas[nome]['bytes_descomprimidos'] += bruto
+
+    bytes_dados = sum(c['bytes_comprimidos'] for c in colunas.values())
+    for c in colunas.values():
+        c['codificacoes'] = sorted(c['codificacoes'])
+        c['fracao_dados'] = c['bytes_comprimidos'] / bytes_dados if bytes_dados else None
+        c['taxa_compressao'] = (c['bytes_descomprimidos'] / c['bytes_comprimidos']
+                                if c['bytes_comprimidos'] else None)
+        c['cobertura_estatisticas'] = c['blocos_com_estatisticas'] / c['blocos'] if c['blocos'] else None
+
+    metadados = (_metadados_parquet if formato == 'Parquet' else _metadados_orc)(blocos_por_arquivo)
+    metadados['fracao'] = metadados['bytes'] / bytes_arquivos if bytes_arquivos else None
+    tamanhos = [b['bytes_comprimidos'] for b in blocos]
+    return {
+        'formato': formato,
+        'arquivos': len(blocos_por_arquivo),
+        'bytes_arquivos': bytes_arquivos,
+        'linhas': sum(b['linhas'] for b in blocos),
+        'blocos': {
+            'quantidade': len(blocos),
+            'por_arquivo': len(blocos) / len(blocos_por_arquivo) if blocos_por_arquivo else 0,
+            'linhas_mediana': statistics.median(b['linhas'] for b in blocos) if blocos else 0,
+            'bytes_min': min(tamanhos, default=0),
+            'bytes_mediana': statistics.median(tamanhos) if tamanhos else 0,
+            'bytes_max': max(tamanhos, default=0),
+        },
+        'colunas': dict(sorted(colunas.items(), key=lambda item: -item[1]['bytes_comprimidos'])),
+        'metadados': metadados,
+    }
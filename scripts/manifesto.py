@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+MANIFESTO DOS DIRETÓRIOS DE SAÍDA - TEMA B
+================================================================================
+
+Cada diretório escrito por `salvar_em_formatos` recebe um manifesto
+(`_manifesto.json`, ignorado pelo Spark por começar com `_`) que descreve
+como o artefato foi produzido:
+
+- origem: hash do plano lógico da origem (sem os ids de expressão, que
+  mudam a cada sessão) e dos arquivos que ela lê (caminho, tamanho, mtime)
+- schema da origem, formato, codec e layout de escrita
+- versão do Spark
+- lista de arquivos de dados com seus tamanhos, e o tempo da escrita
+
+Numa execução seguinte, um artefato é reaproveitado se a descrição
+esperada for idêntica à registrada e os arquivos em disco forem exatamente
+os listados (mesmos nomes e tamanhos). Qualquer diferença — origem nova,
+opção de escrita alterada, arquivo anexado, removido ou compactado — torna
+o artefato obsoleto e ele é reescrito.
+
+================================================================================
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+
+NOME_MANIFESTO = "_manifesto.json"
+VERSAO_MANIFESTO = 1
+# Ids de expressão do Catalyst (ex.: value#12, count#34L), diferentes a cada sessão
+PADRAO_ID_EXPRESSAO = re.compile(r"#\d+L?")
+
+
+def _json_canonico(valor):
+    return json.dumps(valor, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def hash_origem(df):
+    """
+    SHA-256 da origem de um DataFrame: plano lógico analisado normalizado e
+    impressão digital (caminho, tamanho, mtime) dos arquivos que ele lê.
+    """
+    h = hashlib.sha256()
+    plano = df._jdf.queryExecution().analyzed().toString()
+    h.update(PADRAO_ID_EXPRESSAO.sub("", plano).encode('utf-8'))
+    for arquivo in sorted(df.inputFiles()):
+        caminho = Path(unquote(urlparse(arquivo).path))
+        stat = caminho.stat() if caminho.exists() else None
+        h.update(f"{arquivo}|{stat.st_size if stat else -1}|{stat.st_mtime_ns if stat else -1}"
+                 .encode('utf-8'))
+    return h.hexdigest()
+
+
+def descrever_escrita(df, origem, formato, codec, layout):
+    """Descrição esperada do artefato; `origem` vem de `hash_origem`."""
+    return {
+        'versao': VERSAO_MANIFESTO,
+        'origem': origem,
+        'schema': df.schema.json(),
+        'formato': formato,
+        'codec': codec,
+        'layout': json.loads(_json_canonico(layout or {})),
+        'spark': df.sparkSession.version,
+    }
+
+
+def listar_arquivos(path):
+    """Arquivos de dados do diretório (caminho relativo -> bytes)."""
+    path = Path(path)
+    return {
+        str(f.relative_to(path)): f.stat().st_size
+        for f in sorted(path.rglob('*'))
+        if f.is_file() and not f.name.startswith(('_', '.'))
+        and not any(p.startswith(('_', '.')) for p in f.relative_to(path).parent.parts)
+    }
+
+
+def ler_manifesto(path):
+    """Manifesto do diretório, ou None se não existir/for inválido."""
+    manifesto_path = Path(path) / NOME_MANIFESTO
+    try:
+        with open(manifesto_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def gravar_manifesto(path, descricao, escrita):
+    """
+    Registra o artefato recém-escrito: a descrição, os arquivos atuais e os
+    dados da escrita (`escrita`: tempo_s e particoes). Gravação atômica.
+    """
+    manifesto_path = Path(path) / NOME_MANIFESTO
+    tmp_path = manifesto_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(descricao, arquivos=listar_arquivos(path), escrita=escrita), f,
+                  indent=2, ensure_ascii=False, default=str)
+    tmp_path.replace(manifesto_path)
+
+
+def artefato_valido(path, descricao):
+    """
+    Manifesto do artefato em `path` se ele puder ser reaproveitado para a
+    `descricao` esperada; None se não existir ou estiver obsoleto.
+    """
+    manifesto = ler_manifesto(path)
+    if manifesto is None:
+        return None
+    if any(_json_canonico(manifesto.get(chave)) != _json_canonico(valor)
+           for chave, valor in descricao.items()):
+        return None
+    if not manifesto.get('arquivos') or manifesto['arquivos'] != listar_arquivos(path):
+        return None
+    return manifesto
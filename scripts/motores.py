@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+MOTORES DE CONSULTA DE NÓ ÚNICO - TEMA B
+================================================================================
+
+Executa as queries padrão do benchmark sobre os arquivos escritos por
+`salvar_em_formatos` com motores de nó único, para comparar com o Spark em
+máquinas menores:
+
+- pyarrow: pyarrow.dataset (leitura vetorizada, sem otimizador)
+- duckdb:  SQL sobre read_parquet/read_csv/read_json (sem ORC)
+- polars:  LazyFrame com scan_parquet/scan_csv/scan_ndjson (sem ORC)
+- pandas:  leitura eager em DataFrame a cada rodada
+
+Arquivos Arrow IPC (formato_arrow.py) são abertos por memory mapping em
+todos os motores.
+
+Cada motor registra, por formato, uma função (path) -> {query: função sem
+argumentos que executa a query de ponta a ponta, da abertura dos arquivos
+ao resultado materializado}. Os nomes das queries são os de QUERIES no
+script principal.
+
+Cada combinação motor x formato roda num processo próprio (ver
+`medir_motor`), de modo que o pico de memória residente (ru_maxrss) seja
+atribuível só àquele motor. O processo filho imprime as amostras em JSON.
+
+`medir_leitura_lotes` mede, também num processo próprio, o tempo até o
+primeiro lote e o pico de memória residente (anônima x mapeada de arquivo)
+de uma leitura completa em streaming com os leitores em lotes do pyarrow.
+
+================================================================================
+"""
+
+import argparse
+import glob
+import importlib.util
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+NS_POR_SEGUNDO = 1_000_000_000
+COLUNAS_SELECAO = ["sensor_id", "value", "timestamp"]
+LIMITE_FILTRO = 500
+# Formato -> extensão dos arquivos de dados escritos pelo Spark
+EXTENSOES = {'CSV': "csv", 'JSON': "json", 'Parquet': "parquet", 'ORC': "orc", 'Arrow': "arrow"}
+TIMEOUT_MOTOR_S = 1800
+
+
+# ============================================================================
+# REGISTRO DE MOTORES
+# ============================================================================
+
+# Nome -> {'modulo': pacote exigido, 'formatos': formato -> função (path) -> queries}
+MOTORES = {}
+
+
+def registrar(nome, modulo, formatos):
+    """Decorador que registra um motor para os formatos informados."""
+    def decorador(funcao):
+        MOTORES[nome] = {'modulo': modulo, 'formatos': {f: funcao for f in formatos}}
+        return funcao
+    return decorador
+
+
+def disponivel(motor):
+    """O pacote do motor está instalado?"""
+    return importlib.util.find_spec(MOTORES[motor]['modulo']) is not None
+
+
+def arquivos_dados(formato, path):
+    """Arquivos de dados de um diretório do Spark (recursivo, sem ocultos)."""
+    return sorted(p for p in glob.glob(f"{path}/**/*.{EXTENSOES[formato]}", recursive=True)
+                  if not Path(p).name.startswith(('_', '.')))
+
+
+# ============================================================================
+# MOTORES
+# ============================================================================
+
+def _dataset_arrow(formato, path):
+    """pyarrow.dataset sobre o diretório; Arrow IPC por memory mapping."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pa_fs
+    import pyarrow.json as pa_json
+
+    if formato == 'JSON':
+        # JSON Lines não tem leitor de dataset em todas as versões
+        return ds.dataset(pa.concat_tables(pa_json.read_json(a) for a in arquivos_dados(formato, path)))
+    if formato == 'Arrow':
+        return ds.dataset(path, format="ipc", filesystem=pa_fs.LocalFileSystem(use_mmap=True))
+    return ds.dataset(path, format=EXTENSOES[formato], partitioning="hive")
+
+
+@registrar("pyarrow", "pyarrow", ('CSV', 'JSON', 'Parquet', 'ORC', 'Arrow'))
+def queries_pyarrow(formato, path):
+    import pyarrow.compute as pc
+
+    def abrir():
+        return _dataset_arrow(formato, path)
+
+    return {
+        'leitura': lambda: abrir().count_rows(),
+        'filtro': lambda: abrir().count_rows(filter=pc.field("value") > LIMITE_FILTRO),
+        'selecao': lambda: abrir().scanner(columns=COLUNAS_SELECAO).count_rows(),
+        'agregacao': lambda: abrir().to_table(columns=["city"]).group_by("city")
+                                    .aggregate([("city", "count")]),
+    }
+
+
+@registrar("duckdb", "duckdb", ('CSV', 'JSON', 'Parquet', 'Arrow'))
+def queries_duckdb(formato, path):
+    import duckdb
+
+    padrao = f"{path}/**/*.{EXTENSOES[formato]}"
+    conexao = duckdb.connect()
+    fonte = {
+        'CSV': f"read_csv('{padrao}', header = true, hive_partitioning = true)",
+        'JSON': f"read_json('{padrao}', format = 'newline_delimited', hive_partitioning = true)",
+        'Parquet': f"read_parquet('{padrao}', hive_partitioning = true)",
+        # Sem leitor IPC nativo: varre o dataset pyarrow (memory mapping) registrado
+        'Arrow': "leituras_arrow",
+    }[formato]
+    if formato == 'Arrow':
+        conexao.register("leituras_arrow", _dataset_arrow(formato, path))
+
+    def sql(consulta):
+        return lambda: conexao.execute(consulta.format(fonte=fonte)).fetchall()
+
+    return {
+        'leitura': sql("SELECT count(*) FROM {fonte}"),
+        'filtro': sql(f"SELECT count(*) FROM {{fonte}} WHERE value > {LIMITE_FILTRO}"),
+        'selecao': sql(f"SELECT count(*) FROM (SELECT {', '.join(COLUNAS_SELECAO)} FROM {{fonte}})"),
+        'agregacao': sql("SELECT city, count(*) FROM {fonte} GROUP BY city"),
+    }
+
+
+@registrar("polars", "polars", ('CSV', 'JSON', 'Parquet', 'Arrow'))
+def queries_polars(formato, path):
+    import polars as pl
+
+    padrao = f"{path}/**/*.{EXTENSOES[formato]}"
+
+    def abrir():
+        if formato == 'CSV':
+            return pl.scan_csv(padrao)
+        if formato == 'JSON':
+            return pl.scan_ndjson(padrao)
+        if formato == 'Arrow':
+            return pl.scan_ipc(padrao, memory_map=True)
+        return pl.scan_parquet(padrao, hive_partitioning=True)
+
+    return {
+        'leitura': lambda: abrir().select(pl.len()).collect(),
+        'filtro': lambda: abrir().filter(pl.col("value") > LIMITE_FILTRO).select(pl.len()).collect(),
+        'selecao': lambda: abrir().select(COLUNAS_SELECAO).select(pl.len()).collect(),
+        'agregacao': lambda: abrir().group_by("city").agg(pl.len()).collect(),
+    }
+
+
+@registrar("pandas", "pandas", ('CSV', 'JSON', 'Parquet', 'ORC', 'Arrow'))
+def queries_pandas(formato, path):
+    import pandas as pd
+
+    def ler(colunas=None):
+        if formato == 'Parquet':
+            return pd.read_parquet(path, columns=colunas)
+        arquivos = arquivos_dados(formato, path)
+        if formato == 'ORC':
+            partes = [pd.read_orc(a, columns=colunas) for a in arquivos]
+        elif formato == 'CSV':
+            partes = [pd.read_csv(a, usecols=colunas) for a in arquivos]
+        elif formato == 'Arrow':
+            partes = [pd.read_feather(a, columns=colunas, memory_map=True) for a in arquivos]
+        else:
+            partes = [pd.read_json(a, lines=True) for a in arquivos]
+            partes = [p[colunas] for p in partes] if colunas else partes
+        return pd.concat(partes, ignore_index=True)
+
+    return {
+        'leitura': lambda: len(ler()),
+        'filtro': lambda: int((ler(["value"])["value"] > LIMITE_FILTRO).sum()),
+        'selecao': lambda: len(ler(COLUNAS_SELECAO)),
+        'agregacao': lambda: ler(["city"]).groupby("city").size(),
+    }
+
+
+# ============================================================================
+# MEDIÇÃO
+# ============================================================================
+
+def memoria_residente(campo="VmRSS"):
+    """
+    Campo de memória de /proc/self/status em bytes (Linux), ou None:
+    VmRSS (total), RssAnon (heap, dados decodificados) ou RssFile (páginas
+    de arquivos mapeados).
+    """
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for linha in f:
+                if linha.startswith(f"{campo}:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _lotes(formato, arquivo):
+    """Lotes de um arquivo, lidos em streaming quando o formato permite."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.json as pa_json
+    import pyarrow.orc as pa_orc
+    import pyarrow.parquet as pq
+
+    if formato == 'Arrow':
+        leitor = pa.ipc.open_file(pa.memory_map(arquivo))
+        return (leitor.get_batch(i) for i in range(leitor.num_record_batches))
+    if formato == 'Parquet':
+        return pq.ParquetFile(arquivo).iter_batches()
+    if formato == 'ORC':
+        leitor = pa_orc.ORCFile(arquivo)
+        return (leitor.read_stripe(i) for i in range(leitor.nstripes))
+    if formato == 'CSV':
+        return iter(pa_csv.open_csv(arquivo))
+    return iter(pa_json.read_json(arquivo).to_batches())
+
+
+def leitura_lotes(formato, path):
+    """
+    Lê todos os lotes do formato em streaming e soma a coluna `value` de
+    cada um (para que as páginas sejam de fato tocadas); cada lote é
+    descartado após contar linhas e bytes. Retorna o tempo até o primeiro
+    lote, o tempo total e o pico do acréscimo de memória residente anônima
+    e de arquivo durante a leitura.
+    """
+    import pyarrow.compute as pc
+
+    anonima, arquivo = memoria_residente("RssAnon"), memoria_residente("RssFile")
+    pico_anonima, pico_arquivo = anonima, arquivo
+    inicio = time.perf_counter_ns()
+    primeiro, lotes, linhas, bytes_lotes = None, 0, 0, 0
+    for nome in arquivos_dados(formato, path):
+        for lote in _lotes(formato, nome):
+            if primeiro is None:
+                primeiro = time.perf_counter_ns() - inicio
+            pc.sum(lote.column("value"))
+            lotes, linhas, bytes_lotes = lotes + 1, linhas + lote.num_rows, bytes_lotes + lote.nbytes
+            if anonima is not None:
+                pico_anonima = max(pico_anonima, memoria_residente("RssAnon"))
+            if arquivo is not None:
+                pico_arquivo = max(pico_arquivo, memoria_residente("RssFile"))
+            del lote
+    total = time.perf_counter_ns() - inicio
+    return {
+        'primeiro_lote_s': (primeiro or total) / NS_POR_SEGUNDO,
+        'leitura_total_s': total / NS_POR_SEGUNDO,
+        'lotes': lotes,
+        'linhas': linhas,
+        'bytes_lotes': bytes_lotes,
+        'rss_anonima_bytes': pico_anonima - anonima if anonima is not None else None,
+        'rss_arquivo_bytes': pico_arquivo - arquivo if arquivo is not None else None,
+    }
+
+
+def executar(motor, formato, path, nomes, warmup, trials):
+    """
+    Roda as queries `nomes` no processo corrente: `warmup` rodadas
+    descartadas e `trials` medidas. Retorna amostras (s) e memória.
+    """
+    queries = MOTORES[motor]['formatos'][formato](path)
+    base = memoria_residente()  # Após importar o motor: o pico acima disso é da carga de trabalho
+    amostras = {}
+    for nome in nomes:
+        if nome not in queries:
+            continue
+        for _ in range(warmup):
+            queries[nome]()
+        amostras[nome] = []
+        for _ in range(trials):
+            inicio = time.perf_counter_ns()
+            queries[nome]()
+            amostras[nome].append((time.perf_counter_ns() - inicio) / NS_POR_SEGUNDO)
+    return {
+        'amostras': amostras,
+        'memoria_base_bytes': base,
+        # ru_maxrss é em KB no Linux
+        'memoria_pico_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def _executar_filho(argumentos, timeout):
+    """Roda este módulo num processo filho e lê o JSON da última linha."""
+    comando = [sys.executable, str(Path(__file__).resolve()), *argumentos]
+    try:
+        processo = subprocess.run(comando, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'erro': f"tempo limite de {timeout}s excedido"}
+    if processo.returncode != 0:
+        linhas = processo.stderr.strip().splitlines()
+        return {'erro': linhas[-1] if linhas else f"código de saída {processo.returncode}"}
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def medir_leitura_lotes(formato, path, timeout=TIMEOUT_MOTOR_S):
+    """`leitura_lotes` num processo filho (memória isolada), ou {'erro': ...}."""
+    if not disponivel("pyarrow"):
+        return {'erro': "pacote pyarrow não instalado"}
+    return _executar_filho(["pyarrow", formato, str(path), "--leitura-lotes"], timeout)
+
+
+def medir_motor(motor, formato, path, nomes, warmup, trials, timeout=TIMEOUT_MOTOR_S):
+    """
+    Mede um motor num processo filho. Retorna o dict de `executar` ou
+    {'erro': mensagem} se o motor falhar (formato sem suporte, pacote
+    ausente, erro de leitura).
+    """
+    if motor not in MOTORES:
+        return {'erro': f"motor desconhecido (disponíveis: {', '.join(MOTORES)})"}
+    if formato not in MOTORES[motor]['formatos']:
+        return {'erro': f"{motor} não lê {formato}"}
+    if not disponivel(motor):
+        return {'erro': f"pacote {MOTORES[motor]['modulo']} não instalado"}
+    return _executar_filho([motor, formato, str(path), "--queries", ",".join(nomes),
+                            "--warmup", str(warmup), "--trials", str(trials)], timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Executa as queries padrão num motor de nó único")
+    parser.add_argument("motor", choices=list(MOTORES))
+    parser.add_argument("formato", choices=list(EXTENSOES))
+    parser.add_argument("path", help="Diretório escrito pelo Spark")
+    parser.add_argument("--queries", default="leitura,filtro,selecao,agregacao")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--leitura-lotes", action="store_true",
+                        help="Mede tempo até o primeiro lote e memória residente (pyarrow)")
+    args = parser.parse_args(argv)
+
+    if args.leitura_lotes:
+        resultado = leitura_lotes(args.formato, args.path)
+    else:
+        resultado = executar(args.motor, args.formato, args.path, args.queries.split(","),
+                             args.warmup, args.trials)
+    print(json.dumps(resultado))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
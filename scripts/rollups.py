@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+ROLLUPS (AGREGADOS MATERIALIZADOS) - TEMA B
+================================================================================
+
+Agregados pré-calculados sobre as leituras brutas, para que consultas de
+painel (contagem por cidade, média horária por tipo...) não varram o
+dataset inteiro a cada execução.
+
+Cada rollup é definido por chaves de agrupamento, um grão de tempo ('hora'
+ou 'dia', sobre `timestamp`) e sketches HLL (coluna -> nome da coluna do
+sketch). Além das chaves, todo rollup guarda, para COLUNA_MEDIDA:
+
+- linhas (count(*)), linhas_value (count(value)), soma_value, min_value,
+  max_value
+- os sketches HLL (hll_sketch_agg, Spark 3.5), que se combinam com
+  hll_union_agg e dão contagens distintas aproximadas em qualquer
+  agrupamento mais grosso
+
+Todas as medidas são combináveis (soma de somas, mínimo de mínimos, união
+de sketches), o que permite manter os rollups incrementalmente e responder
+consultas em grão mais grosso que o do rollup.
+
+Armazenamento: Parquet particionado por mês (`mes` = aaaamm) em
+<diretorio>/<nome>, com as partições reescritas e trocadas como nas camadas
+do ciclo de vida (ver ciclo_vida.reescrever_particoes).
+
+Manutenção incremental: o estado (`_estado.json`) registra os arquivos da
+origem já agregados. A cada atualização, só os arquivos novos são lidos e
+agregados; o parcial é combinado com as partições (meses) que ele toca e
+apenas essas são reescritas. Se um arquivo já agregado sumir ou mudar de
+tamanho (origem reescrita ou compactada), ou se as definições mudarem, os
+rollups são reconstruídos do zero. O estado é marcado como pendente antes
+das trocas: uma atualização interrompida força reconstrução na seguinte,
+em vez de contar linhas duas vezes.
+
+Consultas: `responder` recebe uma consulta declarativa (agrupamento,
+medidas, filtros de igualdade e intervalo de tempo) e a executa no menor
+rollup elegível, ou nos dados brutos se nenhum for.
+
+================================================================================
+"""
+
+import json
+import shutil
+from datetime import time as hora_do_dia
+from pathlib import Path
+
+from pyspark.sql.functions import (
+    col, expr, lit, count, sum as soma, min as minimo, max as maximo, avg, coalesce,
+    hll_sketch_agg, hll_union_agg, hll_sketch_estimate
+)
+
+from ciclo_vida import ler_camada, reescrever_particoes
+from manifesto import listar_arquivos
+
+
+NOME_ESTADO = "_estado.json"
+VERSAO_ESTADO = 1
+COLUNA_MEDIDA = "value"
+PARTICAO = "mes"
+HLL_LG_K = 12   # 2^12 registradores: erro padrão ~1,6%
+TOLERANCIA_HLL = 0.05   # ~3 erros padrão: sketch direto x união de sketches
+
+# Grão de tempo -> expressão SQL sobre `timestamp`
+GRAOS_TEMPO = {
+    'hora': "date_trunc('hour', `timestamp`)",
+    'dia': "to_date(`timestamp`)",
+}
+
+# Grãos que podem ser derivados de cada grão armazenado
+GRAOS_DERIVAVEIS = {'hora': ('hora', 'dia'), 'dia': ('dia',)}
+
+OPERACOES = ('count', 'sum', 'min', 'max', 'avg', 'distinct_aprox')
+
+
+# ============================================================================
+# DEFINIÇÕES
+# ============================================================================
+
+def _camada(definicao):
+    """Definição no formato de camada esperado por ciclo_vida."""
+    return {'nome': definicao['nome'], 'particao': PARTICAO, 'formato': 'Parquet',
+            'codec': definicao.get('codec', 'snappy')}
+
+
+def colunas_chave(definicao):
+    """Chaves de agrupamento do rollup, incluindo o grão de tempo."""
+    return list(definicao['chaves']) + [definicao['tempo']]
+
+
+def _expressao_mes(coluna_tempo):
+    return expr(f"year(`{coluna_tempo}`) * 100 + month(`{coluna_tempo}`)")
+
+
+def agregar(linhas, definicao):
+    """Rollup (parcial) das leituras brutas `linhas`."""
+    tempo = definicao['tempo']
+    sketches = [hll_sketch_agg(col(origem), HLL_LG_K).alias(nome)
+                for nome, origem in definicao.get('sketches', {}).items()]
+    return linhas.withColumn(tempo, expr(GRAOS_TEMPO[tempo])) \
+        .groupBy(*colunas_chave(definicao)) \
+        .agg(count(lit(1)).alias("linhas"),
+             count(COLUNA_MEDIDA).alias(f"linhas_{COLUNA_MEDIDA}"),
+             soma(COLUNA_MEDIDA).alias(f"soma_{COLUNA_MEDIDA}"),
+             minimo(COLUNA_MEDIDA).alias(f"min_{COLUNA_MEDIDA}"),
+             maximo(COLUNA_MEDIDA).alias(f"max_{COLUNA_MEDIDA}"),
+             *sketches) \
+        .withColumn(PARTICAO, _expressao_mes(tempo))
+
+
+def combinar(parciais, definicao):
+    """Combina linhas de rollup com as mesmas chaves (medidas combináveis)."""
+    sketches = [hll_union_agg(col(nome)).alias(nome) for nome in definicao.get('sketches', {})]
+    return parciais.groupBy(*colunas_chave(definicao), PARTICAO) \
+        .agg(soma("linhas").alias("linhas"),
+             soma(f"linhas_{COLUNA_MEDIDA}").alias(f"linhas_{COLUNA_MEDIDA}"),
+             soma(f"soma_{COLUNA_MEDIDA}").alias(f"soma_{COLUNA_MEDIDA}"),
+             minimo(f"min_{COLUNA_MEDIDA}").alias(f"min_{COLUNA_MEDIDA}"),
+             maximo(f"max_{COLUNA_MEDIDA}").alias(f"max_{COLUNA_MEDIDA}"),
+             *sketches)
+
+
+# ============================================================================
+# ESTADO
+# ============================================================================
+
+def ler_estado(diretorio):
+    """Estado dos rollups, ou None se não existir/for inválido."""
+    try:
+        with open(Path(diretorio) / NOME_ESTADO, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def gravar_estado(diretorio, estado):
+    """Grava o estado atomicamente (arquivo temporário + rename)."""
+    path = Path(diretorio) / NOME_ESTADO
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, indent=2, ensure_ascii=False)
+    tmp_path.replace(path)
+
+
+def descrever_rollups(spark, fonte, formato, definicoes):
+    """O que precisa ser igual para que o estado possa ser estendido."""
+    # Ida e volta pelo JSON: tuplas viram listas, como no estado lido do disco
+    return json.loads(json.dumps({
+        'versao': VERSAO_ESTADO,
+        'fonte': str(fonte),
+        'formato': formato,
+        'definicoes': definicoes,
+        'fuso': spark.conf.get("spark.sql.session.timeZone"),
+    }))
+
+
+def planejar_atualizacao(estado, descricao, arquivos):
+    """
+    Arquivos da origem a agregar e se os rollups devem ser reconstruídos.
+    Retorna (reconstruir, novos, motivo).
+    """
+    if estado is None:
+        return True, sorted(arquivos), "sem estado"
+    if estado.get('pendente'):
+        return True, sorted(arquivos), "atualização anterior interrompida"
+    if any(estado.get(chave) != valor for chave, valor in descricao.items()):
+        return True, sorted(arquivos), "definições ou origem alteradas"
+    agregados = estado.get('arquivos', {})
+    if any(arquivos.get(nome) != tamanho for nome, tamanho in agregados.items()):
+        return True, sorted(arquivos), "arquivos agregados removidos ou reescritos"
+    return False, sorted(set(arquivos) - set(agregados)), None
+
+
+# ============================================================================
+# MANUTENÇÃO
+# ============================================================================
+
+def atualizar_rollups(spark, fonte, formato, diretorio, definicoes):
+    """
+    Agrega nos rollups os arquivos da origem (Parquet ou ORC em `fonte`)
+    ainda não agregados, reconstruindo tudo se o estado não puder ser
+    estendido. Retorna um resumo da atualização.
+    """
+    fonte, diretorio = Path(fonte), Path(diretorio)
+    descricao = descrever_rollups(spark, fonte, formato, definicoes)
+    arquivos = listar_arquivos(fonte)
+    estado = ler_estado(diretorio)
+    reconstruir, novos, motivo = planejar_atualizacao(estado, descricao, arquivos)
+    resumo = {'reconstrucao': reconstruir, 'motivo': motivo, 'arquivos_novos': len(novos),
+              'bytes_novos': sum(arquivos[n] for n in novos), 'particoes': {}}
+    if not novos and not reconstruir:
+        return resumo
+
+    if reconstruir:
+        shutil.rmtree(diretorio, ignore_errors=True)
+        estado = {'arquivos': {}}
+    diretorio.mkdir(parents=True, exist_ok=True)
+    if not novos:
+        gravar_estado(diretorio, dict(descricao, arquivos={}))
+        return resumo
+
+    # basePath preserva as colunas de partição da origem ao ler arquivos avulsos
+    linhas = spark.read.format(formato.lower()).option("basePath", str(fonte)) \
+        .load([str(fonte / nome) for nome in novos])
+    linhas = linhas.persist()
+    try:
+        trocas = []
+        for definicao in definicoes:
+            camada = _camada(definicao)
+            parcial = agregar(linhas, definicao)
+            afetadas = [r[0] for r in parcial.select(PARTICAO).distinct().collect()]
+            existentes = None if reconstruir else ler_camada(spark, str(diretorio), camada)
+            if existentes is not None:
+                parcial = existentes.filter(col(PARTICAO).isin(afetadas)).unionByName(parcial)
+            mescladas = combinar(parcial, definicao).repartition(PARTICAO)
+            trocas.append(reescrever_particoes(spark, str(diretorio), camada, mescladas))
+            resumo['particoes'][definicao['nome']] = len(afetadas)
+    finally:
+        linhas.unpersist()
+
+    # Pendente até todas as trocas terminarem: interrupção aqui força reconstrução
+    gravar_estado(diretorio, dict(descricao, arquivos=estado['arquivos'], pendente=novos))
+    for trocar in trocas:
+        trocar()
+    gravar_estado(diretorio, dict(descricao, arquivos={
+        **estado['arquivos'], **{nome: arquivos[nome] for nome in novos}}))
+    return resumo
+
+
+def tamanho_rollups(diretorio, definicoes):
+    """Bytes e arquivos de dados de cada rollup."""
+    resultado = {}
+    for definicao in definicoes:
+        arquivos = listar_arquivos(Path(diretorio) / definicao['nome']) \
+            if (Path(diretorio) / definicao['nome']).exists() else {}
+        resultado[definicao['nome']] = {'arquivos': len(arquivos), 'bytes': sum(arquivos.values())}
+    return resultado
+
+
+# ============================================================================
+# CONSULTAS
+# ============================================================================
+#
+# Consulta declarativa:
+#   agrupar    colunas de agrupamento (colunas brutas ou os grãos 'hora'/'dia')
+#   medidas    alias -> (operação de OPERACOES, coluna)
+#   filtros    coluna -> valor (igualdade), opcional
+#   intervalo  (inicio, fim) sobre `timestamp`, semiaberto, opcional
+
+def _alinhado(instante, grao):
+    if grao == 'hora':
+        return instante.minute == instante.second == instante.microsecond == 0
+    return instante.time() == hora_do_dia(0)
+
+
+def elegivel(definicao, consulta):
+    """Se o rollup responde a consulta sem perder precisão."""
+    chaves = set(definicao['chaves'])
+    tempo = definicao['tempo']
+    for coluna in consulta['agrupar']:
+        if coluna in GRAOS_TEMPO:
+            if coluna not in GRAOS_DERIVAVEIS[tempo]:
+                return False
+        elif coluna not in chaves:
+            return False
+    if any(coluna not in chaves for coluna in consulta.get('filtros', {})):
+        return False
+    intervalo = consulta.get('intervalo')
+    if intervalo and not all(_alinhado(instante, tempo) for instante in intervalo):
+        return False
+    sketches = set(definicao.get('sketches', {}).values())
+    for operacao, coluna in consulta['medidas'].values():
+        if operacao == 'distinct_aprox':
+            if coluna not in sketches:
+                return False
+        elif operacao != 'count' and coluna != COLUNA_MEDIDA:
+            return False
+    return True
+
+
+def escolher_rollup(consulta, definicoes, tamanhos):
+    """Menor rollup elegível (em bytes), ou None."""
+    candidatos = [d for d in definicoes
+                  if elegivel(d, consulta) and tamanhos.get(d['nome'], {}).get('arquivos')]
+    if not candidatos:
+        return None
+    return min(candidatos, key=lambda d: tamanhos[d['nome']]['bytes'])
+
+
+def _medida_bruta(operacao, coluna, alias):
+    if operacao == 'count':
+        return count(lit(1)).alias(alias)
+    if operacao == 'distinct_aprox':
+        return hll_sketch_estimate(hll_sketch_agg(col(coluna), HLL_LG_K)).alias(alias)
+    return {'sum': soma, 'min': minimo, 'max': maximo, 'avg': avg}[operacao](coluna).alias(alias)
+
+
+def _medida_rollup(definicao, operacao, coluna, alias):
+    if operacao == 'count':
+        return coalesce(soma("linhas"), lit(0)).alias(alias)
+    if operacao == 'distinct_aprox':
+        sketch = next(nome for nome, origem in definicao['sketches'].items() if origem == coluna)
+        return hll_sketch_estimate(hll_union_agg(col(sketch))).alias(alias)
+    if operacao == 'avg':
+        return (soma(f"soma_{coluna}") / soma(f"linhas_{coluna}")).alias(alias)
+    funcao, prefixo = {'sum': (soma, 'soma'), 'min': (minimo, 'min'), 'max': (maximo, 'max')}[operacao]
+    return funcao(f"{prefixo}_{coluna}").alias(alias)
+
+
+def consultar_bruto(df, consulta):
+    """Executa a consulta sobre as leituras brutas."""
+    for grao in GRAOS_TEMPO:
+        if grao in consulta['agrupar']:
+            df = df.withColumn(grao, expr(GRAOS_TEMPO[grao]))
+    for coluna, valor in consulta.get('filtros', {}).items():
+        df = df.filter(col(coluna) == lit(valor))
+    if consulta.get('intervalo'):
+        inicio, fim = consulta['intervalo']
+        df = df.filter((col("timestamp") >= lit(inicio)) & (col("timestamp") < lit(fim)))
+    return df.groupBy(*consulta['agrupar']).agg(
+        *[_medida_bruta(operacao, coluna, alias) for alias, (operacao, coluna) in consulta['medidas'].items()])
+
+
+def consultar_rollup(spark, diretorio, definicao, consulta):
+    """Executa a consulta sobre um rollup elegível."""
+    df = ler_camada(spark, str(diretorio), _camada(definicao))
+    tempo = definicao['tempo']
+    if 'dia' in consulta['agrupar'] and tempo != 'dia':
+        df = df.withColumn("dia", expr(f"to_date(`{tempo}`)"))
+    for coluna, valor in consulta.get('filtros', {}).items():
+        df = df.filter(col(coluna) == lit(valor))
+    if consulta.get('intervalo'):
+        inicio, fim = consulta['intervalo']
+        if tempo == 'dia':
+            inicio, fim = inicio.date(), fim.date()
+        # Faixa de meses para a poda de partições, além do filtro no grão
+        df = df.filter(col(PARTICAO).between(inicio.year * 100 + inicio.month, fim.year * 100 + fim.month)
+                       & (col(tempo) >= lit(inicio)) & (col(tempo) < lit(fim)))
+    return df.groupBy(*consulta['agrupar']).agg(
+        *[_medida_rollup(definicao, operacao, coluna, alias)
+          for alias, (operacao, coluna) in consulta['medidas'].items()])
+
+
+def responder(spark, consulta, diretorio, definicoes, ler_bruto, tamanhos=None):
+    """
+    Responde a consulta pelo menor rollup elegível ou, se nenhum for,
+    pelos dados brutos (`ler_bruto()` retorna o DataFrame das leituras).
+    Retorna (DataFrame, nome do rollup usado ou None).
+    """
+    tamanhos = tamanhos if tamanhos is not None else tamanho_rollups(diretorio, definicoes)
+    definicao = escolher_rollup(consulta, definicoes, tamanhos)
+    if definicao is None:
+        return consultar_bruto(ler_bruto(), consulta), None
+    return consultar_rollup(spark, diretorio, definicao, consulta), definicao['nome']
+
+
+def colunas_aproximadas(consulta):
+    """Posições, no resultado da consulta, das medidas aproximadas (distinct_aprox)."""
+    return [len(consulta['agrupar']) + i
+            for i, (operacao, _) in enumerate(consulta['medidas'].values()) if operacao == 'distinct_aprox']
+
+
+def mesmos_resultados(a, b, tolerancia=1e-6, aproximadas=(), tolerancia_aproximada=TOLERANCIA_HLL):
+    """
+    Compara dois resultados coletados (listas de Row), sem ordem e com
+    tolerância relativa. As colunas nas posições `aproximadas` (sketches
+    HLL: um sketch direto e a união de sketches usam estimadores
+    diferentes) são comparadas com `tolerancia_aproximada`.
+    """
+    if len(a) != len(b):
+        return False
+    def chave(row):
+        return tuple((v is None, str(v)) for i, v in enumerate(row) if i not in aproximadas)
+    for x, y in zip(sorted(a, key=chave), sorted(b, key=chave)):
+        for i, (u, v) in enumerate(zip(x, y)):
+            limite = tolerancia_aproximada if i in aproximadas else tolerancia
+            if i in aproximadas or isinstance(u, float) or isinstance(v, float):
+                if u is None or v is None or abs(u - v) > limite * max(1.0, abs(u), abs(v)):
+                    return False
+            elif u != v:
+                return False
+    return True
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+SESSÃO SPARK QUENTE (SERVIDOR LOCAL DE BENCHMARKS) - TEMA B
+================================================================================
+
+Cada execução de tema_b_otimizacao_docker.py paga a partida da JVM, a
+criação da SparkSession e o aquecimento do JIT antes da primeira medição.
+Este módulo mantém uma sessão viva num processo servidor e recebe execuções
+de clientes por um socket local (multiprocessing.connection, apenas em
+localhost, autenticado por uma chave aleatória gravada num arquivo com
+permissão 0600).
+
+Protocolo (mensagens pickle sobre a conexão autenticada):
+
+- cliente -> servidor: {'argv': [...]} para executar um modo, ou
+  {'comando': 'parar'} para encerrar o servidor
+- servidor -> cliente: {'saida': texto} a cada linha impressa pela
+  execução, e ao final {'fim': True, 'codigo': int, 'medida': {...}}
+
+As execuções são atendidas uma de cada vez, na ordem de chegada: medições
+concorrentes na mesma sessão disputariam os mesmos cores.
+
+================================================================================
+"""
+
+import os
+import secrets
+import sys
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+
+# ============================================================================
+# PARTIDA DO PROCESSO
+# ============================================================================
+
+def inicio_processo():
+    """
+    Instante (época, s) em que o processo atual foi criado, pelo /proc;
+    inclui a partida do interpretador e os imports. None fora do Linux.
+    """
+    try:
+        with open("/proc/self/stat", 'r') as f:
+            # Campo 22 (starttime), contado após o nome do processo entre parênteses
+            inicio_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat", 'r') as f:
+            boot = next(int(l.split()[1]) for l in f if l.startswith("btime"))
+    except (OSError, IndexError, ValueError, StopIteration):
+        return None
+    return boot + inicio_ticks / os.sysconf("SC_CLK_TCK")
+
+
+# ============================================================================
+# CHAVE DE AUTENTICAÇÃO
+# ============================================================================
+
+def criar_chave(chave_path):
+    """Gera a chave da sessão e a grava legível apenas pelo usuário."""
+    chave = secrets.token_bytes(32)
+    descritor = os.open(chave_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descritor, 'wb') as f:
+        f.write(chave)
+    return chave
+
+
+def ler_chave(chave_path):
+    """Chave do servidor em execução, ou None se não houver servidor."""
+    try:
+        with open(chave_path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+# ============================================================================
+# SERVIDOR
+# ============================================================================
+
+class SaidaEncaminhada:
+    """
+    Substituto de sys.stdout durante uma execução: escreve no log do
+    servidor e encaminha cada linha completa ao cliente. Se o cliente
+    desconectar, a execução continua e só o log do servidor recebe a saída.
+    """
+
+    def __init__(self, original, conexao):
+        self.original = original
+        self.conexao = conexao
+        self.pendente = ""
+
+    def write(self, texto):
+        self.original.write(texto)
+        self.pendente += texto
+        if "\n" in self.pendente:
+            linhas, self.pendente = self.pendente.rsplit("\n", 1)
+            self._enviar(linhas + "\n")
+        return len(texto)
+
+    def flush(self):
+        self.original.flush()
+
+    def __getattr__(self, nome):
+        return getattr(self.original, nome)
+
+    def fechar(self):
+        if self.pendente:
+            self._enviar(self.pendente)
+            self.pendente = ""
+
+    def _enviar(self, texto):
+        if self.conexao is None:
+            return
+        try:
+            self.conexao.send({'saida': texto})
+        except (OSError, EOFError):
+            self.conexao = None
+
+
+def servir(executar, endereco, chave_path):
+    """
+    Atende execuções até receber {'comando': 'parar'}.
+
+    `executar(argv)` roda um modo na sessão quente e retorna
+    (código de saída, medida da sessão).
+    """
+    chave = criar_chave(chave_path)
+    try:
+        with Listener(endereco, authkey=chave) as ouvinte:
+            print(f"✓ Sessão quente aguardando execuções em {endereco[0]}:{endereco[1]}")
+            print()
+            while True:
+                try:
+                    conexao = ouvinte.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    print(f"⚠ Conexão recusada: {e}")
+                    continue
+                with conexao:
+                    try:
+                        pedido = conexao.recv()
+                    except (OSError, EOFError):
+                        continue
+                    if pedido.get('comando') == 'parar':
+                        conexao.send({'fim': True, 'codigo': 0, 'medida': None})
+                        print("✓ Sessão quente encerrada a pedido do cliente")
+                        return 0
+                    saida = SaidaEncaminhada(sys.stdout, conexao)
+                    sys.stdout = saida
+                    try:
+                        codigo, medida = executar(pedido['argv'])
+                    finally:
+                        sys.stdout = saida.original
+                        saida.fechar()
+                    try:
+                        conexao.send({'fim': True, 'codigo': codigo, 'medida': medida})
+                    except (OSError, EOFError):
+                        pass
+    finally:
+        try:
+            os.remove(chave_path)
+        except OSError:
+            pass
+
+
+# ============================================================================
+# CLIENTE
+# ============================================================================
+
+def enviar(pedido, endereco, chave_path):
+    """
+    Envia um pedido ao servidor e imprime a saída encaminhada.
+
+    Retorna (código, medida, ida_e_volta_s), ou None se não houver servidor
+    em execução.
+    """
+    chave = ler_chave(chave_path)
+    if chave is None:
+        return None
+    inicio = time.perf_counter()
+    try:
+        conexao = Client(endereco, authkey=chave)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return None
+    with conexao:
+        conexao.send(pedido)
+        while True:
+            mensagem = conexao.recv()
+            if mensagem.get('fim'):
+                return mensagem['codigo'], mensagem['medida'], time.perf_counter() - inicio
+            sys.stdout.write(mensagem['saida'])
+            sys.stdout.flush()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+CACHE DE SNAPSHOT COLUNAR - TEMA B
+================================================================================
+
+Mantém uma cópia em Parquet do dataset CSV de origem para que execuções
+repetidas não precisem parsear o CSV novamente.
+
+O snapshot é identificado pela impressão digital do CSV:
+- tamanho em bytes
+- mtime (nanossegundos)
+- hash SHA-256 do conteúdo
+e pelo esquema de leitura (DDL do schema e formato de timestamp), de modo
+que uma mudança no schema não sirva um snapshot antigo.
+
+O CSV pode ser um arquivo único ou um diretório de saída do Spark (vários
+arquivos part-*); neste caso valem a soma dos tamanhos, o maior mtime e o
+hash dos nomes e conteúdos dos arquivos de dados, em ordem.
+
+Se tamanho e mtime coincidem com o manifesto, o hash armazenado é reutilizado
+(caminho rápido, sem ler o arquivo). Se algum deles mudou, o hash é
+recalculado; se o conteúdo for o mesmo (ex.: `touch`), o snapshot continua
+válido e o manifesto é atualizado. Caso contrário o snapshot é descartado.
+
+================================================================================
+"""
+
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+
+NOME_MANIFESTO = "_snapshot_manifest.json"
+TAMANHO_BLOCO_HASH = 8 * 1024 * 1024
+
+
+def arquivos_origem(path):
+    """Arquivos que compõem a origem: o próprio arquivo ou os dados do diretório."""
+    path = Path(path)
+    if path.is_file():
+        return [path]
+    return sorted(
+        f for f in path.rglob('*')
+        if f.is_file() and not f.name.startswith(('_', '.'))
+    )
+
+
+def calcular_hash(path):
+    """
+    SHA-256 do conteúdo de um arquivo, lido em blocos. Para diretórios,
+    inclui o caminho relativo de cada arquivo antes do seu conteúdo.
+    """
+    h = hashlib.sha256()
+    diretorio = Path(path).is_dir()
+    for arquivo in arquivos_origem(path):
+        if diretorio:
+            h.update(str(arquivo.relative_to(path)).encode('utf-8'))
+        with open(arquivo, 'rb') as f:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO_HASH), b''):
+                h.update(bloco)
+    return h.hexdigest()
+
+
+def impressao_digital(path, manifesto=None):
+    """
+    Calcula a impressão digital (tamanho, mtime, hash) do arquivo de origem.
+
+    Se `manifesto` for informado e tamanho/mtime coincidirem, o hash
+    registrado é reaproveitado sem reler o arquivo.
+    """
+    stats = [f.stat() for f in arquivos_origem(path)]
+    digital = {'tamanho': sum(st.st_size for st in stats),
+               'mtime_ns': max((st.st_mtime_ns for st in stats), default=0)}
+    if (manifesto
+            and manifesto.get('tamanho') == digital['tamanho']
+            and manifesto.get('mtime_ns') == digital['mtime_ns']):
+        digital['sha256'] = manifesto['sha256']
+    else:
+        digital['sha256'] = calcular_hash(path)
+    return digital
+
+
+def ler_manifesto(snapshot_dir):
+    """Lê o manifesto do snapshot, ou None se não existir/for inválido."""
+    manifesto_path = Path(snapshot_dir) / NOME_MANIFESTO
+    if not manifesto_path.exists():
+        return None
+    try:
+        with open(manifesto_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def gravar_manifesto(snapshot_dir, manifesto):
+    """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+    manifesto_path = Path(snapshot_dir) / NOME_MANIFESTO
+    tmp_path = manifesto_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2)
+    tmp_path.replace(manifesto_path)
+
+
+def snapshot_valido(origem, snapshot_dir, esquema=None):
+    """
+    Verifica se existe snapshot válido para o arquivo de origem.
+
+    `esquema` identifica como a origem é lida (ex.: DDL do schema e formato
+    de timestamp): um snapshot gravado com outro esquema está desatualizado
+    mesmo que o CSV seja o mesmo.
+
+    Retorna (caminho_dados, impressao_digital). `caminho_dados` é None se o
+    snapshot não existir ou estiver desatualizado.
+    """
+    manifesto = ler_manifesto(snapshot_dir)
+    digital = dict(impressao_digital(origem, manifesto), esquema=esquema)
+
+    if not manifesto or manifesto.get('sha256') != digital['sha256'] \
+            or manifesto.get('esquema') != esquema:
+        return None, digital
+
+    dados = Path(snapshot_dir) / manifesto['dados']
+    if not (dados / "_SUCCESS").exists():
+        return None, digital
+
+    # Conteúdo idêntico mas metadados diferentes (ex.: touch): atualiza manifesto
+    if (manifesto['tamanho'], manifesto['mtime_ns']) != (digital['tamanho'], digital['mtime_ns']):
+        manifesto.update(digital)
+        gravar_manifesto(snapshot_dir, manifesto)
+
+    return str(dados), digital
+
+
+def criar_snapshot(df, snapshot_dir, digital):
+    """
+    Grava o DataFrame como snapshot Parquet e registra o manifesto.
+
+    Snapshots anteriores (de outra versão do CSV) são removidos.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+    chave = hashlib.sha256(f"{digital['sha256']}|{digital.get('esquema')}".encode('utf-8')).hexdigest()
+    nome_dados = f"dados_{chave[:16]}"
+    for antigo in snapshot_dir.glob("dados_*"):
+        if antigo.name != nome_dados:
+            shutil.rmtree(antigo, ignore_errors=True)
+
+    dados = snapshot_dir / nome_dados
+    df.write.mode("overwrite").option("compression", "snappy").parquet(str(dados))
+
+    gravar_manifesto(snapshot_dir, dict(digital, dados=nome_dados))
+    return str(dados)
@@ -37,16 +37,45 @@ import os
 import sys
 import time
 import json
+import shutil
+import random
+import argparse
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from pyspark import StorageLevel
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, when, rand, expr
+from pyspark.sql.functions import col, expr, lit, avg, input_file_name
 from pyspark.sql.types import (
     StructType, StructField, StringType, DoubleType,
     IntegerType, TimestampType
 )
 
+from benchmark import (executar_benchmark, medir_execucao, resumir, ranquear, bytes_lidos_sistema_arquivos,
+                       percentil, ajustar_linear, ajustar_potencia, reiniciar_pico_memoria, pico_memoria,
+                       NIVEL_SIGNIFICANCIA)
+from snapshot_cache import snapshot_valido, criar_snapshot
+from clusterizacao import adicionar_chave_cluster, remover_chave_cluster
+from inspecao_rodape import blocos_parquet, blocos_orc, contar_blocos_pulados, anatomia_armazenamento
+from workload import carregar_workload, queries_do_workload
+from ciclo_vida import carga_inicial, ingerir, migrar, rotear, custo_armazenamento
+from gerador_arquivos import instante_entrega
+from compactacao import compactar_tabela, colunas_particao
+from motores import MOTORES, medir_motor, medir_leitura_lotes
+from formato_arrow import escrever_arrow, ler_arrow
+from manifesto import hash_origem, descrever_escrita, gravar_manifesto, artefato_valido
+from sessao_quente import inicio_processo, servir, enviar
+from historico_resultados import (VERSAO_ESQUEMA_RELATORIO, impressao_ambiente, hash_ambiente,
+                                  resumo_relatorio, registrar_execucao)
+from rollups import (atualizar_rollups, tamanho_rollups, responder, consultar_bruto, mesmos_resultados,
+                     colunas_aproximadas, TOLERANCIA_HLL)
+from esquema_compacto import (TIPOS_VALOR, planejar_esquema, esquema_variante, compactar, ddl_fisico, expandir,
+                              tamanho_dicionarios, gravar_esquema, ler_esquema)
+from autoajuste import ESTRATEGIAS, buscar, configuracao_atual, aplicar_configuracao, restaurar_configuracao, tamanho_espaco
+
 # ============================================================================
 # CONFIGURAÇÕES
 # ============================================================================
@@ -70,6 +99,267 @@ OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 NUM_RECORDS = 1_000_000  # Número de registros
 DATASET_CSV_PATH = DATA_DIR / "tema_b_sensores_iot.csv"
 USE_PREGENERATED = True  # Usar dataset pré-gerado se disponível
+USE_SNAPSHOT = True      # Usar snapshot Parquet do CSV (evita re-parsear o CSV)
+SNAPSHOT_DIR = DATA_DIR / "snapshot"
+
+# Schema do dataset (fonte única para geração e leitura)
+SCHEMA_SENSORES_IOT = StructType([
+    StructField("sensor_id", StringType(), False),
+    StructField("sensor_type", StringType(), False),
+    StructField("location", StringType(), False),
+    StructField("city", StringType(), False),
+    StructField("timestamp", TimestampType(), False),
+    StructField("value", DoubleType(), False),
+    StructField("unit", StringType(), False),
+    StructField("battery_level", IntegerType(), False),
+    StructField("signal_strength", IntegerType(), False),
+    StructField("status", StringType(), False)
+])
+TIMESTAMP_FORMAT = "yyyy-MM-dd HH:mm:ss"
+
+# Gerador de dados (determinístico por seed, independente do particionamento)
+GENERATOR_SEED = 42
+GENERATOR_PARTICOES = None   # None = spark.default.parallelism
+GENERATOR_FORMATO = 'CSV'    # Formato em que o dataset gerado é salvo
+GENERATOR_DISTRIBUICOES = {
+    'sensores': 'uniforme',     # 'uniforme' ou 'zipf' (poucos sensores concentram as leituras)
+    'zipf_expoente': 1.1,
+    'valores': 'uniforme',      # 'uniforme' ou 'diurno' (ciclo diário por hora)
+    'timestamps': 'uniforme',   # 'uniforme' (ano todo) ou 'sequencial' (ordem de chegada)
+    'fracao_atrasados': 0.0,    # Leituras que chegam atrasadas (apenas 'sequencial')
+    'atraso_maximo_s': 3600,
+}
+NUM_SENSORES = 1000
+INICIO_DADOS = "2024-01-01 00:00:00"
+SEGUNDOS_ANO = 366 * 24 * 3600  # 2024 é bissexto
+ESCALA_UNIFORME = 1 << 53       # Resolução do uniforme (mantissa do double)
+# Tipo -> (mínimo, amplitude, unidade)
+FAIXAS_SENSORES = {
+    'TEMPERATURE': (15.0, 20.0, 'Celsius'),
+    'HUMIDITY': (30.0, 60.0, 'Percent'),
+    'PRESSURE': (980.0, 50.0, 'hPa'),
+    'CO2': (400.0, 600.0, 'ppm'),
+    'LIGHT': (0.0, 1000.0, 'lux'),
+}
+LOCALIZACOES = ['Building_A', 'Building_B', 'Building_C', 'Building_D', 'Building_E']
+CIDADES = ['São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Brasília', 'Curitiba']
+# Colunas redundantes: expressão SQL que as reconstrói a partir das demais
+EXPRESSOES_DERIVADAS = {
+    'unit': "case sensor_type " + " ".join(f"when '{tipo}' then '{unidade}'"
+                                           for tipo, (_, _, unidade) in FAIXAS_SENSORES.items()) + " end",
+    'status': "case when battery_level > 20 then 'ACTIVE' else 'LOW_BATTERY' end",
+}
+
+# Configurações de escrita
+WRITE_STORAGE_LEVEL = "MEMORY_AND_DISK"  # Nível de persistência da origem antes das escritas
+WRITE_PARALLEL = True                    # Escrever os formatos concorrentemente
+
+WRITE_LAYOUT = {'arquivos': None, 'max_registros': 0}  # Layout padrão (ver aplicar_layout)
+WRITE_CODECS = {'CSV': 'none', 'JSON': 'none', 'Parquet': 'snappy', 'ORC': 'snappy', 'Arrow': 'none'}
+# Blocos menores que o padrão para que haja vários row groups/stripes por
+# arquivo (experimentos de estatísticas min/max e bloom filters)
+OPCOES_BLOCOS_PEQUENOS = {'parquet.block.size': 4 * 1024 * 1024, 'orc.stripe.size': 4 * 1024 * 1024}
+
+# Matriz de codecs (modo "codecs"): formato -> [(rótulo, codec, opções extras)]
+CODEC_MATRIX = {
+    'CSV': [("none", "none", {}), ("gzip", "gzip", {}), ("bzip2", "bzip2", {}),
+            ("lz4", "lz4", {}), ("snappy", "snappy", {})],
+    'JSON': [("none", "none", {}), ("gzip", "gzip", {}), ("bzip2", "bzip2", {}),
+             ("lz4", "lz4", {}), ("snappy", "snappy", {})],
+    'Parquet': [("none", "none", {}), ("snappy", "snappy", {}), ("lz4", "lz4", {}),
+                ("zstd-1", "zstd", {'parquet.compression.codec.zstd.level': 1}),
+                ("zstd-3", "zstd", {'parquet.compression.codec.zstd.level': 3}),
+                ("zstd-9", "zstd", {'parquet.compression.codec.zstd.level': 9}),
+                ("gzip", "gzip", {})],
+    'ORC': [("none", "none", {}), ("snappy", "snappy", {}), ("lz4", "lz4", {}),
+            ("zstd", "zstd", {}), ("zlib", "zlib", {})],
+    'Arrow': [("none", "none", {}), ("lz4", "lz4", {}), ("zstd", "zstd", {})],
+}
+CODEC_MATRIX_DIR = DATA_DIR / "codecs"
+CODEC_MATRIX_PATH = OUTPUT_DIR / "codec_matrix.json"
+
+# Esquemas de particionamento Hive-style (modo "particoes")
+PARTITION_SCHEMES = [['city'], ['sensor_type', 'city'], ['mes'], ['dia']]
+PARTITION_DIR = DATA_DIR / "particionado"
+
+# Estratégias de clusterização (modo "clusterizacao"): (estratégia, colunas)
+CLUSTER_STRATEGIES = [
+    ('nenhuma', []),
+    ('linear', ['sensor_id', 'timestamp']),
+    ('linear', ['timestamp']),
+    ('zorder', ['sensor_id', 'timestamp']),
+    ('hilbert', ['sensor_id', 'timestamp']),
+]
+CLUSTER_DIR = DATA_DIR / "clusterizado"
+
+# Bloom filters (Parquet/ORC): coluna -> número esperado de valores distintos
+BLOOM_COLUNAS = {'sensor_id': 1000}
+BLOOM_FPP = 0.01
+BLOOM_DIR = DATA_DIR / "bloom"
+
+# Consultas pontuais: leituras de um sensor_id numa janela de tempo
+LOOKUP_SENSORES_PRESENTES = 10   # IDs sorteados entre os sensores existentes
+LOOKUP_SENSORES_AUSENTES = 10    # IDs que não existem no dataset
+LOOKUP_JANELA = (datetime(2024, 6, 1), datetime(2024, 6, 30, 23, 59, 59))
+LOOKUP_SEED = 42
+
+# Varredura de layout de arquivos (modo "layout")
+LAYOUT_SWEEP_ARQUIVOS = [1, 4, 8, 16]                # repartition N
+LAYOUT_SWEEP_MAX_REGISTROS = [0, 250_000, 50_000]     # maxRecordsPerFile (0 = sem limite)
+LAYOUT_SWEEP_DIR = DATA_DIR / "layouts"
+
+# Varredura de escala (modo "escala"): pipeline completo em tamanhos geométricos
+SCALE_SWEEP_TAMANHOS = [1_000_000, 10_000_000, 50_000_000, 100_000_000]
+SCALE_SWEEP_TRIALS = 3
+SCALE_SWEEP_DIR = DATA_DIR / "escala"
+SCALE_SWEEP_MANTER_DADOS = False  # Remove os dados de cada tamanho após medir (disco)
+
+# Ciclo de vida Hot/Warm/Cold (modo "ciclo_vida"), por idade do timestamp.
+# Custos de referência em USD por GB-mês (object storage padrão / acesso
+# infrequente / arquivo com recuperação imediata)
+LIFECYCLE_CAMADAS = [
+    {'nome': 'hot', 'idade_max_dias': 7, 'formato': 'Parquet', 'codec': 'snappy', 'opcoes': {},
+     'particao': 'dia', 'custo_gb_mes': 0.023},
+    {'nome': 'warm', 'idade_max_dias': 90, 'formato': 'Parquet', 'codec': 'zstd',
+     'opcoes': {'parquet.compression.codec.zstd.level': 9}, 'particao': 'mes', 'custo_gb_mes': 0.0125},
+    {'nome': 'cold', 'idade_max_dias': None, 'formato': 'ORC', 'codec': 'zlib', 'opcoes': {},
+     'particao': 'mes', 'custo_gb_mes': 0.004},
+]
+LIFECYCLE_DIR = DATA_DIR / "ciclo_vida"
+LIFECYCLE_BASE_DIR = DATA_DIR / "ciclo_vida_base"   # Referência: tudo num único Parquet snappy
+LIFECYCLE_REFERENCIA = datetime(2024, 12, 1)         # "Agora" na carga inicial
+LIFECYCLE_PASSOS_DIAS = [1, 7, 23]                   # Avanços incrementais da referência
+# Janelas de consulta: nome -> (início, fim) em dias antes da referência final
+LIFECYCLE_JANELAS = {
+    'ultimo_dia': (1, 0),
+    'ultima_semana': (7, 0),
+    'ultimos_30_dias': (30, 0),
+    'ultimos_180_dias': (180, 0),
+    'trimestre_antigo': (300, 210),
+}
+
+# Ingestão contínua (modo "ingestao"): um processo gerador grava pequenos
+# lotes num diretório de entrada e o Structured Streaming os anexa aos
+# layouts Parquet/ORC de DATA_DIR (os mesmos lidos pelo modo completo)
+STREAMING_DIR = DATA_DIR / "streaming"             # entrada/ e checkpoint/
+STREAMING_FORMATO_ENTRADA = 'CSV'                  # CSV ou JSON
+STREAMING_LINHAS_POR_LOTE = 500
+STREAMING_LOTES_POR_SEGUNDO = 2.0
+STREAMING_DURACAO_S = 120
+STREAMING_TRIGGER = "2 seconds"                    # Intervalo entre micro-batches
+STREAMING_MAX_ARQUIVOS_POR_TRIGGER = 50
+STREAMING_FORMATOS_DESTINO = ['Parquet', 'ORC']
+STREAMING_INTERVALO_CONSULTA_S = 15                # Mede a query de referência a cada N s
+STREAMING_QUERY = 'agregacao'                      # Query de QUERIES medida durante a ingestão
+
+# Compactação de arquivos pequenos (modo "compactacao") em DATA_DIR/parquet e orc
+COMPACTION_FORMATOS = ['Parquet', 'ORC']
+COMPACTION_LIMIAR_BYTES = 32 * 1024 * 1024   # Arquivos menores que isso são compactados
+COMPACTION_ALVO_BYTES = 128 * 1024 * 1024    # Tamanho alvo dos arquivos compactados
+COMPACTION_MIN_ARQUIVOS = 2                  # Arquivos pequenos mínimos para compactar a partição
+COMPACTION_ORDENACAO = ['timestamp']         # Ordem das linhas nos arquivos compactados
+
+# Autoajuste de configurações de sessão (modo "autoajuste", ver autoajuste.py).
+# Parâmetros com ".parquet." ou ".orc." no nome só entram no espaço do próprio formato.
+TUNING_ESPACO = {
+    'spark.sql.shuffle.partitions': [8, 32, 200],
+    'spark.sql.files.maxPartitionBytes': ['32MB', '128MB', '512MB'],
+    'spark.sql.files.openCostInBytes': ['1MB', '4MB', '16MB'],
+    'spark.sql.parquet.enableVectorizedReader': ['true', 'false'],
+    'spark.sql.parquet.columnarReaderBatchSize': [1024, 4096, 16384],
+    'spark.sql.orc.enableVectorizedReader': ['true', 'false'],
+    'spark.sql.orc.columnarReaderBatchSize': [1024, 4096, 16384],
+    'spark.sql.adaptive.enabled': ['true', 'false'],
+    'spark.sql.adaptive.coalescePartitions.enabled': ['true', 'false'],
+    'spark.sql.adaptive.advisoryPartitionSizeInBytes': ['16MB', '64MB'],
+}
+TUNING_FORMATOS = ['CSV', 'JSON', 'Parquet', 'ORC']
+TUNING_ESTRATEGIA = 'halving'   # grade, aleatoria ou halving
+TUNING_AMOSTRAS = 24            # Configurações sorteadas (aleatoria e halving)
+TUNING_ETA = 2                  # Halving: a cada etapa segue 1/eta das configurações
+TUNING_SEED = 42
+TUNING_PATH = OUTPUT_DIR / "autoajuste.json"
+
+# Benchmark de cache (modo "cache"): cada formato persistido em cada nível e
+# o workload repetido sobre o DataFrame em cache. Níveis como no Scala
+# (StorageLevel(disco, memória, off-heap, desserializado)); as constantes do
+# PySpark são todos serializados.
+CACHE_NIVEIS = {
+    'MEMORY_ONLY': StorageLevel(False, True, False, True),
+    'MEMORY_AND_DISK': StorageLevel(True, True, False, True),
+    'MEMORY_ONLY_SER': StorageLevel(False, True, False, False),
+    'MEMORY_AND_DISK_SER': StorageLevel(True, True, False, False),
+    'DISK_ONLY': StorageLevel(True, False, False, False),
+    'OFF_HEAP': StorageLevel(True, True, True, False),
+}
+CACHE_FORMATOS = ['CSV', 'JSON', 'Parquet', 'ORC', 'Arrow']
+CACHE_OFF_HEAP = "2g"   # Memória off-heap reservada quando o modo cache cria a sessão
+CACHE_PATH = OUTPUT_DIR / "cache.json"
+
+# Rollups (agregados materializados, ver rollups.py): construídos a partir de
+# ROLLUP_FONTE em DATA_DIR e mantidos incrementalmente a cada arquivo novo
+ROLLUP_DIR = DATA_DIR / "rollups"
+ROLLUP_FONTE = 'Parquet'     # Formato (Parquet ou ORC) lido para construir/atualizar os rollups
+ROLLUP_AO_SALVAR = True      # Atualiza os rollups após salvar_em_formatos (completo) e a ingestão
+ROLLUP_DEFINICOES = [
+    {'nome': 'sensor_hora', 'chaves': ['sensor_id', 'sensor_type'], 'tempo': 'hora',
+     'sketches': {'cidades_hll': 'city'}},
+    {'nome': 'cidade_tipo_dia', 'chaves': ['city', 'sensor_type'], 'tempo': 'dia',
+     'sketches': {'sensores_hll': 'sensor_id'}},
+]
+ROLLUP_FORMATOS_BRUTOS = ['CSV', 'Parquet', 'ORC']   # Formatos em que as consultas são medidas sem rollup
+# Consultas de painel: nome -> (descrição, consulta declarativa de rollups.py)
+ROLLUP_CONSULTAS = {
+    'leitura': ("Contagem total", {'agrupar': [], 'medidas': {'count': ('count', None)}}),
+    'agregacao': ("Contagem por cidade", {'agrupar': ['city'], 'medidas': {'count': ('count', None)}}),
+    'media_horaria_por_tipo': ("Média horária por tipo (uma semana)", {
+        'agrupar': ['hora', 'sensor_type'],
+        'medidas': {'media': ('avg', 'value'), 'leituras': ('count', None)},
+        'intervalo': (datetime(2024, 6, 10), datetime(2024, 6, 17))}),
+    'diario_cidade_tipo': ("Média e extremos diários por cidade e tipo (um mês)", {
+        'agrupar': ['dia', 'city', 'sensor_type'],
+        'medidas': {'media': ('avg', 'value'), 'minimo': ('min', 'value'), 'maximo': ('max', 'value')},
+        'intervalo': (datetime(2024, 6, 1), datetime(2024, 7, 1))}),
+    'extremos_sensor': ("Extremos diários de um sensor", {
+        'agrupar': ['dia'], 'medidas': {'minimo': ('min', 'value'), 'maximo': ('max', 'value')},
+        'filtros': {'sensor_id': 'SENSOR_0042'}}),
+    'sensores_por_cidade': ("Sensores distintos por cidade (HLL)", {
+        'agrupar': ['city'], 'medidas': {'sensores': ('distinct_aprox', 'sensor_id')}}),
+}
+ROLLUP_PATH = OUTPUT_DIR / "rollups.json"
+
+# Esquema físico compacto (modo "esquema_compacto", ver esquema_compacto.py)
+COMPACT_CATEGORICAS = ['sensor_id', 'sensor_type', 'location', 'city']   # Codificadas por dicionário
+COMPACT_INTEIROS = ['battery_level', 'signal_strength']                   # Estreitadas pela faixa observada
+COMPACT_VALOR = ['double', 'float32', 'decimal']   # Variantes de armazenamento de value medidas
+COMPACT_ESCALA_VALOR = 2                           # Casas decimais do decimal (round(value, 2) na geração)
+COMPACT_FORMATOS = ['CSV', 'JSON', 'Parquet', 'ORC', 'Arrow']
+COMPACT_DIR = DATA_DIR / "compacto"
+COMPACT_PATH = OUTPUT_DIR / "esquema_compacto.json"
+
+# Configurações estáticas (fixadas na criação da SparkSession) por modo; a sessão quente usa a união
+CONFIG_ESTATICA_MODO = {
+    'cache': {'spark.memory.offHeap.enabled': "true", 'spark.memory.offHeap.size': CACHE_OFF_HEAP},
+}
+
+# Sessão quente: servidor local que mantém a SparkSession entre execuções (--servidor / --remoto)
+SESSAO_ENDERECO = ('localhost', 8790)
+SESSAO_CHAVE_PATH = OUTPUT_DIR / ".sessao_chave"      # Chave de autenticação (0600) do servidor ativo
+SESSAO_LATENCIAS_PATH = OUTPUT_DIR / "sessao.json"    # Histórico de partidas a frio e sessões quentes
+SESSAO_SONDA_LINHAS = 5_000_000                       # Linhas da query-sonda (spark.range + agregação)
+SESSAO_AQUECIMENTO = 3                                # Sondas descartadas ao subir o servidor
+
+# Histórico de execuções (SQLite somente inclusão, ver historico_resultados.py)
+HISTORICO_PATH = OUTPUT_DIR / "historico.sqlite"
+
+# Configurações do benchmark
+BENCHMARK_WARMUP = 1   # Rodadas de aquecimento descartadas (JIT, cache de metadados)
+BENCHMARK_TRIALS = 5   # Rodadas medidas por formato e query
+# Motores de nó único comparados ao Spark nas queries padrão (ver motores.py)
+BENCHMARK_MOTORES = ['pyarrow', 'duckdb', 'polars', 'pandas']
+
+# Workload de consultas (YAML/JSON) somado às queries padrão no modo completo
+WORKLOAD_PADRAO = Path(__file__).resolve().parent / "workloads" / "iot_padrao.yaml"
 
 print("=" * 80)
 print("TEMA B - OTIMIZAÇÃO DE ARMAZENAMENTO E CONSULTA v2.0")
@@ -84,26 +374,35 @@ print()
 # CONFIGURAÇÃO DO SPARK
 # ============================================================================
 
-def criar_spark_session():
+def criar_spark_session(configuracoes=None):
     """
     Cria SparkSession otimizada para ambiente Docker.
+    
+    `configuracoes` acrescenta configurações estáticas (ver
+    CONFIG_ESTATICA_MODO), que não podem ser alteradas depois da criação.
     """
     print("Iniciando Spark Session...")
     
-    spark = SparkSession.builder \
+    builder = SparkSession.builder \
         .appName("Tema B - Otimização Armazenamento v2.0") \
         .config("spark.driver.memory", "4g") \
         .config("spark.executor.memory", "4g") \
         .config("spark.sql.adaptive.enabled", "true") \
         .config("spark.sql.adaptive.coalescePartitions.enabled", "true") \
         .config("spark.sql.files.maxPartitionBytes", "128MB") \
-        .config("spark.driver.host", "localhost") \
-        .getOrCreate()
+        .config("spark.scheduler.mode", "FAIR") \
+        .config("spark.sql.session.timeZone", "UTC") \
+        .config("spark.sql.parquet.outputTimestampType", "TIMESTAMP_MICROS") \
+        .config("spark.driver.host", "localhost")
+    for chave, valor in (configuracoes or {}).items():
+        builder = builder.config(chave, valor)
+    spark = builder.getOrCreate()
     
     spark.sparkContext.setLogLevel("WARN")
     
     print(f"✓ Spark {spark.version} iniciado com sucesso")
-    print(f"✓ Adaptive Query Execution: Habilitado")
+    print("✓ Adaptive Query Execution: Habilitado")
+    print("✓ Scheduler: FAIR (pools por formato nas escritas)")
     print()
     
     return spark
@@ -113,6 +412,11 @@ def criar_spark_session():
 # ETAPA 1: CARREGAR OU GERAR DATASET
 # ============================================================================
 
+def esquema_snapshot():
+    """Como o CSV de origem é lido (schema e formato de timestamp): parte da chave do snapshot."""
+    return f"{SCHEMA_SENSORES_IOT.simpleString()}|{TIMESTAMP_FORMAT}"
+
+
 def carregar_ou_gerar_dataset(spark):
     """
     Carrega dataset pré-gerado ou gera um novo.
@@ -124,15 +428,24 @@ def carregar_ou_gerar_dataset(spark):
     # Verificar se dataset pré-gerado existe
     if USE_PREGENERATED and DATASET_CSV_PATH.exists():
         print(f"Dataset pré-gerado encontrado: {DATASET_CSV_PATH}")
-        print("Carregando dataset...")
         
         start_time = time.time()
         
-        # Carregar CSV com schema inferido
-        df = spark.read \
-            .option("header", "true") \
-            .option("inferSchema", "true") \
-            .csv(str(DATASET_CSV_PATH))
+        snapshot_path = None
+        if USE_SNAPSHOT:
+            snapshot_path, digital = snapshot_valido(DATASET_CSV_PATH, SNAPSHOT_DIR, esquema_snapshot())
+        
+        if snapshot_path:
+            print(f"Snapshot válido encontrado (sha256 {digital['sha256'][:12]}...), "
+                  f"pulando parsing do CSV")
+            df = spark.read.parquet(snapshot_path)
+        else:
+            print("Carregando dataset com schema explícito...")
+            df = ler_csv_origem(spark, DATASET_CSV_PATH)
+            if USE_SNAPSHOT:
+                print(f"Criando snapshot colunar em: {SNAPSHOT_DIR}")
+                snapshot_path = criar_snapshot(df, SNAPSHOT_DIR, digital)
+                df = spark.read.parquet(snapshot_path)
         
         elapsed = time.time() - start_time
         count = df.count()
@@ -149,89 +462,149 @@ def carregar_ou_gerar_dataset(spark):
         return gerar_dataset_iot(spark)
 
 
-def gerar_dataset_iot(spark, num_records=NUM_RECORDS):
+def ler_csv_origem(spark, path):
+    """
+    Lê o CSV de origem aplicando o schema declarado (sem inferSchema,
+    que custaria uma passada extra completa sobre o arquivo).
+    """
+    return spark.read \
+        .schema(SCHEMA_SENSORES_IOT) \
+        .option("header", "true") \
+        .option("timestampFormat", TIMESTAMP_FORMAT) \
+        .csv(str(path))
+
+
+def uniforme(seed, fluxo):
     """
-    Gera dataset de sensores IoT do zero.
+    Expressão SQL de um número pseudoaleatório uniforme em [0, 1) por linha.
+
+    Derivado do hash de (id, seed, fluxo): depende só da linha, não da
+    partição nem da ordem de execução, de modo que o dataset é o mesmo para
+    qualquer número de partições/cores. Cada coluna usa um `fluxo` próprio
+    (números independentes entre colunas).
+    """
+    return f"(pmod(xxhash64(id, {seed}, {fluxo}), {ESCALA_UNIFORME}) / {float(ESCALA_UNIFORME)})"
+
+
+def escolher(valores, u):
+    """Expressão SQL que escolhe um elemento de `valores` com probabilidade igual."""
+    literais = ", ".join(f"'{v}'" for v in valores)
+    return f"element_at(array({literais}), cast(floor({u} * {len(valores)}) as int) + 1)"
+
+
+def indice_sensor(distribuicoes, u, num_sensores=NUM_SENSORES):
+    """
+    Expressão SQL do índice do sensor (0 a num_sensores - 1).
+
+    'zipf' usa a inversa da CDF contínua da lei de potência truncada:
+    o sensor 0 é o mais frequente e a frequência cai com o posto^expoente.
+    """
+    if distribuicoes['sensores'] == 'uniforme':
+        return f"cast(floor({u} * {num_sensores}) as int)"
+    s = distribuicoes['zipf_expoente']
+    if s == 1:
+        posto = f"exp({u} * ln({num_sensores + 1}))"
+    else:
+        posto = f"pow((pow({num_sensores + 1}, {1 - s}) - 1) * {u} + 1, {1 / (1 - s)})"
+    return f"least(cast(floor({posto}) as int) - 1, {num_sensores - 1})"
+
+
+def segundos_timestamp(distribuicoes, seed, num_records):
+    """
+    Expressão SQL do instante da leitura, em segundos desde o início do ano.
+
+    'uniforme': instantes sorteados ao longo do ano (fora de ordem).
+    'sequencial': leituras em ordem de chegada (crescente com o id), com uma
+    fração `fracao_atrasados` que chega até `atraso_maximo_s` depois do
+    instante em que foi medida (eventos fora de ordem).
+    """
+    if distribuicoes['timestamps'] == 'uniforme':
+        return f"floor({uniforme(seed, 4)} * {SEGUNDOS_ANO})"
+    chegada = f"floor(id * {SEGUNDOS_ANO / max(num_records, 1)})"
+    atraso = (f"if({uniforme(seed, 5)} < {distribuicoes['fracao_atrasados']}, "
+              f"floor({uniforme(seed, 6)} * {distribuicoes['atraso_maximo_s']}), 0)")
+    return f"greatest({chegada} - {atraso}, 0)"
+
+
+def expressao_valor(distribuicoes, seed):
+    """
+    Expressão SQL de value, na faixa do tipo de sensor (FAIXAS_SENSORES).
+
+    'diurno' segue um ciclo diário (pico às 15h, vale às 3h) com ruído de
+    ±15% da faixa; 'uniforme' sorteia na faixa toda.
+    """
+    u = uniforme(seed, 7)
+    if distribuicoes['valores'] == 'uniforme':
+        fracao = u
+    else:
+        hora = "((unix_timestamp(`timestamp`) % 86400) / 86400.0)"
+        fracao = f"(0.5 + 0.35 * sin(2 * pi() * ({hora} - 0.375)) + 0.15 * (2 * {u} - 1))"
+    casos = " ".join(
+        f"when '{tipo}' then {minimo} + {fracao} * {amplitude}"
+        for tipo, (minimo, amplitude, _) in FAIXAS_SENSORES.items()
+    )
+    return f"round(case sensor_type {casos} end, 2)"
+
+
+def construir_dataset_iot(spark, num_records=NUM_RECORDS, seed=GENERATOR_SEED,
+                          distribuicoes=None, particoes=GENERATOR_PARTICOES):
+    """
+    Define (de forma lazy) o dataset de sensores IoT, sem materializá-lo.
     
     Cenário: Rede de monitoramento ambiental com sensores de temperatura,
     umidade, pressão, CO2 e luminosidade.
+    
+    Determinístico por `seed`: cada coluna é função apenas do id da linha
+    (ver `uniforme`), então a geração escala com os cores sem afetar o
+    resultado. `distribuicoes` sobrepõe GENERATOR_DISTRIBUICOES.
     """
-    print(f"Gerando {num_records:,} registros de sensores IoT...")
+    distribuicoes = {**GENERATOR_DISTRIBUICOES, **(distribuicoes or {})}
+    particoes = particoes or spark.sparkContext.defaultParallelism
     
-    start_time = time.time()
+    # Gerar dados usando Spark SQL (uma expressão por coluna, todas a partir do id)
+    return spark.range(0, num_records, 1, particoes) \
+        .withColumn("sensor_id", expr(
+            f"concat('SENSOR_', lpad(cast({indice_sensor(distribuicoes, uniforme(seed, 0))} as string), 4, '0'))")) \
+        .withColumn("sensor_type", expr(escolher(FAIXAS_SENSORES, uniforme(seed, 1)))) \
+        .withColumn("location", expr(escolher(LOCALIZACOES, uniforme(seed, 2)))) \
+        .withColumn("city", expr(escolher(CIDADES, uniforme(seed, 3)))) \
+        .withColumn("timestamp", expr(
+            f"timestamp_seconds(unix_timestamp('{INICIO_DADOS}') + "
+            f"{segundos_timestamp(distribuicoes, seed, num_records)})")) \
+        .withColumn("value", expr(expressao_valor(distribuicoes, seed))) \
+        .withColumn("unit", expr(EXPRESSOES_DERIVADAS['unit'])) \
+        .withColumn("battery_level", expr(f"cast(10 + floor({uniforme(seed, 8)} * 91) as int)")) \
+        .withColumn("signal_strength", expr(f"cast(-90 + floor({uniforme(seed, 9)} * 61) as int)")) \
+        .withColumn("status", expr(EXPRESSOES_DERIVADAS['status'])) \
+        .select([col(f.name).cast(f.dataType) for f in SCHEMA_SENSORES_IOT.fields])
+
+
+def gerar_dataset_iot(spark, num_records=NUM_RECORDS, formato=GENERATOR_FORMATO, path=None, **opcoes):
+    """
+    Gera dataset de sensores IoT do zero e o salva para uso futuro.
     
-    # Schema do dataset
-    schema = StructType([
-        StructField("sensor_id", StringType(), False),
-        StructField("sensor_type", StringType(), False),
-        StructField("location", StringType(), False),
-        StructField("city", StringType(), False),
-        StructField("timestamp", TimestampType(), False),
-        StructField("value", DoubleType(), False),
-        StructField("unit", StringType(), False),
-        StructField("battery_level", IntegerType(), False),
-        StructField("signal_strength", IntegerType(), False),
-        StructField("status", StringType(), False)
-    ])
+    A escrita é feita diretamente no formato desejado, em paralelo (um
+    arquivo por partição), com o mesmo escritor usado na ETAPA 2. Por
+    padrão o CSV vai para DATASET_CSV_PATH (diretório de saída do Spark).
+    `opcoes` são repassadas a `construir_dataset_iot` (seed, distribuições,
+    partições). Como a geração é determinística, o DataFrame retornado
+    (lazy) produz exatamente os dados gravados.
+    """
+    path = str(path or DATASET_CSV_PATH)
+    print(f"Gerando {num_records:,} registros de sensores IoT "
+          f"(seed {opcoes.get('seed', GENERATOR_SEED)}) em {formato}: {path}")
+    
+    start_time = time.time()
     
-    # Gerar dados usando Spark SQL
-    df = spark.range(0, num_records) \
-        .withColumn("sensor_id", expr("concat('SENSOR_', lpad(cast(id % 1000 as string), 4, '0'))")) \
-        .withColumn("sensor_type", 
-            expr("case when rand() < 0.2 then 'TEMPERATURE' " +
-                 "when rand() < 0.4 then 'HUMIDITY' " +
-                 "when rand() < 0.6 then 'PRESSURE' " +
-                 "when rand() < 0.8 then 'CO2' " +
-                 "else 'LIGHT' end")) \
-        .withColumn("location", 
-            expr("case when rand() < 0.2 then 'Building_A' " +
-                 "when rand() < 0.4 then 'Building_B' " +
-                 "when rand() < 0.6 then 'Building_C' " +
-                 "when rand() < 0.8 then 'Building_D' " +
-                 "else 'Building_E' end")) \
-        .withColumn("city", 
-            expr("case when rand() < 0.2 then 'São Paulo' " +
-                 "when rand() < 0.4 then 'Rio de Janeiro' " +
-                 "when rand() < 0.6 then 'Belo Horizonte' " +
-                 "when rand() < 0.8 then 'Brasília' " +
-                 "else 'Curitiba' end")) \
-        .withColumn("timestamp", 
-            expr("cast(from_unixtime(unix_timestamp('2024-01-01 00:00:00') + cast(rand() * 31536000 as int)) as timestamp)")) \
-        .withColumn("value", 
-            when(col("sensor_type") == "TEMPERATURE", expr("15.0 + rand() * 20.0"))
-            .when(col("sensor_type") == "HUMIDITY", expr("30.0 + rand() * 60.0"))
-            .when(col("sensor_type") == "PRESSURE", expr("980.0 + rand() * 50.0"))
-            .when(col("sensor_type") == "CO2", expr("400.0 + rand() * 600.0"))
-            .otherwise(expr("rand() * 1000.0"))) \
-        .withColumn("unit",
-            when(col("sensor_type") == "TEMPERATURE", "Celsius")
-            .when(col("sensor_type") == "HUMIDITY", "Percent")
-            .when(col("sensor_type") == "PRESSURE", "hPa")
-            .when(col("sensor_type") == "CO2", "ppm")
-            .otherwise("lux")) \
-        .withColumn("battery_level", expr("cast(10 + rand() * 90 as int)")) \
-        .withColumn("signal_strength", expr("cast(-90 + rand() * 60 as int)")) \
-        .withColumn("status", 
-            when(col("battery_level") > 20, "ACTIVE")
-            .otherwise("LOW_BATTERY")) \
-        .drop("id")
+    df = construir_dataset_iot(spark, num_records, **opcoes)
+    writer = df.write.mode("overwrite").option("compression", WRITE_CODECS[formato])
+    ESCRITORES[formato][1](writer, path)
     
     elapsed = time.time() - start_time
     
-    print(f"✓ Dataset gerado: {df.count():,} registros")
-    print(f"✓ Tempo de geração: {elapsed:.2f}s")
+    print(f"✓ Dataset gerado: {num_records:,} registros ({df.rdd.getNumPartitions()} arquivos)")
+    print(f"✓ Tempo de geração: {elapsed:.2f}s ({num_records / elapsed:,.0f} registros/s)")
     print(f"✓ Schema: {len(df.columns)} colunas")
-    
-    # Salvar CSV para uso futuro
-    print(f"Salvando dataset em: {DATASET_CSV_PATH}")
-    df.coalesce(1).write.mode("overwrite").option("header", "true").csv(str(DATASET_CSV_PATH.parent / "temp_csv"))
-    # Mover arquivo gerado para o nome correto
-    import shutil
-    temp_files = list((DATASET_CSV_PATH.parent / "temp_csv").glob("*.csv"))
-    if temp_files:
-        shutil.move(str(temp_files[0]), str(DATASET_CSV_PATH))
-        shutil.rmtree(str(DATASET_CSV_PATH.parent / "temp_csv"))
-    print(f"✓ Dataset salvo em: {DATASET_CSV_PATH}")
     print()
     
     return df
@@ -241,55 +614,262 @@ def gerar_dataset_iot(spark, num_records=NUM_RECORDS):
 # ETAPA 2: PERSISTÊNCIA EM MÚLTIPLOS FORMATOS
 # ============================================================================
 
-def salvar_em_formatos(df, base_path):
+def escrever_csv(writer, path):
+    # Mesmo formato de timestamp usado na leitura (ler_formato/ler_csv_origem)
+    writer.option("header", "true").option("timestampFormat", TIMESTAMP_FORMAT).csv(path)
+
+
+def escrever_json(writer, path):
+    writer.json(path)
+
+
+def escrever_parquet(writer, path):
+    writer.parquet(path)
+
+
+def escrever_orc(writer, path):
+    writer.orc(path)
+
+
+# Formato -> (subdiretório, função de escrita)
+# Arrow IPC não tem DataFrameWriter: é escrito por formato_arrow.escrever_arrow
+ESCRITORES = {
+    'CSV': ("csv", escrever_csv),
+    'JSON': ("json", escrever_json),
+    'Parquet': ("parquet", escrever_parquet),
+    'ORC': ("orc", escrever_orc),
+    'Arrow': ("arrow", None),
+}
+FORMATOS_SEM_PARTICIONAMENTO = {'Arrow'}
+
+# Chaves de partição derivadas do timestamp
+CHAVES_DERIVADAS = {
+    'dia': "to_date(timestamp)",
+    'mes': "year(timestamp) * 100 + month(timestamp)",
+}
+
+
+def adicionar_chaves_derivadas(df, chaves):
+    """Adiciona as chaves derivadas (dia/mes) que ainda não existem no DataFrame."""
+    for chave in chaves:
+        if chave in CHAVES_DERIVADAS and chave not in df.columns:
+            df = df.withColumn(chave, expr(CHAVES_DERIVADAS[chave]))
+    return df
+
+
+def opcoes_bloom_filter(formato, bloom):
+    """
+    Opções de escrita que habilitam bloom filters no Parquet e no ORC.
+
+    `bloom` é um dict {'colunas': {coluna: ndv_esperado}, 'fpp': float}.
+    Formatos texto não suportam bloom filters (retorna dict vazio).
+    """
+    if not bloom:
+        return {}
+    colunas, fpp = bloom['colunas'], bloom['fpp']
+    if formato == 'Parquet':
+        opcoes = {}
+        for coluna, ndv in colunas.items():
+            opcoes[f"parquet.bloom.filter.enabled#{coluna}"] = "true"
+            opcoes[f"parquet.bloom.filter.expected.ndv#{coluna}"] = str(ndv)
+            opcoes[f"parquet.bloom.filter.fpp#{coluna}"] = str(fpp)
+        return opcoes
+    if formato == 'ORC':
+        return {'orc.bloom.filter.columns': ",".join(colunas), 'orc.bloom.filter.fpp': str(fpp)}
+    return {}
+
+
+def aplicar_layout(df, layout):
+    """
+    Aplica o layout de arquivos ao DataFrame.
+
+    `layout` aceita as chaves:
+    - 'arquivos': número de partições de saída (repartition N); None mantém
+      o particionamento da origem
+    - 'max_registros': limite de registros por arquivo (maxRecordsPerFile);
+      0 ou None significa sem limite
+    - 'particoes_por': colunas de particionamento Hive-style (city,
+      sensor_type, dia, mes). Os dados são reparticionados pelas chaves para
+      que cada diretório de partição receba poucos arquivos.
+    - 'clusterizacao': (estratégia, colunas) — 'linear', 'zorder' ou
+      'hilbert' (ver clusterizacao.py). Sem particionamento, os dados são
+      distribuídos por faixas da chave (repartitionByRange); em todos os
+      casos são ordenados dentro de cada arquivo pela chave.
+    - 'opcoes_escrita': opções adicionais do writer (ex.: parquet.block.size)
+    - 'bloom_filter': bloom filters do Parquet/ORC (ver opcoes_bloom_filter);
+      aplicado em `escrever_formato`, pois depende do formato
+
+    Retorna (df, opcoes_de_escrita, colunas_de_particao).
+    """
+    layout = layout or {}
+    opcoes = dict(layout.get('opcoes_escrita') or {})
+    particoes = list(layout.get('particoes_por') or [])
+    n = layout.get('arquivos')
+    
+    ordenacao = []
+    if layout.get('clusterizacao'):
+        estrategia, colunas = layout['clusterizacao']
+        df, ordenacao = adicionar_chave_cluster(df, estrategia, colunas)
+    
+    if particoes:
+        df = adicionar_chaves_derivadas(df, particoes)
+        df = df.repartition(n, *particoes) if n else df.repartition(*particoes)
+    elif ordenacao:
+        df = df.repartitionByRange(n, *ordenacao) if n else df.repartitionByRange(*ordenacao)
+    elif n:
+        df = df.repartition(n)
+    
+    if ordenacao:
+        df = remover_chave_cluster(df.sortWithinPartitions(*particoes, *ordenacao))
+    
+    if layout.get('max_registros'):
+        opcoes['maxRecordsPerFile'] = layout['max_registros']
+    return df, opcoes, particoes
+
+
+def escrever_formato(df, formato, path, layout=None, codec=None, opcoes_extras=None):
+    """
+    Escreve um formato no pool de scheduler próprio e mede o tempo.
+
+    `codec` sobrescreve o codec padrão do formato (WRITE_CODECS) e
+    `opcoes_extras` é repassado ao writer (ex.: nível do zstd).
+
+    Executado em thread do pool: a propriedade local `spark.scheduler.pool`
+    vale apenas para os jobs disparados por esta thread.
+    """
+    _, escritor = ESCRITORES[formato]
+    codec = codec or WRITE_CODECS[formato]
+    df.sparkSession.sparkContext.setLocalProperty("spark.scheduler.pool", f"escrita_{formato.lower()}")
+    df, opcoes, particoes = aplicar_layout(df, layout)
+    opcoes.update(opcoes_bloom_filter(formato, (layout or {}).get('bloom_filter')))
+    opcoes['compression'] = codec
+    opcoes.update(opcoes_extras or {})
+    inicio = time.perf_counter()
+    if escritor is None:
+        if particoes:
+            raise ValueError(f"{formato} não suporta particionamento Hive-style")
+        escrever_arrow(df, path, codec, opcoes.get('maxRecordsPerFile', 0))
+    else:
+        writer = df.write.mode("overwrite").options(**opcoes)
+        if particoes:
+            writer = writer.partitionBy(*particoes)
+        escritor(writer, path)
+    fim = time.perf_counter()
+    size = get_directory_size(path)
+    print(f"✓ {formato} ({codec}) salvo: {size / (1024**2):.2f} MB em {fim - inicio:.2f}s")
+    return {'time': fim - inicio, 'size': size, 'path': path, 'inicio': inicio, 'fim': fim,
+            'codec': codec, 'particoes': particoes}
+
+
+def materializar(df, storage_level):
+    """Persiste o DataFrame e força a materialização. Retorna (df, segundos)."""
+    start = time.perf_counter()
+    df = df.persist(getattr(StorageLevel, storage_level))
+    df.count()
+    return df, time.perf_counter() - start
+
+
+def salvar_em_formatos(df, base_path, storage_level=WRITE_STORAGE_LEVEL, paralelo=WRITE_PARALLEL,
+                       layout=WRITE_LAYOUT, formatos=None, forcar=False):
     """
-    Salva o dataset em CSV, JSON, Parquet e ORC.
+    Salva o dataset em CSV, JSON, Parquet, ORC e Arrow IPC (Feather v2).
+    
+    Nenhum formato usa coalesce(1): todos são escritos com o mesmo `layout`
+    de arquivos (ver `aplicar_layout`), de modo que a comparação de escrita
+    não fica presa a uma única task para CSV/JSON.
+    
+    A origem é materializada uma única vez (persist no `storage_level`
+    informado) e as escritas são submetidas concorrentemente por um pool de
+    threads, cada uma em seu pool do FAIR scheduler, dividindo os cores de
+    forma equilibrada. Com `paralelo=False` as escritas são sequenciais.
+    Com `storage_level=None` a origem não é persistida: cada escrita a lê
+    em streaming (para origens em disco maiores que a memória).
+    `formatos` restringe a escrita a um subconjunto de ESCRITORES. Com
+    particionamento, formatos sem suporte (Arrow) ficam de fora.
+    
+    Cada diretório recebe um manifesto (ver `manifesto.py`). Diretórios cujo
+    manifesto corresponde à origem, ao schema, ao codec, ao layout e à
+    versão do Spark atuais, com os mesmos arquivos em disco, são
+    reaproveitados sem reescrita; só os obsoletos são escritos (e a origem
+    só é materializada se houver algo a escrever). `forcar=True` reescreve
+    todos.
     """
     print("=" * 80)
     print("ETAPA 2: PERSISTÊNCIA EM MÚLTIPLOS FORMATOS")
     print("=" * 80)
     
-    resultados = {}
+    escritores = {f: e for f, e in ESCRITORES.items() if not formatos or f in formatos}
+    if (layout or {}).get('particoes_por'):
+        ignorados = [f for f in escritores if f in FORMATOS_SEM_PARTICIONAMENTO]
+        escritores = {f: e for f, e in escritores.items() if f not in FORMATOS_SEM_PARTICIONAMENTO}
+        if ignorados:
+            print(f"Sem particionamento Hive-style, ignorados: {', '.join(ignorados)}")
+    
+    # Reaproveitar artefatos cujo manifesto ainda corresponde à origem e às opções
+    origem = hash_origem(df)
+    descricoes = {
+        formato: descrever_escrita(df, origem, formato, WRITE_CODECS[formato], layout)
+        for formato in escritores
+    }
+    resultados, pendentes = {}, {}
+    for formato, (subdir, _) in escritores.items():
+        path = f"{base_path}/{subdir}"
+        manifesto = None if forcar else artefato_valido(path, descricoes[formato])
+        if manifesto is None:
+            pendentes[formato] = path
+            continue
+        resultados[formato] = {
+            'time': manifesto['escrita']['tempo_s'],
+            'size': get_directory_size(path),
+            'path': path,
+            'inicio': None,
+            'fim': None,
+            'codec': WRITE_CODECS[formato],
+            'particoes': manifesto['escrita']['particoes'],
+            'reutilizado': True,
+        }
+        print(f"✓ {formato}: artefato atualizado em {path}, reaproveitado")
+    if not pendentes:
+        print("Nenhum formato a reescrever")
+        print()
+        return resultados
     
-    # 1. CSV (se não for o dataset original)
-    print("Salvando em CSV...")
-    start = time.time()
-    csv_path = f"{base_path}/csv"
-    df.coalesce(1).write.mode("overwrite").option("header", "true").csv(csv_path)
-    csv_time = time.time() - start
-    csv_size = get_directory_size(csv_path)
-    resultados['CSV'] = {'time': csv_time, 'size': csv_size, 'path': csv_path}
-    print(f"✓ CSV salvo: {csv_size / (1024**2):.2f} MB em {csv_time:.2f}s")
-    
-    # 2. JSON
-    print("Salvando em JSON...")
-    start = time.time()
-    json_path = f"{base_path}/json"
-    df.coalesce(1).write.mode("overwrite").json(json_path)
-    json_time = time.time() - start
-    json_size = get_directory_size(json_path)
-    resultados['JSON'] = {'time': json_time, 'size': json_size, 'path': json_path}
-    print(f"✓ JSON salvo: {json_size / (1024**2):.2f} MB em {json_time:.2f}s")
-    
-    # 3. Parquet (Snappy)
-    print("Salvando em Parquet (Snappy)...")
-    start = time.time()
-    parquet_path = f"{base_path}/parquet"
-    df.write.mode("overwrite").option("compression", "snappy").parquet(parquet_path)
-    parquet_time = time.time() - start
-    parquet_size = get_directory_size(parquet_path)
-    resultados['Parquet'] = {'time': parquet_time, 'size': parquet_size, 'path': parquet_path}
-    print(f"✓ Parquet salvo: {parquet_size / (1024**2):.2f} MB em {parquet_time:.2f}s")
-    
-    # 4. ORC (Snappy)
-    print("Salvando em ORC (Snappy)...")
-    start = time.time()
-    orc_path = f"{base_path}/orc"
-    df.write.mode("overwrite").option("compression", "snappy").orc(orc_path)
-    orc_time = time.time() - start
-    orc_size = get_directory_size(orc_path)
-    resultados['ORC'] = {'time': orc_time, 'size': orc_size, 'path': orc_path}
-    print(f"✓ ORC salvo: {orc_size / (1024**2):.2f} MB em {orc_time:.2f}s")
+    def escrever_com_manifesto(formato, path):
+        info = escrever_formato(df, formato, path, layout)
+        gravar_manifesto(path, descricoes[formato], {'tempo_s': info['time'], 'particoes': info['particoes']})
+        return info
+    
+    # Materializar a origem uma única vez
+    if storage_level:
+        print(f"Materializando origem ({storage_level})...")
+        df, materializacao = materializar(df, storage_level)
+        print(f"✓ Origem materializada em {materializacao:.2f}s")
+    else:
+        print("Origem sem persist: cada formato lê a origem em streaming")
+    
+    modo = f"concorrente ({len(pendentes)} threads)" if paralelo else "sequencial"
+    print(f"Salvando formatos em modo {modo}...")
+    
+    try:
+        if paralelo:
+            with ThreadPoolExecutor(max_workers=len(pendentes)) as pool:
+                futuros = {
+                    formato: pool.submit(escrever_com_manifesto, formato, path)
+                    for formato, path in pendentes.items()
+                }
+                for formato, futuro in futuros.items():
+                    resultados[formato] = futuro.result()
+        else:
+            for formato, path in pendentes.items():
+                resultados[formato] = escrever_com_manifesto(formato, path)
+    finally:
+        df.unpersist()
+    resultados = {formato: resultados[formato] for formato in escritores}
+    
+    escrita = resumir_escrita(resultados)
+    print(f"✓ Tempo de parede das escritas: {escrita['tempo_parede_s']:.2f}s "
+          f"(soma sequencial: {escrita['soma_sequencial_s']:.2f}s, "
+          f"economia: {escrita['economia_s']:.2f}s)")
     
     print()
     return resultados
@@ -304,77 +884,397 @@ def get_directory_size(path):
     return total
 
 
+def listar_arquivos_dados(path):
+    """
+    Lista os arquivos de dados de um diretório de saída do Spark (fora de
+    subdiretórios ocultos, como `_lixo_*` e `_temporary`, que o Spark ignora).
+    """
+    return [
+        entry for entry in Path(path).rglob('*')
+        if entry.is_file()
+        and not any(parte.startswith(('_', '.')) for parte in entry.relative_to(path).parts)
+    ]
+
+
+def resumir_escrita(formatos_info):
+    """
+    Tempos de escrita por formato e economia do modo concorrente. Artefatos
+    reaproveitados mantêm o tempo registrado no manifesto, mas ficam fora
+    da soma e do tempo de parede desta execução.
+    """
+    escritos = [info for info in formatos_info.values() if not info.get('reutilizado')]
+    soma = sum(info['time'] for info in escritos)
+    parede = (max(info['fim'] for info in escritos) - min(info['inicio'] for info in escritos)
+              if escritos else 0.0)
+    return {
+        'por_formato': {f: info['time'] for f, info in formatos_info.items()},
+        'reutilizados': [f for f, info in formatos_info.items() if info.get('reutilizado')],
+        'soma_sequencial_s': soma,
+        'tempo_parede_s': parede,
+        'economia_s': soma - parede,
+    }
+
+
 # ============================================================================
 # ETAPA 3: ANÁLISE DE PERFORMANCE
 # ============================================================================
 
-def analisar_performance(spark, formatos_info):
+def ler_formato(spark, formato, path, schema=SCHEMA_SENSORES_IOT):
+    """
+    Cria o DataFrame de leitura (lazy) para o formato informado. `schema`
+    vale para os formatos texto (os demais trazem o schema nos arquivos).
+    """
+    if formato == 'CSV':
+        return spark.read.schema(schema).option("header", "true") \
+            .option("timestampFormat", TIMESTAMP_FORMAT).csv(path)
+    elif formato == 'JSON':
+        return spark.read.schema(schema).json(path)
+    elif formato == 'Parquet':
+        return spark.read.parquet(path)
+    elif formato == 'Arrow':
+        return ler_arrow(spark, path)
+    else:  # ORC
+        return spark.read.orc(path)
+
+
+def ler_formato_compacto(spark, formato, path, fisico=False):
+    """
+    Leitura de um diretório gravado no esquema compacto: por padrão
+    expandida para o esquema original; com `fisico`, as colunas como estão
+    nos arquivos (códigos e tipos estreitados).
+    """
+    esquema = ler_esquema(path)
+    if esquema is None:
+        raise FileNotFoundError(f"{path} não tem esquema compacto")
+    df = ler_formato(spark, formato, path, esquema['ddl_fisico'])
+    return df if fisico else expandir(df, esquema)
+
+
+# Queries do benchmark: nome -> (descrição, função DataFrame -> DataFrame)
+QUERIES = {
+    'leitura': ("Leitura completa", lambda df: df.groupBy().count()),
+    'filtro': ("Query com filtro", lambda df: df.filter(col("value") > 500).groupBy().count()),
+    'selecao': ("Seleção de colunas", lambda df: df.select("sensor_id", "value", "timestamp").groupBy().count()),
+    'agregacao': ("Agregação", lambda df: df.groupBy("city").count()),
+}
+
+
+# Queries sobre chaves de partição (poda de partições):
+# as chaves derivadas são calculadas quando o layout não é particionado por elas
+QUERIES_PARTICAO = {
+    'poda_cidade': ("Filtro em partição (city)",
+                    lambda df: df.filter(col("city") == "Curitiba").groupBy().count()),
+    'poda_tipo_cidade': ("Filtro em partições (sensor_type, city)",
+                         lambda df: df.filter((col("sensor_type") == "CO2") & (col("city") == "Brasília"))
+                         .agg(avg("value"))),
+    'poda_mes': ("Filtro em partição (mes)",
+                 lambda df: adicionar_chaves_derivadas(df, ['mes']).filter(col("mes") == 202406)
+                 .agg(avg("value"))),
+    'poda_dia': ("Filtro em partição (dia)",
+                 lambda df: adicionar_chaves_derivadas(df, ['dia'])
+                 .filter(col("dia") == lit("2024-06-15").cast("date")).groupBy().count()),
+}
+
+# Predicados de range/ponto para avaliar clusterização:
+# nome -> lista de (coluna, mínimo, máximo) combinados com AND
+PREDICADOS_CLUSTER = {
+    'ponto_sensor': [("sensor_id", "SENSOR_0042", "SENSOR_0042")],
+    'faixa_tempo': [("timestamp", datetime(2024, 6, 1), datetime(2024, 6, 7, 23, 59, 59))],
+    'sensor_na_janela': [("sensor_id", "SENSOR_0042", "SENSOR_0042"),
+                         ("timestamp", datetime(2024, 6, 1), datetime(2024, 6, 30, 23, 59, 59))],
+    'faixa_valor': [("value", 990.0, 1000.0)],
+}
+
+
+def filtrar_predicado(df, predicado):
+    """Aplica um predicado de PREDICADOS_CLUSTER ao DataFrame."""
+    for coluna, inferior, superior in predicado:
+        df = df.filter(col(coluna).between(inferior, superior))
+    return df
+
+
+QUERIES_CLUSTER = {
+    f"cluster_{nome}": (f"Predicado {nome}",
+                        lambda df, p=predicado: filtrar_predicado(df, p).groupBy().count())
+    for nome, predicado in PREDICADOS_CLUSTER.items()
+}
+
+
+def varredura_completa(df):
+    """
+    Query que decodifica todas as colunas (hash de todas as colunas somado).
+
+    Diferente de `count()`, que em Parquet/ORC pode ser respondido sem ler
+    as colunas, esta query mede o custo real de leitura e decodificação.
+    """
+    return df.select(expr("sum(xxhash64(*)) as h"))
+
+
+def sensores_lookup(presentes=LOOKUP_SENSORES_PRESENTES, ausentes=LOOKUP_SENSORES_AUSENTES,
+                    seed=LOOKUP_SEED):
+    """
+    Sorteia (com seed fixo) IDs de sensores existentes (SENSOR_0000 a
+    SENSOR_0999) e inexistentes (SENSOR_1000 a SENSOR_9999).
+    """
+    rng = random.Random(seed)
+    return {
+        'presentes': [f"SENSOR_{i:04d}" for i in rng.sample(range(1000), presentes)],
+        'ausentes': [f"SENSOR_{i:04d}" for i in rng.sample(range(1000, 10000), ausentes)],
+    }
+
+
+def consulta_pontual(df, sensor_id, janela=LOOKUP_JANELA):
+    """Todas as leituras de um sensor_id numa janela de tempo."""
+    return df.filter((col("sensor_id") == sensor_id)
+                     & col("timestamp").between(janela[0], janela[1]))
+
+
+def medir_lookups(spark, formato, path, warmup=BENCHMARK_WARMUP):
+    """
+    Família de consultas pontuais (sensor_id + janela de tempo) sobre vários
+    sensores sorteados. Cada sensor é uma rodada medida; latência e bytes
+    lidos (I/O do sistema de arquivos) são resumidos por grupo: sensores
+    presentes e ausentes do dataset. IDs ausentes são onde bloom filters
+    fazem diferença, pois caem dentro do intervalo min/max de todo bloco.
+    """
+    sensores = sensores_lookup()
+    
+    for sensor_id in sensores['presentes'][:warmup]:
+        medir_execucao(lambda: consulta_pontual(ler_formato(spark, formato, path), sensor_id))
+    
+    resultado = {}
+    for grupo, ids in sensores.items():
+        latencias, bytes_lidos = [], []
+        for sensor_id in ids:
+            antes = bytes_lidos_sistema_arquivos(spark)
+            plan_ns, exec_ns, _ = medir_execucao(
+                lambda: consulta_pontual(ler_formato(spark, formato, path), sensor_id))
+            bytes_lidos.append(bytes_lidos_sistema_arquivos(spark) - antes)
+            latencias.append((plan_ns + exec_ns) / 1e9)
+        resultado[grupo] = {
+            'sensores': ids,
+            'amostras': latencias,
+            'latencia': resumir(latencias),
+            'bytes_lidos_mediana': statistics.median(bytes_lidos),
+            'bytes_lidos': bytes_lidos,
+        }
+    return resultado
+
+
+def analisar_performance(spark, formatos_info, warmup=BENCHMARK_WARMUP, trials=BENCHMARK_TRIALS,
+                         queries=None, lookups=True, repeticoes=None, motores=None, leitura_lotes=False):
     """
     Analisa performance de leitura e queries para cada formato.
+
+    `queries` (nome -> (descrição, função)) substitui o conjunto padrão.
+    Por padrão roda QUERIES, mais QUERIES_PARTICAO quando os formatos foram
+    escritos particionados. Com `lookups=True` roda também a família de
+    consultas pontuais por sensor_id (ver `medir_lookups`).
+    `repeticoes` (nome -> (warmup, trials)) sobrepõe as rodadas por query,
+    como definido nos workloads declarativos.
+    `motores` lista motores de nó único (ver motores.py) que rodam as
+    queries padrão sobre os mesmos arquivos, ao lado do Spark, com o pico
+    de memória residente de cada um.
+    Com `leitura_lotes=True` mede também a leitura completa em lotes do
+    pyarrow num processo filho (tempo até o primeiro lote e memória
+    residente); desligada por padrão, pois lê o dataset inteiro a cada
+    formato (os modos de varredura não a usam).
+
+    Cada query é executada `warmup` vezes sem medição e `trials` vezes
+    medidas. O DataFrame é reconstruído em toda rodada, de modo que a
+    listagem de arquivos e a resolução de schema entram no tempo de
+    planejamento e não contaminam o tempo de execução. Da última rodada
+    ficam registrados o plano físico (filtros empurrados, schema lido) e as
+    métricas do Spark: stages, tasks, registros lidos, CPU, GC e shuffle.
     """
     print("=" * 80)
     print("ETAPA 3: ANÁLISE DE PERFORMANCE")
     print("=" * 80)
+    print(f"Warm-up: {warmup} | Rodadas medidas: {trials}")
+    
+    if queries is None:
+        queries = dict(QUERIES)
+        if any(info.get('particoes') for info in formatos_info.values()):
+            queries.update(QUERIES_PARTICAO)
     
     resultados = {}
     
     for formato, info in formatos_info.items():
         print(f"\nAnalisando {formato}...")
         path = info['path']
+        arquivos = listar_arquivos_dados(path)
         
-        # Leitura completa
-        start = time.time()
-        if formato == 'CSV':
-            df = spark.read.option("header", "true").csv(path)
-        elif formato == 'JSON':
-            df = spark.read.json(path)
-        elif formato == 'Parquet':
-            df = spark.read.parquet(path)
-        else:  # ORC
-            df = spark.read.orc(path)
-        
-        count = df.count()
-        read_time = time.time() - start
+        medidas = {}
+        reiniciar_pico_memoria(spark)
+        for nome, (descricao, query) in queries.items():
+            rodadas = (repeticoes or {}).get(nome, (warmup, trials))
+            medidas[nome] = executar_benchmark(
+                lambda: query(ler_formato(spark, formato, path)),
+                *rodadas
+            )
+            medidas[nome]['descricao'] = descricao
+            total = medidas[nome]['total']
+            scan = medidas[nome]['scan']
+            print(f"  {descricao}: mediana {total['mediana']:.3f}s "
+                  f"(p95 {total['p95']:.3f}s, σ {total['desvio_padrao']:.3f}s, "
+                  f"IC95 [{total['ic95_inferior']:.3f}, {total['ic95_superior']:.3f}]) | "
+                  f"planejamento {medidas[nome]['planejamento']['mediana']:.3f}s, "
+                  f"execução {medidas[nome]['execucao']['mediana']:.3f}s | "
+                  f"arquivos lidos {scan['arquivos_lidos']}/{len(arquivos)}")
         
-        # Query com filtro
-        start = time.time()
-        filtered = df.filter(col("value") > 500).count()
-        filter_time = time.time() - start
+        resultados[formato] = {
+            'size_mb': info['size'] / (1024**2),
+            'arquivos_total': len(arquivos),
+            'bytes_total': sum(a.stat().st_size for a in arquivos),
+            'particoes': info.get('particoes', []),
+            'queries': medidas,
+            'memoria_pico_bytes': pico_memoria(spark),
+        }
         
-        # Query com seleção de colunas
-        start = time.time()
-        selected = df.select("sensor_id", "value", "timestamp").count()
-        select_time = time.time() - start
+        # Tempo até o primeiro lote e memória residente da leitura em lotes (pyarrow)
+        if leitura_lotes:
+            lotes = medir_leitura_lotes(formato, path)
+            resultados[formato]['leitura_lotes'] = lotes
+            if 'erro' not in lotes:
+                print(f"  Leitura em lotes: primeiro lote {lotes['primeiro_lote_s'] * 1000:.1f} ms, "
+                      f"total {lotes['leitura_total_s']:.3f}s | pico RSS anônima "
+                      f"{(lotes['rss_anonima_bytes'] or 0) / 1024**2:.0f} MB, mapeada "
+                      f"{(lotes['rss_arquivo_bytes'] or 0) / 1024**2:.0f} MB")
         
-        # Query com agregação
-        start = time.time()
-        agg = df.groupBy("city").count().collect()
-        agg_time = time.time() - start
+        # Anatomia do armazenamento pelos rodapés (sem varrer os dados)
+        if formato in ('Parquet', 'ORC'):
+            anatomia = anatomia_armazenamento(spark, formato, path)
+            resultados[formato]['armazenamento'] = anatomia
+            print(f"  Armazenamento: {anatomia['blocos']['quantidade']} blocos em {anatomia['arquivos']} arquivos "
+                  f"(mediana {anatomia['blocos']['bytes_mediana'] / 1024**2:.1f} MB) | metadados "
+                  f"{anatomia['metadados']['bytes'] / 1024:.1f} KB "
+                  f"({(anatomia['metadados']['fracao'] or 0) * 100:.2f}% dos arquivos)")
         
-        resultados[formato] = {
-            'read_time': read_time,
-            'filter_time': filter_time,
-            'select_time': select_time,
-            'agg_time': agg_time,
-            'size_mb': info['size'] / (1024**2)
-        }
+        if motores:
+            resultados[formato]['motores'] = comparar_motores(
+                formato, path, resultados[formato], motores, warmup, trials)
         
-        print(f"  Leitura completa: {read_time:.2f}s")
-        print(f"  Query com filtro: {filter_time:.2f}s")
-        print(f"  Seleção de colunas: {select_time:.2f}s")
-        print(f"  Agregação: {agg_time:.2f}s")
+        if lookups:
+            resultados[formato]['lookups'] = medir_lookups(spark, formato, path, warmup)
+            for grupo, r in resultados[formato]['lookups'].items():
+                print(f"  Consulta pontual ({grupo}): mediana {r['latencia']['mediana']:.3f}s "
+                      f"(p95 {r['latencia']['p95']:.3f}s) | "
+                      f"bytes lidos {r['bytes_lidos_mediana'] / 1024**2:.2f} MB")
+        # Atalhos (medianas) para as queries padrão
+        for chave, nome in [('read_time', 'leitura'), ('filter_time', 'filtro'),
+                            ('select_time', 'selecao'), ('agg_time', 'agregacao')]:
+            if nome in medidas:
+                resultados[formato][chave] = medidas[nome]['total']['mediana']
     
     print()
     return resultados
 
 
+def comparar_motores(formato, path, resultado_spark, motores, warmup=BENCHMARK_WARMUP,
+                     trials=BENCHMARK_TRIALS):
+    """
+    Roda as queries padrão de QUERIES medidas no Spark em cada motor de nó
+    único, sobre os mesmos arquivos. Retorna motor -> {queries, pico de
+    memória}, com o Spark como primeira entrada; motores sem suporte ao
+    formato ou não instalados ficam com 'erro'.
+    """
+    nomes = [n for n in QUERIES if n in resultado_spark['queries']]
+    comparacao = {'spark': {
+        'queries': {n: {'total': resultado_spark['queries'][n]['total'],
+                        'amostras': resultado_spark['queries'][n]['amostras']} for n in nomes},
+        'memoria_pico_bytes': resultado_spark['memoria_pico_bytes'],
+    }}
+    for motor in motores:
+        medida = medir_motor(motor, formato, path, nomes, warmup, trials)
+        if 'erro' in medida:
+            print(f"  [{motor}] ignorado: {medida['erro']}")
+            comparacao[motor] = medida
+            continue
+        comparacao[motor] = {
+            'queries': {n: {'total': resumir(a), 'amostras': a} for n, a in medida['amostras'].items()},
+            'memoria_pico_bytes': medida['memoria_pico_bytes'],
+            'memoria_base_bytes': medida['memoria_base_bytes'],
+        }
+        medianas = ", ".join(f"{n} {q['total']['mediana']:.3f}s"
+                             for n, q in comparacao[motor]['queries'].items())
+        print(f"  [{motor}] {medianas} | pico de memória "
+              f"{medida['memoria_pico_bytes'] / 1024**2:.0f} MB")
+    return comparacao
+
+
 # ============================================================================
 # ETAPA 4: RELATÓRIO FINAL
 # ============================================================================
 
-def gerar_relatorio(resultados_performance):
+def fronteira_pareto(celulas):
+    """
+    Células não dominadas em (tamanho, tempo de varredura), ambos a minimizar.
+    """
+    fronteira = []
+    for c in celulas:
+        dominada = any(
+            o['size_mb'] <= c['size_mb'] and o['varredura_s'] <= c['varredura_s']
+            and (o['size_mb'] < c['size_mb'] or o['varredura_s'] < c['varredura_s'])
+            for o in celulas
+        )
+        if not dominada:
+            fronteira.append(c)
+    return sorted(fronteira, key=lambda c: c['size_mb'])
+
+
+def recomendar_codecs(matriz_codecs):
+    """
+    Recomendação de codec a partir da fronteira de Pareto "tamanho vs
+    velocidade de leitura": camada quente = varredura mais rápida da
+    fronteira; camada de arquivo = menor tamanho da fronteira.
+    """
+    celulas = [
+        dict(c, formato=formato)
+        for formato, lista in matriz_codecs.items()
+        for c in lista if 'erro' not in c
+    ]
+    if not celulas:
+        return None
+    
+    fronteira = fronteira_pareto(celulas)
+    quente = min(fronteira, key=lambda c: c['varredura_s'])
+    arquivo = min(fronteira, key=lambda c: c['size_mb'])
+    
+    print("RECOMENDAÇÃO DE CODEC (fronteira de Pareto tamanho x leitura):")
+    print("-" * 80)
+    print(f"{'Formato':<10} {'Codec':<10} {'Tamanho (MB)':<14} {'Varredura (MB/s)':<18} {'Filtro (s)':<12} {'Agregação (s)':<12}")
+    print("-" * 80)
+    for c in fronteira:
+        print(f"{c['formato']:<10} {c['codec']:<10} {c['size_mb']:<14.2f} {c['varredura_mb_s']:<18.1f} "
+              f"{c['filtro_s']:<12.3f} {c['agregacao_s']:<12.3f}")
+    print("-" * 80)
+    print(f"✓ Camada quente (hot): {quente['formato']} {quente['codec']} "
+          f"({quente['varredura_mb_s']:.1f} MB/s, {quente['size_mb']:.2f} MB)")
+    print(f"✓ Camada de arquivo (archive): {arquivo['formato']} {arquivo['codec']} "
+          f"({arquivo['size_mb']:.2f} MB, {arquivo['varredura_mb_s']:.1f} MB/s)")
+    print()
+    
+    return {
+        'fronteira': [{'formato': c['formato'], 'codec': c['codec']} for c in fronteira],
+        'quente': {'formato': quente['formato'], 'codec': quente['codec']},
+        'arquivo': {'formato': arquivo['formato'], 'codec': arquivo['codec']},
+    }
+
+
+def gerar_relatorio(resultados_performance, formatos_info=None, matriz_codecs=None, workload=None,
+                    sessao=None, ambiente=None):
     """
     Gera relatório comparativo em formato texto e JSON.
+    
+    Se `matriz_codecs` (resultado do modo "codecs") for informada, inclui a
+    recomendação de codec por fronteira de Pareto. `workload` (spec
+    carregada por `carregar_workload`) é registrado no JSON. `sessao`
+    (ver `medir_sessao`) descreve a partida desta execução, comparada ao
+    histórico de partidas a frio e sessões quentes.
+    
+    O JSON segue o esquema versionado de historico_resultados.py. Com
+    `ambiente` (ver `impressao_ambiente`), a execução também é incluída no
+    histórico em HISTORICO_PATH.
     """
     print("=" * 80)
     print("RELATÓRIO FINAL - COMPARATIVO DE FORMATOS")
@@ -388,31 +1288,212 @@ def gerar_relatorio(resultados_performance):
     print("-" * 80)
     
     csv_size = resultados_performance['CSV']['size_mb']
-    for formato in ['CSV', 'JSON', 'Parquet', 'ORC']:
+    for formato in resultados_performance:
         size = resultados_performance[formato]['size_mb']
         reducao = ((csv_size - size) / csv_size) * 100 if formato != 'CSV' else 0
         print(f"{formato:<15} {size:<15.2f} {reducao:>18.1f}%")
     
     print()
     
-    # Tabela comparativa de performance
-    print("PERFORMANCE DE LEITURA:")
+    # Anatomia do armazenamento (rodapés Parquet/ORC)
+    anatomias = {f: r['armazenamento'] for f, r in resultados_performance.items() if 'armazenamento' in r}
+    if anatomias:
+        print("ANATOMIA DO ARMAZENAMENTO (rodapés, sem varrer os dados):")
+        print("-" * 80)
+        print(f"{'Formato':<10} {'Arquivos':>8} {'Blocos':>7} {'MB/bloco':>9} {'Linhas/bloco':>13} "
+              f"{'Metadados KB':>13} {'% meta':>7}")
+        print("-" * 80)
+        for formato, a in anatomias.items():
+            print(f"{formato:<10} {a['arquivos']:>8} {a['blocos']['quantidade']:>7} "
+                  f"{a['blocos']['bytes_mediana'] / 1024**2:>9.2f} {a['blocos']['linhas_mediana']:>13,.0f} "
+                  f"{a['metadados']['bytes'] / 1024:>13.1f} {(a['metadados']['fracao'] or 0) * 100:>6.2f}%")
+        print()
+        print(f"{'Formato':<10} {'Coluna':<16} {'MB':>8} {'% dados':>8} {'Taxa':>6} {'Stats':>6}  Codificações")
+        print("-" * 80)
+        for formato, a in anatomias.items():
+            for nome, c in a['colunas'].items():
+                taxa = f"{c['taxa_compressao']:.1f}x" if c['taxa_compressao'] else "-"
+                print(f"{formato:<10} {nome[:16]:<16} {c['bytes_comprimidos'] / 1024**2:>8.2f} "
+                      f"{(c['fracao_dados'] or 0) * 100:>7.1f}% {taxa:>6} "
+                      f"{(c['cobertura_estatisticas'] or 0) * 100:>5.0f}%  {','.join(c['codificacoes'])}")
+        print("(taxa: descomprimido/comprimido; no ORC, sobre o tamanho bruto estimado pelo writer)")
+        print()
+    
+    # Tempos de escrita
+    escrita = None
+    if formatos_info:
+        escrita = resumir_escrita(formatos_info)
+        print("ESCRITA:")
+        print("-" * 80)
+        print(f"{'Formato':<15} {'Tempo (s)':<15}")
+        print("-" * 80)
+        for formato, tempo in escrita['por_formato'].items():
+            marca = " (reaproveitado)" if formato in escrita['reutilizados'] else ""
+            print(f"{formato:<15} {tempo:<15.2f}{marca}")
+        print("-" * 80)
+        print(f"{'Soma':<15} {escrita['soma_sequencial_s']:<15.2f}")
+        print(f"{'Parede':<15} {escrita['tempo_parede_s']:<15.2f} "
+              f"(economia de {escrita['economia_s']:.2f}s)")
+        print()
+    
+    # Tabela comparativa de performance (medianas)
+    print("PERFORMANCE DE LEITURA (mediana de N rodadas):")
     print("-" * 80)
-    print(f"{'Formato':<15} {'Leitura (s)':<15} {'Filtro (s)':<15} {'Agregação (s)':<15}")
+    print(f"{'Formato':<15} {'Leitura (s)':<15} {'Filtro (s)':<15} {'Agregação (s)':<15} {'p95 Leitura (s)':<15}")
     print("-" * 80)
     
-    for formato in ['CSV', 'JSON', 'Parquet', 'ORC']:
+    for formato in resultados_performance:
         r = resultados_performance[formato]
-        print(f"{formato:<15} {r['read_time']:<15.2f} {r['filter_time']:<15.2f} {r['agg_time']:<15.2f}")
+        p95 = r['queries']['leitura']['total']['p95']
+        print(f"{formato:<15} {r['read_time']:<15.3f} {r['filter_time']:<15.3f} {r['agg_time']:<15.3f} {p95:<15.3f}")
+    
+    print()
+    
+    # Planejamento vs execução
+    print("PLANEJAMENTO vs EXECUÇÃO (mediana, leitura completa):")
+    print("-" * 80)
+    print(f"{'Formato':<15} {'Planejamento (s)':<20} {'Execução (s)':<20}")
+    print("-" * 80)
+    
+    for formato in resultados_performance:
+        leitura = resultados_performance[formato]['queries']['leitura']
+        print(f"{formato:<15} {leitura['planejamento']['mediana']:<20.3f} {leitura['execucao']['mediana']:<20.3f}")
     
     print()
     
+    # Leitura em lotes: tempo até o primeiro lote e memória residente
+    if any('primeiro_lote_s' in r.get('leitura_lotes', {}) for r in resultados_performance.values()):
+        print("LEITURA EM LOTES (pyarrow; Arrow IPC por memory mapping):")
+        print("-" * 80)
+        print(f"{'Formato':<10} {'1º lote (ms)':>13} {'Total (s)':>10} {'Lotes':>7} "
+              f"{'Pico anôn. MB':>15} {'Pico mapea. MB':>15}")
+        print("-" * 80)
+        for formato, r in resultados_performance.items():
+            lotes = r.get('leitura_lotes', {})
+            if 'primeiro_lote_s' not in lotes:
+                continue
+            print(f"{formato:<10} {lotes['primeiro_lote_s'] * 1000:>13.1f} {lotes['leitura_total_s']:>10.3f} "
+                  f"{lotes['lotes']:>7} {(lotes['rss_anonima_bytes'] or 0) / 1024**2:>15.1f} "
+                  f"{(lotes['rss_arquivo_bytes'] or 0) / 1024**2:>15.1f}")
+        print()
+    
+    # Queries medidas (padrão + partição + workload, se houver)
+    queries_medidas = next(iter(resultados_performance.values()))['queries']
+    nomes_queries = list(queries_medidas)
+    
+    # Arquivos e bytes efetivamente lidos nas queries sobre partições
+    nomes_poda = [n for n in nomes_queries if n in QUERIES_PARTICAO]
+    if nomes_poda:
+        print("ARQUIVOS E BYTES LIDOS (queries sobre chaves de partição):")
+        print("-" * 80)
+        print(f"{'Formato':<10} {'Query':<20} {'Arquivos lidos':<18} {'MB lidos':<20} {'Mediana (s)':<12}")
+        print("-" * 80)
+        for formato, r in resultados_performance.items():
+            for nome in nomes_poda:
+                q = r['queries'][nome]
+                print(f"{formato:<10} {nome:<20} "
+                      f"{q['scan']['arquivos_lidos']:>6}/{r['arquivos_total']:<11} "
+                      f"{q['scan']['bytes_lidos'] / 1024**2:>8.2f}/{r['bytes_total'] / 1024**2:<11.2f} "
+                      f"{q['total']['mediana']:<12.3f}")
+        print()
+    
+    # Consultas pontuais
+    if all('lookups' in r for r in resultados_performance.values()):
+        print("CONSULTAS PONTUAIS (sensor_id + janela de tempo, mediana por sensor):")
+        print("-" * 80)
+        print(f"{'Formato':<10} {'Grupo':<12} {'Mediana (s)':<14} {'p95 (s)':<12} {'MB lidos':<12}")
+        print("-" * 80)
+        for formato, r in resultados_performance.items():
+            for grupo, lk in r['lookups'].items():
+                print(f"{formato:<10} {grupo:<12} {lk['latencia']['mediana']:<14.3f} "
+                      f"{lk['latencia']['p95']:<12.3f} {lk['bytes_lidos_mediana'] / 1024**2:<12.2f}")
+        print()
+    
+    # Métricas do Spark (última rodada medida de cada query)
+    if all(q.get('spark') for r in resultados_performance.values() for q in r['queries'].values()):
+        print("MÉTRICAS DO SPARK (última rodada; plano físico completo no JSON):")
+        print("-" * 80)
+        print(f"{'Formato':<10} {'Query':<24} {'Stages':>6} {'Tasks':>6} {'Registros':>11} "
+              f"{'CPU %':>6} {'GC (s)':>7} {'Shuffle MB':>10}")
+        print("-" * 80)
+        for formato, r in resultados_performance.items():
+            for nome, q in r['queries'].items():
+                m = q['spark']
+                fracao_cpu = f"{m['fracao_cpu'] * 100:.0f}" if m['fracao_cpu'] is not None else "-"
+                shuffle = (m['shuffle_leitura_bytes'] + m['shuffle_escrita_bytes']) / 1024**2
+                print(f"{formato:<10} {nome[:24]:<24} {m['stages']:>6} {m['tasks']:>6} "
+                      f"{m['registros_lidos']:>11,} {fracao_cpu:>6} {m['tempo_gc_s']:>7.2f} {shuffle:>10.2f}")
+        print()
+    
+    # Motores de nó único x Spark (queries padrão)
+    if all('motores' in r for r in resultados_performance.values()):
+        nomes_padrao = [n for n in QUERIES if n in queries_medidas]
+        print("MOTORES DE CONSULTA (mediana em s; pico de memória residente):")
+        print("-" * 80)
+        print(f"{'Formato':<10} {'Motor':<9} " + " ".join(f"{n[:9]:>9}" for n in nomes_padrao)
+              + f" {'Pico MB':>9}")
+        print("-" * 80)
+        for formato, r in resultados_performance.items():
+            for motor, m in r['motores'].items():
+                if 'erro' in m:
+                    continue
+                tempos = [m['queries'][n]['total']['mediana'] if n in m['queries'] else None
+                          for n in nomes_padrao]
+                pico = m['memoria_pico_bytes']
+                print(f"{formato:<10} {motor:<9} "
+                      + " ".join(f"{t:>9.3f}" if t is not None else f"{'-':>9}" for t in tempos)
+                      + (f" {pico / 1024**2:>9.0f}" if pico else f" {'-':>9}"))
+        print()
+    
+    # Partida a frio x sessão quente
+    latencias = resumir_latencias_sessao(sessao) if sessao else None
+    if latencias:
+        print("PARTIDA A FRIO x SESSÃO QUENTE (mediana do histórico em output/sessao.json):")
+        print("-" * 80)
+        print(f"{'Sessão':<18} {'Execuções':>10} {'Partida (s)':>12} {'Sonda (s)':>10} {'Até 1ª medição (s)':>19}")
+        print("-" * 80)
+        linhas = [(f"esta ({sessao['sessao']})", 1, sessao)]
+        linhas += [(tipo, r['execucoes'], r) for tipo, r in latencias['historico'].items()]
+        for rotulo, execucoes, r in linhas:
+            print(f"{rotulo:<18} {execucoes:>10} {r['partida_s']:>12.2f} {r['sonda_s']:>10.3f} "
+                  f"{r['primeira_medicao_s']:>19.2f}")
+        print("(partida: processo até SparkSession pronta; sonda: primeira query após a partida)")
+        print()
+    
+    # Ranking por mediana com teste de significância
+    rankings = {}
+    for nome in nomes_queries:
+        rankings[nome] = ranquear({
+            formato: r['queries'][nome]['amostras']
+            for formato, r in resultados_performance.items()
+        })
+    
+    # Recomendação de codec
+    codecs = recomendar_codecs(matriz_codecs) if matriz_codecs else None
+    
     # Salvar relatório JSON
+    relatorio = {
+        'versao_esquema': VERSAO_ESQUEMA_RELATORIO,
+        'metadata': {
+            'data_execucao': datetime.now().isoformat(timespec='seconds'),
+            'total_registros': (ambiente or {}).get('dataset', {}).get('linhas'),
+            'execucao_id': None,
+            'ambiente_hash': hash_ambiente(ambiente) if ambiente else None,
+        },
+        'resumo': resumo_relatorio(resultados_performance),
+        'formatos': resultados_performance, 'rankings': rankings, 'escrita': escrita,
+        'codecs': codecs, 'sessao': latencias,
+        'workload': {k: workload.get(k) for k in ('nome', 'descricao', 'arquivo')} if workload else None,
+    }
+    if ambiente:
+        relatorio['metadata']['execucao_id'] = registrar_execucao(HISTORICO_PATH, relatorio, ambiente)
+        print(f"✓ Execução #{relatorio['metadata']['execucao_id']} registrada no histórico: {HISTORICO_PATH}")
+    
     report_path = OUTPUT_DIR / "relatorio_comparativo.json"
     with open(report_path, 'w', encoding='utf-8') as f:
-        json.dump(resultados_performance, f, indent=2, ensure_ascii=False)
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
     
-    print(f"✓ Relatório JSON salvo em: {report_path}")
+    print(f"✓ Relatório JSON salvo em: {report_path} (esquema v{VERSAO_ESQUEMA_RELATORIO})")
     print()
     
     # Conclusões
@@ -424,15 +1505,22 @@ def gerar_relatorio(resultados_performance):
                          key=lambda x: x[1]['size_mb'])
     print(f"✓ Menor tamanho: {melhor_tamanho[0]} ({melhor_tamanho[1]['size_mb']:.2f} MB)")
     
-    # Melhor formato por performance de leitura
-    melhor_leitura = min(resultados_performance.items(),
-                         key=lambda x: x[1]['read_time'])
-    print(f"✓ Leitura mais rápida: {melhor_leitura[0]} ({melhor_leitura[1]['read_time']:.2f}s)")
-    
-    # Melhor formato por performance de query
-    melhor_query = min(resultados_performance.items(),
-                       key=lambda x: x[1]['filter_time'])
-    print(f"✓ Query mais rápida: {melhor_query[0]} ({melhor_query[1]['filter_time']:.2f}s)")
+    # Ranking de performance por query
+    for nome in nomes_queries:
+        descricao = queries_medidas[nome]['descricao']
+        ranking = rankings[nome]
+        ordem = " < ".join(r['item'] for r in ranking)
+        primeiro = ranking[0]
+        if primeiro['significativo']:
+            veredito = f"vence {ranking[1]['item']} (p={primeiro['p_valor_vs_proximo']:.3f})"
+        elif primeiro['amostras_insuficientes']:
+            veredito = (f"sem conclusão contra {ranking[1]['item']}: amostras insuficientes "
+                        f"para p < {NIVEL_SIGNIFICANCIA} (aumente as medidas)")
+        else:
+            veredito = (f"empate estatístico com {ranking[1]['item']} "
+                        f"(p={primeiro['p_valor_vs_proximo']:.3f})")
+        print(f"✓ {descricao}: {primeiro['item']} ({primeiro['mediana']:.3f}s) {veredito}")
+        print(f"    Ordem por mediana: {ordem}")
     
     print()
     print("RECOMENDAÇÃO:")
@@ -447,47 +1535,1661 @@ def gerar_relatorio(resultados_performance):
 
 
 # ============================================================================
-# FUNÇÃO PRINCIPAL
+# MODOS DE EXPERIMENTO
 # ============================================================================
 
-def main():
+def varrer_layouts(spark, df, arquivos=LAYOUT_SWEEP_ARQUIVOS, max_registros=LAYOUT_SWEEP_MAX_REGISTROS,
+                   warmup=BENCHMARK_WARMUP, trials=BENCHMARK_TRIALS):
     """
-    Executa o pipeline completo de análise de formatos.
+    Varre layouts de arquivo (repartition N x maxRecordsPerFile) para todos
+    os formatos, medindo vazão de escrita, vazão de leitura e overhead por
+    arquivo.
     """
-    inicio_total = time.time()
+    print("=" * 80)
+    print("VARREDURA DE LAYOUT DE ARQUIVOS")
+    print("=" * 80)
+    
+    df, _ = materializar(df, WRITE_STORAGE_LEVEL)
+    linhas = df.count()
+    resultados = {}
     
     try:
-        # 1. Criar Spark Session
-        spark = criar_spark_session()
-        
-        # 2. Carregar ou gerar dataset
-        df = carregar_ou_gerar_dataset(spark)
-        
-        # 3. Salvar em múltiplos formatos
-        formatos_info = salvar_em_formatos(df, str(DATA_DIR))
-        
-        # 4. Analisar performance
-        resultados = analisar_performance(spark, formatos_info)
-        
-        # 5. Gerar relatório
-        gerar_relatorio(resultados)
-        
-        # Finalizar
-        tempo_total = time.time() - inicio_total
-        print("=" * 80)
-        print(f"EXECUÇÃO CONCLUÍDA COM SUCESSO!")
-        print(f"Tempo total: {tempo_total:.2f}s ({tempo_total/60:.1f} minutos)")
-        print("=" * 80)
-        
-        spark.stop()
-        
-        return 0
-        
-    except Exception as e:
-        print(f"\n❌ ERRO: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return 1
+        for formato, (subdir, _) in ESCRITORES.items():
+            resultados[formato] = []
+            for n in arquivos:
+                for max_reg in max_registros:
+                    layout = {'arquivos': n, 'max_registros': max_reg}
+                    path = str(LAYOUT_SWEEP_DIR / f"{subdir}_a{n}_r{max_reg}")
+                    print(f"\n{formato} | arquivos={n} | maxRecordsPerFile={max_reg or 'sem limite'}")
+                    
+                    escrita = escrever_formato(df, formato, path, layout)
+                    num_arquivos = len(listar_arquivos_dados(path))
+                    leitura = executar_benchmark(
+                        lambda: varredura_completa(ler_formato(spark, formato, path)),
+                        warmup, trials
+                    )
+                    leitura_s = leitura['total']['mediana']
+                    size_mb = escrita['size'] / (1024**2)
+                    
+                    resultados[formato].append({
+                        'layout': layout,
+                        'num_arquivos': num_arquivos,
+                        'size_mb': size_mb,
+                        'tamanho_medio_arquivo_mb': size_mb / num_arquivos,
+                        'escrita_s': escrita['time'],
+                        'escrita_mb_s': size_mb / escrita['time'],
+                        'escrita_linhas_s': linhas / escrita['time'],
+                        'leitura_s': leitura_s,
+                        'leitura_mb_s': size_mb / leitura_s,
+                        'leitura_linhas_s': linhas / leitura_s,
+                        'planejamento_por_arquivo_ms':
+                            leitura['planejamento']['mediana'] / num_arquivos * 1000,
+                        'leitura': leitura,
+                    })
+                    print(f"  {num_arquivos} arquivos | escrita {size_mb / escrita['time']:.1f} MB/s | "
+                          f"leitura {size_mb / leitura_s:.1f} MB/s")
+                    shutil.rmtree(path, ignore_errors=True)
+            
+            # Overhead de bytes por arquivo adicional, relativo ao layout com menos arquivos
+            base = min(resultados[formato], key=lambda r: r['num_arquivos'])
+            for r in resultados[formato]:
+                extras = r['num_arquivos'] - base['num_arquivos']
+                r['overhead_bytes_por_arquivo'] = (
+                    (r['size_mb'] - base['size_mb']) * 1024**2 / extras if extras else 0.0
+                )
+    finally:
+        df.unpersist()
+    
+    print()
+    print("RESUMO POR FORMATO (melhor layout = menor escrita + leitura):")
+    print("-" * 80)
+    print(f"{'Formato':<10} {'Arquivos':<10} {'MaxReg':<10} {'Escrita MB/s':<14} {'Leitura MB/s':<14} {'Overhead/arq (KB)':<18}")
+    print("-" * 80)
+    recomendacoes = {}
+    for formato, medidas in resultados.items():
+        melhor = min(medidas, key=lambda r: r['escrita_s'] + r['leitura_s'])
+        recomendacoes[formato] = melhor['layout']
+        print(f"{formato:<10} {melhor['num_arquivos']:<10} {melhor['layout']['max_registros'] or '-':<10} "
+              f"{melhor['escrita_mb_s']:<14.1f} {melhor['leitura_mb_s']:<14.1f} "
+              f"{melhor['overhead_bytes_por_arquivo'] / 1024:<18.1f}")
+    print()
+    
+    sweep_path = OUTPUT_DIR / "layout_sweep.json"
+    with open(sweep_path, 'w', encoding='utf-8') as f:
+        json.dump({'linhas': linhas, 'resultados': resultados, 'recomendacoes': recomendacoes},
+                  f, indent=2, ensure_ascii=False)
+    print(f"✓ Varredura salva em: {sweep_path}")
+    print()
+    return resultados
+
+
+def medir_matriz_codecs(spark, df, matriz=CODEC_MATRIX, warmup=BENCHMARK_WARMUP, trials=BENCHMARK_TRIALS):
+    """
+    Mede cada célula (formato x codec) da matriz de codecs.
+
+    Por célula: tamanho comprimido, vazão de escrita, vazão de varredura
+    completa e latências de filtro/agregação (mesmas queries de
+    `analisar_performance`). As vazões são calculadas sobre o volume lógico
+    (tamanho do mesmo formato sem compressão), para que codecs sejam
+    comparados pelo volume de dados que processam e não pelo que gravam.
+    Codecs não suportados pelo ambiente são registrados com 'erro'.
+    """
+    print("=" * 80)
+    print("MATRIZ DE CODECS DE COMPRESSÃO")
+    print("=" * 80)
+    
+    df, _ = materializar(df, WRITE_STORAGE_LEVEL)
+    resultados = {}
+    
+    try:
+        for formato, celulas in matriz.items():
+            subdir, _ = ESCRITORES[formato]
+            resultados[formato] = []
+            volume_logico_mb = None
+            
+            for rotulo, codec, opcoes in celulas:
+                path = str(CODEC_MATRIX_DIR / f"{subdir}_{rotulo}")
+                print(f"\n{formato} | {rotulo}")
+                try:
+                    escrita = escrever_formato(df, formato, path, codec=codec, opcoes_extras=opcoes)
+                    size_mb = escrita['size'] / (1024**2)
+                    if codec == 'none' or volume_logico_mb is None:
+                        volume_logico_mb = size_mb
+                    medidas = {
+                        nome: executar_benchmark(
+                            lambda: query(ler_formato(spark, formato, path)), warmup, trials
+                        )
+                        for nome, query in [('varredura', varredura_completa),
+                                            ('filtro', QUERIES['filtro'][1]),
+                                            ('agregacao', QUERIES['agregacao'][1])]
+                    }
+                    varredura_s = medidas['varredura']['total']['mediana']
+                    resultados[formato].append({
+                        'codec': rotulo,
+                        'size_mb': size_mb,
+                        'escrita_s': escrita['time'],
+                        'escrita_mb_s': volume_logico_mb / escrita['time'],
+                        'varredura_s': varredura_s,
+                        'varredura_mb_s': volume_logico_mb / varredura_s,
+                        'filtro_s': medidas['filtro']['total']['mediana'],
+                        'agregacao_s': medidas['agregacao']['total']['mediana'],
+                        'medidas': medidas,
+                    })
+                    print(f"  {size_mb:.2f} MB | escrita {volume_logico_mb / escrita['time']:.1f} MB/s | "
+                          f"varredura {volume_logico_mb / varredura_s:.1f} MB/s")
+                except Exception as e:
+                    print(f"  ⚠ Codec indisponível: {e}")
+                    resultados[formato].append({'codec': rotulo, 'erro': str(e)})
+                finally:
+                    shutil.rmtree(path, ignore_errors=True)
+    finally:
+        df.unpersist()
+    
+    with open(CODEC_MATRIX_PATH, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print()
+    print(f"✓ Matriz de codecs salva em: {CODEC_MATRIX_PATH}")
+    print()
+    return resultados
+
+
+def comparar_particionamentos(spark, df, esquemas=PARTITION_SCHEMES,
+                              warmup=BENCHMARK_WARMUP, trials=BENCHMARK_TRIALS):
+    """
+    Escreve todos os formatos sem partição e com cada esquema de
+    particionamento Hive-style, e mede as queries sobre chaves de partição.
+
+    A aceleração da poda é medida (mediana sem partição / mediana com
+    partição), junto com arquivos e bytes lidos versus o total.
+    """
+    print("=" * 80)
+    print("PARTICIONAMENTO HIVE-STYLE E PODA DE PARTIÇÕES")
+    print("=" * 80)
+    
+    resultados = {}
+    for esquema in [[]] + list(esquemas):
+        nome = "_".join(esquema) or "sem_particao"
+        print(f"\n>>> Esquema: {nome}")
+        layout = dict(WRITE_LAYOUT, particoes_por=esquema)
+        formatos_info = salvar_em_formatos(df, str(PARTITION_DIR / nome), layout=layout)
+        resultados[nome] = analisar_performance(spark, formatos_info, warmup, trials,
+                                                queries=QUERIES_PARTICAO)
+    
+    base = resultados['sem_particao']
+    print("PODA DE PARTIÇÕES (aceleração vs sem partição):")
+    print("-" * 80)
+    print(f"{'Esquema':<22} {'Formato':<9} {'Query':<18} {'Aceleração':<11} {'Arquivos':<14} {'% bytes lidos':<12}")
+    print("-" * 80)
+    for nome, por_formato in resultados.items():
+        if nome == 'sem_particao':
+            continue
+        for formato, r in por_formato.items():
+            for query, q in r['queries'].items():
+                mediana_base = base[formato]['queries'][query]['total']['mediana']
+                q['aceleracao_vs_sem_particao'] = mediana_base / q['total']['mediana']
+                fracao = q['scan']['bytes_lidos'] / r['bytes_total'] if r['bytes_total'] else 0
+                print(f"{nome:<22} {formato:<9} {query:<18} {q['aceleracao_vs_sem_particao']:<11.2f} "
+                      f"{q['scan']['arquivos_lidos']:>5}/{r['arquivos_total']:<8} {fracao * 100:<12.1f}")
+    print()
+    
+    poda_path = OUTPUT_DIR / "particionamento.json"
+    with open(poda_path, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"✓ Resultados de particionamento salvos em: {poda_path}")
+    print()
+    return resultados
+
+
+def comparar_clusterizacoes(spark, df, estrategias=CLUSTER_STRATEGIES,
+                            warmup=BENCHMARK_WARMUP, trials=BENCHMARK_TRIALS):
+    """
+    Escreve os formatos com cada estratégia de clusterização e mede, para
+    os predicados de range e ponto (PREDICADOS_CLUSTER):
+    - quantos row groups (Parquet) e stripes (ORC) podem ser pulados pelas
+      estatísticas min/max dos rodapés
+    - a latência das queries e a variação em relação à ordem de geração
+    """
+    print("=" * 80)
+    print("CLUSTERIZAÇÃO E ESTATÍSTICAS MIN/MAX")
+    print("=" * 80)
+    
+    resultados = {}
+    for estrategia, colunas in estrategias:
+        nome = "_".join([estrategia] + list(colunas))
+        print(f"\n>>> Clusterização: {nome}")
+        layout = dict(WRITE_LAYOUT, clusterizacao=(estrategia, colunas),
+                      opcoes_escrita=OPCOES_BLOCOS_PEQUENOS)
+        formatos_info = salvar_em_formatos(df, str(CLUSTER_DIR / nome), layout=layout)
+        desempenho = analisar_performance(spark, formatos_info, warmup, trials, queries=QUERIES_CLUSTER)
+        
+        for formato, leitor_blocos in [('Parquet', blocos_parquet), ('ORC', blocos_orc)]:
+            blocos = leitor_blocos(spark, formatos_info[formato]['path'])
+            desempenho[formato]['blocos_pulados'] = {}
+            for predicado, condicoes in PREDICADOS_CLUSTER.items():
+                pulados, total = contar_blocos_pulados(blocos, condicoes)
+                desempenho[formato]['blocos_pulados'][predicado] = {'pulados': pulados, 'total': total}
+        resultados[nome] = desempenho
+    
+    base_nome = next(iter(resultados))
+    base = resultados[base_nome]
+    print(f"BLOCOS PULADOS E LATÊNCIA (variação vs {base_nome}):")
+    print("-" * 80)
+    print(f"{'Clusterização':<30} {'Formato':<9} {'Predicado':<18} {'Pulados':<12} {'Mediana (s)':<12} {'Δ':<8}")
+    print("-" * 80)
+    for nome, por_formato in resultados.items():
+        for formato, r in por_formato.items():
+            for predicado in PREDICADOS_CLUSTER:
+                q = r['queries'][f"cluster_{predicado}"]
+                mediana = q['total']['mediana']
+                mediana_base = base[formato]['queries'][f"cluster_{predicado}"]['total']['mediana']
+                q['variacao_vs_base'] = (mediana - mediana_base) / mediana_base
+                pulados = r.get('blocos_pulados', {}).get(predicado)
+                texto_pulados = f"{pulados['pulados']}/{pulados['total']}" if pulados else "-"
+                print(f"{nome:<30} {formato:<9} {predicado:<18} {texto_pulados:<12} "
+                      f"{mediana:<12.3f} {q['variacao_vs_base'] * 100:+.1f}%")
+    print()
+    
+    cluster_path = OUTPUT_DIR / "clusterizacao.json"
+    with open(cluster_path, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False, default=str)
+    print(f"✓ Resultados de clusterização salvos em: {cluster_path}")
+    print()
+    return resultados
+
+
+def comparar_bloom_filters(spark, df, colunas=BLOOM_COLUNAS, fpp=BLOOM_FPP, warmup=BENCHMARK_WARMUP):
+    """
+    Escreve Parquet e ORC sem e com bloom filters e compara a família de
+    consultas pontuais (latência e bytes lidos) e o custo em disco.
+    """
+    print("=" * 80)
+    print("BLOOM FILTERS E CONSULTAS PONTUAIS")
+    print("=" * 80)
+    
+    variantes = {
+        'sem_bloom': None,
+        f"bloom_fpp{fpp}": {'colunas': colunas, 'fpp': fpp},
+    }
+    resultados = {}
+    for nome, bloom in variantes.items():
+        print(f"\n>>> Variante: {nome}")
+        layout = dict(WRITE_LAYOUT, opcoes_escrita=OPCOES_BLOCOS_PEQUENOS, bloom_filter=bloom)
+        formatos_info = salvar_em_formatos(df, str(BLOOM_DIR / nome), layout=layout,
+                                           formatos=['Parquet', 'ORC'])
+        resultados[nome] = {}
+        for formato, info in formatos_info.items():
+            print(f"Consultas pontuais em {formato}...")
+            resultados[nome][formato] = {
+                'size_mb': info['size'] / (1024**2),
+                'lookups': medir_lookups(spark, formato, info['path'], warmup),
+            }
+    
+    base = resultados['sem_bloom']
+    print()
+    print("CONSULTAS PONTUAIS COM E SEM BLOOM FILTER:")
+    print("-" * 80)
+    print(f"{'Variante':<16} {'Formato':<9} {'Grupo':<11} {'Mediana (s)':<12} {'MB lidos':<10} "
+          f"{'Δ latência':<11} {'Tamanho (MB)':<12}")
+    print("-" * 80)
+    for nome, por_formato in resultados.items():
+        for formato, r in por_formato.items():
+            for grupo, lk in r['lookups'].items():
+                mediana_base = base[formato]['lookups'][grupo]['latencia']['mediana']
+                variacao = (lk['latencia']['mediana'] - mediana_base) / mediana_base
+                print(f"{nome:<16} {formato:<9} {grupo:<11} {lk['latencia']['mediana']:<12.3f} "
+                      f"{lk['bytes_lidos_mediana'] / 1024**2:<10.2f} {variacao * 100:<+10.1f}% "
+                      f"{r['size_mb']:<12.2f}")
+    print()
+    
+    bloom_path = OUTPUT_DIR / "bloom_filters.json"
+    with open(bloom_path, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"✓ Resultados de bloom filters salvos em: {bloom_path}")
+    print()
+    return resultados
+
+
+def consulta_janela(df):
+    """Agregação por tipo de sensor usada nas consultas por janela de tempo."""
+    return df.groupBy("sensor_type").agg(avg("value").alias("media"), expr("count(*) as leituras"))
+
+
+def comparar_ciclo_vida(spark, df, camadas=LIFECYCLE_CAMADAS, referencia=LIFECYCLE_REFERENCIA,
+                        passos_dias=LIFECYCLE_PASSOS_DIAS, janelas=LIFECYCLE_JANELAS,
+                        warmup=BENCHMARK_WARMUP, trials=BENCHMARK_TRIALS):
+    """
+    Simula o ciclo de vida Hot/Warm/Cold: carga inicial até `referencia`,
+    depois avanços incrementais (ingestão das novas leituras + migração das
+    que envelheceram). Mede tempo de migração, custo de armazenamento por
+    camada e a latência das consultas roteadas por janela de tempo, contra
+    a leitura do mesmo intervalo num único diretório Parquet.
+    """
+    print("=" * 80)
+    print("CICLO DE VIDA HOT/WARM/COLD")
+    print("=" * 80)
+    print("Camadas: " + " | ".join(
+        f"{c['nome']} (≤{c['idade_max_dias']}d)" if c['idade_max_dias'] is not None else c['nome']
+        for c in camadas))
+    
+    diretorio = str(LIFECYCLE_DIR)
+    
+    # Carga inicial
+    print(f"\nCarga inicial (referência {referencia:%Y-%m-%d})...")
+    inicio = time.perf_counter()
+    linhas = carga_inicial(spark, diretorio, camadas, df, referencia)
+    carga = {'tempo_s': time.perf_counter() - inicio, 'linhas': linhas,
+             'custo': custo_armazenamento(diretorio, camadas)}
+    print(f"✓ Carga inicial em {carga['tempo_s']:.2f}s: "
+          + ", ".join(f"{nome} {n:,} linhas" for nome, n in linhas.items()))
+    
+    # Avanços incrementais: ingestão + migração
+    avancos = []
+    for dias in passos_dias:
+        nova_referencia = referencia + timedelta(days=dias)
+        print(f"\nAvanço para {nova_referencia:%Y-%m-%d} (+{dias}d)...")
+        inicio = time.perf_counter()
+        novas = df.filter((col("timestamp") >= lit(referencia)) & (col("timestamp") < lit(nova_referencia)))
+        ingeridas = ingerir(spark, diretorio, camadas, novas)
+        ingestao_s = time.perf_counter() - inicio
+        passos = migrar(spark, diretorio, camadas, nova_referencia)
+        avancos.append({'referencia': nova_referencia.isoformat(), 'ingestao_s': ingestao_s,
+                        'linhas_ingeridas': ingeridas, 'migracoes': passos})
+        print(f"✓ Ingestão: {sum(ingeridas.values()):,} linhas em {ingestao_s:.2f}s")
+        for passo in passos:
+            print(f"✓ Migração de {passo['origem']}: {sum(passo['linhas_movidas'].values()):,} linhas "
+                  f"({', '.join(passo['linhas_movidas'])}) em {passo['tempo_s']:.2f}s | partições reescritas: "
+                  f"origem {passo['particoes_origem_reescritas']}, destino {passo['particoes_destino_reescritas']}")
+        referencia = nova_referencia
+    
+    # Verificação: nenhuma linha perdida ou duplicada entre camadas
+    todas, _ = rotear(spark, diretorio, camadas, datetime(1970, 1, 1), referencia)
+    esperado = df.filter(col("timestamp") < lit(referencia)).count()
+    obtido = todas.count()
+    print(f"\n{'✓' if obtido == esperado else '⚠'} Integridade: {obtido:,} linhas nas camadas "
+          f"(esperado {esperado:,})")
+    
+    # Referência: todas as linhas num único Parquet snappy sem partição
+    base_path = str(LIFECYCLE_BASE_DIR)
+    df.filter(col("timestamp") < lit(referencia)).write.mode("overwrite") \
+        .option("compression", "snappy").parquet(base_path)
+    base_bytes = sum(a.stat().st_size for a in listar_arquivos_dados(base_path))
+    
+    # Consultas por janela: roteadas x diretório único
+    print("\nConsultas por janela de tempo...")
+    consultas = {}
+    for nome, (dias_inicio, dias_fim) in janelas.items():
+        janela = (referencia - timedelta(days=dias_inicio), referencia - timedelta(days=dias_fim))
+        _, lidas = rotear(spark, diretorio, camadas, *janela)
+        roteada = executar_benchmark(
+            lambda: consulta_janela(rotear(spark, diretorio, camadas, *janela)[0]),
+            warmup, trials)
+        unica = executar_benchmark(
+            lambda: consulta_janela(spark.read.parquet(base_path)
+                                    .filter((col("timestamp") >= lit(janela[0]))
+                                            & (col("timestamp") < lit(janela[1])))),
+            warmup, trials)
+        consultas[nome] = {
+            'janela': [janela[0].isoformat(), janela[1].isoformat()],
+            'camadas_lidas': lidas,
+            'roteada': roteada,
+            'diretorio_unico': unica,
+        }
+        print(f"  {nome}: camadas {'+'.join(lidas)} | roteada {roteada['total']['mediana']:.3f}s "
+              f"({roteada['scan']['arquivos_lidos']} arquivos) | diretório único "
+              f"{unica['total']['mediana']:.3f}s ({unica['scan']['arquivos_lidos']} arquivos)")
+    
+    custo = custo_armazenamento(diretorio, camadas)
+    custo_base = base_bytes / 1024**3 * camadas[0]['custo_gb_mes']
+    
+    print()
+    print("ARMAZENAMENTO POR CAMADA:")
+    print("-" * 80)
+    print(f"{'Camada':<10} {'Partições':>10} {'Arquivos':>10} {'Tamanho (MB)':>14} {'USD/mês':>12}")
+    print("-" * 80)
+    for nome, c in custo.items():
+        print(f"{nome:<10} {c['particoes']:>10} {c['arquivos']:>10} {c['bytes'] / 1024**2:>14.2f} "
+              f"{c['custo_mes']:>12.6f}")
+    print("-" * 80)
+    total_bytes = sum(c['bytes'] for c in custo.values())
+    total_custo = sum(c['custo_mes'] for c in custo.values())
+    print(f"{'Total':<10} {'':>10} {'':>10} {total_bytes / 1024**2:>14.2f} {total_custo:>12.6f}")
+    print(f"{'Tudo hot':<10} {'':>10} {'':>10} {base_bytes / 1024**2:>14.2f} {custo_base:>12.6f} "
+          f"(Parquet snappy na camada {camadas[0]['nome']})")
+    if custo_base:
+        print(f"✓ Economia de armazenamento: {(1 - total_custo / custo_base) * 100:.1f}%")
+    print()
+    
+    print("LATÊNCIA POR JANELA (mediana):")
+    print("-" * 80)
+    print(f"{'Janela':<18} {'Camadas':<16} {'Roteada (s)':>12} {'Único (s)':>10} {'Razão':>7}")
+    print("-" * 80)
+    for nome, c in consultas.items():
+        roteada = c['roteada']['total']['mediana']
+        unica = c['diretorio_unico']['total']['mediana']
+        print(f"{nome:<18} {'+'.join(c['camadas_lidas']):<16} {roteada:>12.3f} {unica:>10.3f} "
+              f"{roteada / unica:>6.2f}x")
+    print()
+    
+    lifecycle_path = OUTPUT_DIR / "ciclo_vida.json"
+    with open(lifecycle_path, 'w', encoding='utf-8') as f:
+        json.dump({'camadas': camadas, 'carga_inicial': carga, 'avancos': avancos,
+                   'integridade': {'esperado': esperado, 'obtido': obtido},
+                   'armazenamento': custo, 'diretorio_unico': {'bytes': base_bytes, 'custo_mes': custo_base},
+                   'consultas': consultas},
+                  f, indent=2, ensure_ascii=False, default=str)
+    print(f"✓ Resultados do ciclo de vida salvos em: {lifecycle_path}")
+    print()
+    return consultas
+
+
+def varrer_escala(spark, tamanhos=SCALE_SWEEP_TAMANHOS, warmup=BENCHMARK_WARMUP,
+                  trials=SCALE_SWEEP_TRIALS):
+    """
+    Roda o pipeline (geração -> escrita nos formatos -> queries) em cada
+    tamanho de dataset e ajusta curvas de escala tempo x linhas por formato
+    e operação.
+
+    Para caber no limite de memória do container, nada é persistido: o
+    dataset é gerado em streaming para uma origem Parquet em disco, e cada
+    formato é escrito e lido a partir do disco. Os dados de cada tamanho
+    são removidos após a medição (ver SCALE_SWEEP_MANTER_DADOS).
+    """
+    print("=" * 80)
+    print("VARREDURA DE ESCALA")
+    print("=" * 80)
+    print(f"Tamanhos: {', '.join(f'{n:,}' for n in tamanhos)}")
+    
+    # Queries padrão + varredura que decodifica todas as colunas
+    queries = dict(QUERIES)
+    queries['varredura'] = ("Varredura completa (todas as colunas)", varredura_completa)
+    escala_path = OUTPUT_DIR / "escala.json"
+    pontos = []
+    
+    for n in sorted(tamanhos):
+        print(f"\n--- {n:,} registros ---")
+        base = SCALE_SWEEP_DIR / f"n{n}"
+        origem = str(base / "origem")
+        
+        inicio = time.perf_counter()
+        gerar_dataset_iot(spark, n, formato='Parquet', path=origem)
+        geracao_s = time.perf_counter() - inicio
+        print(f"✓ Origem gerada em {geracao_s:.2f}s ({n / geracao_s:,.0f} linhas/s)")
+        
+        formatos_info = salvar_em_formatos(spark.read.parquet(origem), str(base), storage_level=None)
+        resultados = analisar_performance(spark, formatos_info, warmup, trials,
+                                          queries=queries, lookups=False)
+        
+        ponto = {'registros': n, 'geracao_s': geracao_s, 'formatos': {}}
+        for formato, r in resultados.items():
+            escrita_s = formatos_info[formato]['time']
+            operacoes = {'escrita': escrita_s}
+            operacoes.update({nome: q['total']['mediana'] for nome, q in r['queries'].items()})
+            ponto['formatos'][formato] = {
+                'size_mb': r['size_mb'],
+                'operacoes': {
+                    nome: {'tempo_s': tempo, 'linhas_s': n / tempo, 'mb_s': r['size_mb'] / tempo}
+                    for nome, tempo in operacoes.items()
+                },
+                'spark': {nome: q['spark'] for nome, q in r['queries'].items()},
+            }
+        pontos.append(ponto)
+        
+        if not SCALE_SWEEP_MANTER_DADOS:
+            shutil.rmtree(base, ignore_errors=True)
+        
+        # Salva a cada tamanho: resultados parciais sobrevivem a falhas nos maiores
+        with open(escala_path, 'w', encoding='utf-8') as f:
+            json.dump({'pontos': pontos}, f, indent=2, ensure_ascii=False)
+    
+    # Curvas de escala: tempo x linhas por formato e operação
+    curvas = {}
+    xs = [p['registros'] for p in pontos]
+    for formato in pontos[0]['formatos']:
+        curvas[formato] = {}
+        for operacao in pontos[0]['formatos'][formato]['operacoes']:
+            ys = [p['formatos'][formato]['operacoes'][operacao]['tempo_s'] for p in pontos]
+            curvas[formato][operacao] = {
+                'linear': ajustar_linear(xs, ys),
+                'potencia': ajustar_potencia(xs, ys),
+            }
+    
+    print()
+    print("VAZÃO POR TAMANHO (milhões de linhas/s):")
+    print("-" * 80)
+    operacoes = list(next(iter(pontos[0]['formatos'].values()))['operacoes'])
+    print(f"{'Formato':<10} {'Registros':>12} " + " ".join(f"{o[:9]:>9}" for o in operacoes))
+    print("-" * 80)
+    for formato in pontos[0]['formatos']:
+        for p in pontos:
+            ops = p['formatos'][formato]['operacoes']
+            print(f"{formato:<10} {p['registros']:>12,} "
+                  + " ".join(f"{ops[o]['linhas_s'] / 1e6:>9.2f}" for o in operacoes))
+    print()
+    
+    maior = pontos[-1]
+    print(f"VAZÃO EM MB/s ({maior['registros']:,} registros):")
+    print("-" * 80)
+    print(f"{'Formato':<10} {'Tamanho MB':>12} " + " ".join(f"{o[:9]:>9}" for o in operacoes))
+    print("-" * 80)
+    for formato, r in maior['formatos'].items():
+        print(f"{formato:<10} {r['size_mb']:>12.1f} "
+              + " ".join(f"{r['operacoes'][o]['mb_s']:>9.1f}" for o in operacoes))
+    print()
+    
+    if len(pontos) > 1:
+        print("CURVAS DE ESCALA (tempo = overhead + custo x linhas; tempo ∝ linhas^expoente):")
+        print("-" * 80)
+        print(f"{'Formato':<10} {'Operação':<12} {'Overhead (s)':>13} {'s/M linhas':>11} "
+              f"{'Vazão ∞ (M/s)':>14} {'Expoente':>9} {'R²':>6}")
+        print("-" * 80)
+        for formato, por_operacao in curvas.items():
+            for operacao, curva in por_operacao.items():
+                linear, potencia = curva['linear'], curva['potencia']
+                vazao = linear['vazao_assintotica_linhas_s']
+                print(f"{formato:<10} {operacao[:12]:<12} {linear['overhead_s']:>13.2f} "
+                      f"{linear['custo_por_linha_s'] * 1e6:>11.3f} "
+                      f"{(vazao / 1e6 if vazao else float('nan')):>14.2f} "
+                      f"{(potencia['expoente'] if potencia else float('nan')):>9.2f} "
+                      f"{linear['r2']:>6.3f}")
+        print()
+    
+    with open(escala_path, 'w', encoding='utf-8') as f:
+        json.dump({'pontos': pontos, 'curvas': curvas}, f, indent=2, ensure_ascii=False)
+    print(f"✓ Varredura de escala salva em: {escala_path}")
+    print()
+    return pontos, curvas
+
+
+def ler_stream_entrada(spark, entrada, formato=STREAMING_FORMATO_ENTRADA):
+    """Leitura em streaming dos lotes gravados no diretório de entrada."""
+    leitor = spark.readStream.schema(SCHEMA_SENSORES_IOT) \
+        .option("maxFilesPerTrigger", STREAMING_MAX_ARQUIVOS_POR_TRIGGER) \
+        .option("timestampFormat", TIMESTAMP_FORMAT)
+    if formato == 'CSV':
+        return leitor.option("header", "true").csv(entrada)
+    return leitor.json(entrada)
+
+
+def medir_destinos(spark, destinos, query=STREAMING_QUERY):
+    """
+    Uma rodada da query de referência em cada destino da ingestão, com a
+    quantidade de arquivos acumulada no momento da medida.
+    """
+    _, consulta = QUERIES[query]
+    medidas = []
+    for formato, path in destinos.items():
+        arquivos = listar_arquivos_dados(path)
+        if not arquivos:
+            continue
+        plan_ns, exec_ns, _ = medir_execucao(lambda: consulta(ler_formato(spark, formato, path)))
+        medidas.append({
+            'formato': formato,
+            'arquivos': len(arquivos),
+            'bytes': sum(a.stat().st_size for a in arquivos),
+            'planejamento_s': plan_ns / 1e9,
+            'latencia_s': (plan_ns + exec_ns) / 1e9,
+        })
+    return medidas
+
+
+def ingerir_streaming(spark, formato_entrada=STREAMING_FORMATO_ENTRADA,
+                      linhas_por_lote=STREAMING_LINHAS_POR_LOTE,
+                      lotes_por_segundo=STREAMING_LOTES_POR_SEGUNDO, duracao_s=STREAMING_DURACAO_S,
+                      formatos=STREAMING_FORMATOS_DESTINO):
+    """
+    Ingestão contínua com Structured Streaming.
+
+    Um processo gerador (gerador_arquivos.py) grava lotes CSV/JSON no
+    diretório de entrada à taxa configurada; cada micro-batch é anexado
+    (append) a DATA_DIR/parquet e DATA_DIR/orc via foreachBatch. Mede:
+    - latência ponta a ponta de cada lote: da entrega do arquivo (instante
+      no nome) até o commit do micro-batch em todos os destinos
+    - vazão sustentada em linhas/s
+    - degradação da query de referência à medida que os arquivos pequenos
+      se acumulam nos destinos (ajuste linear latência x arquivos)
+
+    Os destinos devem estar sem particionamento (layout do modo completo sem
+    --particionar): os micro-batches são anexados sem partitionBy.
+    """
+    print("=" * 80)
+    print("INGESTÃO CONTÍNUA (STRUCTURED STREAMING)")
+    print("=" * 80)
+    entrada = STREAMING_DIR / "entrada"
+    checkpoint = STREAMING_DIR / "checkpoint"
+    for diretorio in (entrada, checkpoint):
+        shutil.rmtree(diretorio, ignore_errors=True)
+    entrada.mkdir(parents=True)
+    destinos = {f: str(DATA_DIR / ESCRITORES[f][0]) for f in formatos}
+    print(f"Entrada: {formato_entrada}, {linhas_por_lote} linhas/lote, {lotes_por_segundo} lotes/s "
+          f"por {duracao_s}s")
+    print(f"Destinos (append): {', '.join(f'{f} -> {p}' for f, p in destinos.items())}")
+    
+    lotes = []
+    def processar_lote(batch_df, batch_id):
+        batch_df = batch_df.withColumn("_arquivo", input_file_name()).persist()
+        try:
+            arquivos = batch_df.groupBy("_arquivo").count().collect()
+            if not arquivos:
+                return
+            dados = batch_df.drop("_arquivo")
+            for formato, path in destinos.items():
+                writer = dados.write.mode("append").option("compression", WRITE_CODECS[formato])
+                ESCRITORES[formato][1](writer, path)
+            commit_ns = time.time_ns()
+        finally:
+            batch_df.unpersist()
+        lotes.append({
+            'batch_id': batch_id,
+            'arquivos': len(arquivos),
+            'linhas': sum(a['count'] for a in arquivos),
+            'commit_ns': commit_ns,
+            'latencias_s': [(commit_ns - instante_entrega(a['_arquivo'])) / 1e9 for a in arquivos],
+            'primeira_entrega_ns': min(instante_entrega(a['_arquivo']) for a in arquivos),
+        })
+    
+    query = ler_stream_entrada(spark, str(entrada), formato_entrada).writeStream \
+        .foreachBatch(processar_lote) \
+        .option("checkpointLocation", str(checkpoint)) \
+        .trigger(processingTime=STREAMING_TRIGGER) \
+        .start()
+    
+    config_gerador = {'faixas': FAIXAS_SENSORES, 'localizacoes': LOCALIZACOES, 'cidades': CIDADES,
+                      'num_sensores': NUM_SENSORES}
+    gerador = subprocess.Popen([
+        sys.executable, str(Path(__file__).resolve().parent / "gerador_arquivos.py"), str(entrada),
+        "--formato", formato_entrada, "--linhas-por-lote", str(linhas_por_lote),
+        "--lotes-por-segundo", str(lotes_por_segundo), "--duracao", str(duracao_s),
+        "--seed", str(GENERATOR_SEED), "--config", json.dumps(config_gerador),
+    ])
+    
+    # Query de referência medida periodicamente enquanto os arquivos se acumulam
+    inicio = time.perf_counter()
+    degradacao = []
+    try:
+        while True:
+            try:
+                gerador.wait(timeout=STREAMING_INTERVALO_CONSULTA_S)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if query.exception():
+                raise RuntimeError(f"Streaming falhou: {query.exception()}")
+            for medida in medir_destinos(spark, destinos):
+                medida['t_s'] = time.perf_counter() - inicio
+                degradacao.append(medida)
+                print(f"  t={medida['t_s']:6.1f}s {medida['formato']:<8} {medida['arquivos']:>6} arquivos "
+                      f"-> {medida['latencia_s']:.3f}s")
+        if gerador.returncode != 0:
+            raise RuntimeError(f"Gerador de lotes terminou com código {gerador.returncode}")
+        query.processAllAvailable()
+    finally:
+        query.stop()
+        if gerador.poll() is None:
+            gerador.terminate()
+    for medida in medir_destinos(spark, destinos):
+        medida['t_s'] = time.perf_counter() - inicio
+        degradacao.append(medida)
+    
+    if not lotes:
+        raise RuntimeError("Nenhum micro-batch processado")
+    latencias = [l for lote in lotes for l in lote['latencias_s']]
+    linhas = sum(lote['linhas'] for lote in lotes)
+    janela_s = (max(l['commit_ns'] for l in lotes) - min(l['primeira_entrega_ns'] for l in lotes)) / 1e9
+    resumo = {
+        'micro_batches': len(lotes),
+        'arquivos_entrada': len(latencias),
+        'linhas': linhas,
+        'janela_s': janela_s,
+        'linhas_s': linhas / janela_s if janela_s > 0 else None,
+        'latencia_s': {f'p{p}': percentil(latencias, p) for p in (50, 95, 99)},
+    }
+    resumo['latencia_s']['max'] = max(latencias)
+    
+    # Degradação: latência = base + custo x arquivos, por formato
+    ajustes = {}
+    for formato in destinos:
+        pontos = [m for m in degradacao if m['formato'] == formato]
+        ajustes[formato] = {
+            'arquivos_inicio': pontos[0]['arquivos'] if pontos else None,
+            'arquivos_fim': pontos[-1]['arquivos'] if pontos else None,
+            'latencia_inicio_s': pontos[0]['latencia_s'] if pontos else None,
+            'latencia_fim_s': pontos[-1]['latencia_s'] if pontos else None,
+            'ajuste': ajustar_linear([m['arquivos'] for m in pontos], [m['latencia_s'] for m in pontos]),
+        }
+    
+    print()
+    print("LATÊNCIA PONTA A PONTA (entrega do arquivo -> commit nos destinos):")
+    print("-" * 80)
+    print(f"Micro-batches: {resumo['micro_batches']}, arquivos: {resumo['arquivos_entrada']}, "
+          f"linhas: {linhas:,}")
+    print("  " + "  ".join(f"{p}={v:.2f}s" for p, v in resumo['latencia_s'].items()))
+    if resumo['linhas_s']:
+        print(f"✓ Vazão sustentada: {resumo['linhas_s']:,.0f} linhas/s em {janela_s:.1f}s")
+    print()
+    
+    print(f"DEGRADAÇÃO DA QUERY '{STREAMING_QUERY}' COM ARQUIVOS PEQUENOS:")
+    print("-" * 80)
+    print(f"{'Formato':<10} {'Arquivos':>17} {'Latência (s)':>18} {'ms/100 arq.':>12} {'R²':>6}")
+    print("-" * 80)
+    for formato, a in ajustes.items():
+        if a['arquivos_inicio'] is None:
+            continue
+        ajuste = a['ajuste']
+        print(f"{formato:<10} {a['arquivos_inicio']:>7} -> {a['arquivos_fim']:<6} "
+              f"{a['latencia_inicio_s']:>7.3f} -> {a['latencia_fim_s']:<7.3f} "
+              f"{(ajuste['custo_por_linha_s'] * 1e5 if ajuste else float('nan')):>12.2f} "
+              f"{(ajuste['r2'] if ajuste else float('nan')):>6.3f}")
+    print()
+    
+    ingestao_path = OUTPUT_DIR / "ingestao.json"
+    with open(ingestao_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'config': {'formato_entrada': formato_entrada, 'linhas_por_lote': linhas_por_lote,
+                       'lotes_por_segundo': lotes_por_segundo, 'duracao_s': duracao_s,
+                       'trigger': STREAMING_TRIGGER, 'destinos': destinos, 'query': STREAMING_QUERY},
+            'resumo': resumo,
+            'micro_batches': [{k: v for k, v in l.items() if k != 'latencias_s'} for l in lotes],
+            'degradacao': degradacao,
+            'ajustes': ajustes,
+        }, f, indent=2, ensure_ascii=False)
+    print(f"✓ Ingestão contínua salva em: {ingestao_path}")
+    print()
+    return resumo, ajustes
+
+
+def compactar_formatos(spark, formatos=COMPACTION_FORMATOS, limiar_bytes=COMPACTION_LIMIAR_BYTES,
+                       alvo_bytes=COMPACTION_ALVO_BYTES, min_arquivos=COMPACTION_MIN_ARQUIVOS,
+                       ordenacao=COMPACTION_ORDENACAO, warmup=BENCHMARK_WARMUP, trials=BENCHMARK_TRIALS):
+    """
+    Compacta os arquivos pequenos de DATA_DIR/parquet e DATA_DIR/orc (ver
+    compactacao.py) e mede as queries padrão antes e depois pelo mesmo
+    caminho do modo completo (`analisar_performance`).
+    """
+    print("=" * 80)
+    print("COMPACTAÇÃO DE ARQUIVOS PEQUENOS")
+    print("=" * 80)
+    print(f"Limiar: {limiar_bytes / 1024**2:.0f} MB | Alvo: {alvo_bytes / 1024**2:.0f} MB | "
+          f"Mínimo por partição: {min_arquivos} | Ordenação: {', '.join(ordenacao) or 'nenhuma'}")
+    
+    def info_formatos():
+        info = {}
+        for formato in formatos:
+            path = str(DATA_DIR / ESCRITORES[formato][0])
+            if Path(path).exists():
+                info[formato] = {'path': path, 'size': get_directory_size(path),
+                                 'particoes': colunas_particao(path)}
+        return info
+    
+    antes = info_formatos()
+    if not antes:
+        raise RuntimeError(f"Nenhum destino encontrado em {DATA_DIR} (rode o modo completo ou ingestao)")
+    resultados_antes = analisar_performance(spark, antes, warmup, trials, queries=QUERIES, lookups=False)
+    
+    compactacao = {}
+    for formato, info in antes.items():
+        inicio = time.perf_counter()
+        compactadas, adiadas = compactar_tabela(
+            spark, formato, info['path'], limiar_bytes, alvo_bytes, min_arquivos,
+            ordenacao, WRITE_CODECS[formato])
+        compactacao[formato] = {
+            'tempo_s': time.perf_counter() - inicio,
+            'particoes_compactadas': len(compactadas),
+            'particoes_adiadas': adiadas,
+            'trocas_atomicas': all(p['atomica'] for p in compactadas),
+            'particoes': compactadas,
+        }
+        print(f"✓ {formato}: {len(compactadas)} partições compactadas "
+              f"({sum(p['arquivos_reescritos'] for p in compactadas)} arquivos reescritos) "
+              f"em {compactacao[formato]['tempo_s']:.2f}s"
+              + (f", {len(adiadas)} adiadas (escrita em andamento)" if adiadas else ""))
+        if compactadas and not compactacao[formato]['trocas_atomicas']:
+            print("  ⚠ renameat2(RENAME_EXCHANGE) indisponível: troca por renames sucessivos")
+    
+    depois = info_formatos()
+    resultados_depois = analisar_performance(spark, depois, warmup, trials, queries=QUERIES, lookups=False)
+    
+    print("ANTES x DEPOIS DA COMPACTAÇÃO:")
+    print("-" * 80)
+    print(f"{'Formato':<10} {'Arquivos':>17} {'Tamanho (MB)':>19} " + " ".join(f"{q[:9]:>9}" for q in QUERIES))
+    print("-" * 80)
+    for formato in antes:
+        a, d = resultados_antes[formato], resultados_depois[formato]
+        ganhos = [a['queries'][q]['total']['mediana'] / d['queries'][q]['total']['mediana'] for q in QUERIES]
+        print(f"{formato:<10} {a['arquivos_total']:>7} -> {d['arquivos_total']:<6} "
+              f"{a['bytes_total'] / 1024**2:>8.1f} -> {d['bytes_total'] / 1024**2:<7.1f} "
+              + " ".join(f"{g:>8.2f}x" for g in ganhos))
+    print("(colunas das queries: aceleração da mediana, antes / depois)")
+    print()
+    
+    compactacao_path = OUTPUT_DIR / "compactacao.json"
+    with open(compactacao_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'config': {'limiar_bytes': limiar_bytes, 'alvo_bytes': alvo_bytes, 'min_arquivos': min_arquivos,
+                       'ordenacao': ordenacao},
+            'compactacao': compactacao,
+            'antes': resultados_antes,
+            'depois': resultados_depois,
+        }, f, indent=2, ensure_ascii=False, default=str)
+    print(f"✓ Compactação salva em: {compactacao_path}")
+    print()
+    return compactacao, resultados_antes, resultados_depois
+
+
+def espaco_formato(formato, espaco=TUNING_ESPACO):
+    """Subespaço de busca que se aplica ao formato (sem leitores de outros formatos)."""
+    especificos = {'Parquet': '.parquet.', 'ORC': '.orc.'}
+    return {
+        chave: valores for chave, valores in espaco.items()
+        if not any(marca in chave for f, marca in especificos.items() if f != formato)
+    }
+
+
+def custo_workload(spark, formato, path, queries, config, rodadas, warmup=BENCHMARK_WARMUP):
+    """
+    Soma das medianas das queries do workload sob `config` (aplicada à
+    sessão só durante a medição). Retorna (custo, mediana por query).
+    """
+    anteriores = aplicar_configuracao(spark, config)
+    try:
+        medianas = {
+            nome: executar_benchmark(lambda: query(ler_formato(spark, formato, path)),
+                                     warmup, rodadas)['total']['mediana']
+            for nome, (_, query) in queries.items()
+        }
+    finally:
+        restaurar_configuracao(spark, anteriores)
+    return sum(medianas.values()), medianas
+
+
+def ajustar_configuracoes(spark, formatos_info, queries, estrategia=TUNING_ESTRATEGIA,
+                          amostras=TUNING_AMOSTRAS, rodadas=BENCHMARK_TRIALS, eta=TUNING_ETA,
+                          seed=TUNING_SEED):
+    """
+    Busca, por formato, a configuração de sessão de menor custo para o
+    workload (soma das medianas das queries) no espaço TUNING_ESPACO.
+
+    A linha de base é a configuração em vigor na sessão (criar_spark_session).
+    Base e melhor candidata são medidas de novo com `rodadas` rodadas depois
+    da busca, e a configuração recomendada é a melhor das duas, com o ganho
+    medido sobre a base.
+    """
+    print("=" * 80)
+    print("AUTOAJUSTE DE CONFIGURAÇÕES DO SPARK")
+    print("=" * 80)
+    print(f"Estratégia: {estrategia} | Amostras: {amostras} | Rodadas: {rodadas} | "
+          f"Queries: {', '.join(queries)}")
+    
+    resultados = {}
+    for formato, info in formatos_info.items():
+        espaco = espaco_formato(formato)
+        print(f"\n{formato}: {len(espaco)} parâmetros, {tamanho_espaco(espaco):,} combinações")
+        
+        def avaliar(config, rodadas_candidata):
+            return custo_workload(spark, formato, info['path'], queries, config, rodadas_candidata)[0]
+        
+        melhor, _, historico = buscar(espaco, avaliar, estrategia, amostras, rodadas, eta, seed)
+        linha_base = configuracao_atual(spark, espaco)
+        custo_base, medianas_base = custo_workload(spark, formato, info['path'], queries, {}, rodadas)
+        custo_melhor, medianas_melhor = custo_workload(spark, formato, info['path'], queries, melhor, rodadas)
+        recomendada = melhor if custo_melhor < custo_base else linha_base
+        resultados[formato] = {
+            'linha_base': {'config': linha_base, 'custo_s': custo_base, 'queries': medianas_base},
+            'melhor': {'config': melhor, 'custo_s': custo_melhor, 'queries': medianas_melhor},
+            'recomendada': recomendada,
+            'alteracoes': {chave: valor for chave, valor in recomendada.items()
+                           if str(valor).lower() != str(linha_base.get(chave)).lower()},
+            'ganho': custo_base / min(custo_base, custo_melhor),
+            'avaliacoes': len(historico),
+            'historico': historico,
+        }
+        print(f"  ✓ Base {custo_base:.3f}s | melhor {custo_melhor:.3f}s | "
+              f"ganho {resultados[formato]['ganho']:.2f}x ({len(historico)} avaliações)")
+    
+    print()
+    print("CONFIGURAÇÃO RECOMENDADA POR FORMATO (custo = soma das medianas):")
+    print("-" * 80)
+    print(f"{'Formato':<10} {'Base (s)':>9} {'Ajustada (s)':>13} {'Ganho':>7}  Parâmetros alterados")
+    print("-" * 80)
+    for formato, r in resultados.items():
+        custo_ajustado = min(r['linha_base']['custo_s'], r['melhor']['custo_s'])
+        alteracoes = ", ".join(f"{chave.replace('spark.sql.', '')}={valor}"
+                               for chave, valor in r['alteracoes'].items()) or "nenhum (base mantida)"
+        print(f"{formato:<10} {r['linha_base']['custo_s']:>9.3f} {custo_ajustado:>13.3f} "
+              f"{r['ganho']:>6.2f}x  {alteracoes}")
+    print()
+    
+    with open(TUNING_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'estrategia': estrategia, 'amostras': amostras, 'rodadas': rodadas, 'eta': eta,
+                   'seed': seed, 'queries': list(queries), 'formatos': resultados},
+                  f, indent=2, ensure_ascii=False, default=str)
+    print(f"✓ Autoajuste salvo em: {TUNING_PATH}")
+    print()
+    return resultados
+
+
+def armazenamento_cache(spark):
+    """Bytes em memória e em disco dos RDDs em cache (status de armazenamento)."""
+    infos = spark.sparkContext._jsc.sc().getRDDStorageInfo()
+    return {
+        'memoria_bytes': sum(info.memSize() for info in infos),
+        'disco_bytes': sum(info.diskSize() for info in infos),
+        'particoes_em_cache': sum(info.numCachedPartitions() for info in infos),
+        'particoes': sum(info.numPartitions() for info in infos),
+    }
+
+
+def off_heap_habilitado(spark):
+    """OFF_HEAP só guarda blocos em memória se a sessão reservou memória off-heap."""
+    return spark.sparkContext.getConf().get("spark.memory.offHeap.enabled", "false") == "true"
+
+
+def comparar_niveis_cache(spark, formatos_info, queries, niveis=CACHE_NIVEIS,
+                          warmup=BENCHMARK_WARMUP, trials=BENCHMARK_TRIALS):
+    """
+    Persiste o DataFrame de cada formato em cada nível de armazenamento e
+    repete o workload sobre ele.
+
+    Por nível: custo da materialização (persist + count), bytes em memória
+    e em disco segundo o status de armazenamento do Spark, partições em
+    cache e mediana de cada query. A linha "disco" de cada formato é o
+    mesmo workload lido dos arquivos, sem cache (como em
+    `analisar_performance`), e o ganho é medido contra ela e contra o
+    formato mais rápido em disco.
+    """
+    print("=" * 80)
+    print("BENCHMARK DE CACHE (NÍVEIS DE ARMAZENAMENTO)")
+    print("=" * 80)
+    print(f"Níveis: {', '.join(niveis)} | Queries: {', '.join(queries)}")
+    
+    resultados = {}
+    for formato, info in formatos_info.items():
+        print(f"\n{formato}:")
+        spark.catalog.clearCache()
+        disco = {
+            nome: executar_benchmark(lambda: query(ler_formato(spark, formato, info['path'])), warmup, trials)
+            for nome, (_, query) in queries.items()
+        }
+        resultados[formato] = {'disco': {
+            'queries': {nome: m['total']['mediana'] for nome, m in disco.items()},
+            'custo_s': sum(m['total']['mediana'] for m in disco.values()),
+        }}
+        print(f"  {'disco':<20} consultas {resultados[formato]['disco']['custo_s']:.3f}s")
+        
+        for nivel, storage_level in niveis.items():
+            if storage_level.useOffHeap and not off_heap_habilitado(spark):
+                resultados[formato][nivel] = {'erro': "sessão sem spark.memory.offHeap.enabled "
+                                                      "(crie a sessão pelo modo cache, sem --remoto)"}
+                print(f"  {nivel:<20} ⚠ {resultados[formato][nivel]['erro']}")
+                continue
+            df = ler_formato(spark, formato, info['path']).persist(storage_level)
+            try:
+                inicio = time.perf_counter()
+                df.count()
+                materializacao = time.perf_counter() - inicio
+                armazenamento = armazenamento_cache(spark)
+                medianas = {
+                    nome: executar_benchmark(lambda: query(df), warmup, trials)['total']['mediana']
+                    for nome, (_, query) in queries.items()
+                }
+            finally:
+                df.unpersist(blocking=True)
+            resultados[formato][nivel] = {
+                'materializacao_s': materializacao,
+                **armazenamento,
+                'queries': medianas,
+                'custo_s': sum(medianas.values()),
+            }
+            print(f"  {nivel:<20} materialização {materializacao:.2f}s | "
+                  f"memória {armazenamento['memoria_bytes'] / 1024**2:.1f} MB, "
+                  f"disco {armazenamento['disco_bytes'] / 1024**2:.1f} MB | "
+                  f"consultas {sum(medianas.values()):.3f}s")
+    
+    # Ganho sobre o próprio formato em disco e sobre o formato mais rápido em disco
+    melhor_disco = min(resultados, key=lambda f: resultados[f]['disco']['custo_s'])
+    custo_melhor_disco = resultados[melhor_disco]['disco']['custo_s']
+    for formato, por_nivel in resultados.items():
+        for nivel, r in por_nivel.items():
+            if 'erro' in r:
+                continue
+            r['ganho_disco'] = por_nivel['disco']['custo_s'] / r['custo_s']
+            r['ganho_melhor_disco'] = custo_melhor_disco / r['custo_s']
+    
+    print()
+    print(f"CACHE x DISCO (consultas = soma das medianas; melhor formato em disco: {melhor_disco}):")
+    print("-" * 80)
+    print(f"{'Formato':<9} {'Nível':<20} {'Mater. (s)':>10} {'Mem. MB':>8} {'Disco MB':>9} "
+          f"{'Consultas':>9} {'vs disco':>8} {'vs melhor':>9}")
+    print("-" * 80)
+    for formato, por_nivel in resultados.items():
+        for nivel, r in por_nivel.items():
+            if 'erro' in r:
+                print(f"{formato:<9} {nivel:<20} {'-':>10} {'-':>8} {'-':>9} {'-':>9} {'-':>8} {'-':>9}")
+                continue
+            materializacao = f"{r['materializacao_s']:.2f}" if 'materializacao_s' in r else "-"
+            memoria = f"{r['memoria_bytes'] / 1024**2:.1f}" if 'memoria_bytes' in r else "-"
+            em_disco = f"{r['disco_bytes'] / 1024**2:.1f}" if 'disco_bytes' in r else "-"
+            print(f"{formato:<9} {nivel:<20} {materializacao:>10} {memoria:>8} {em_disco:>9} "
+                  f"{r['custo_s']:>9.3f} {r['ganho_disco']:>7.2f}x {r['ganho_melhor_disco']:>8.2f}x")
+    print("(ganho > 1: o cache responde mais rápido que a leitura dos arquivos)")
+    print()
+    
+    with open(CACHE_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'queries': list(queries), 'melhor_disco': melhor_disco, 'formatos': resultados},
+                  f, indent=2, ensure_ascii=False)
+    print(f"✓ Benchmark de cache salvo em: {CACHE_PATH}")
+    print()
+    return resultados
+
+
+def manter_rollups(spark, fonte=ROLLUP_FONTE, definicoes=ROLLUP_DEFINICOES):
+    """
+    Constrói ou atualiza incrementalmente os rollups a partir dos arquivos
+    de `fonte` em DATA_DIR. Retorna o resumo da atualização com o tempo gasto.
+    """
+    inicio = time.perf_counter()
+    resumo = atualizar_rollups(spark, DATA_DIR / ESCRITORES[fonte][0], fonte, ROLLUP_DIR, definicoes)
+    resumo['tempo_s'] = time.perf_counter() - inicio
+    if resumo['reconstrucao']:
+        print(f"✓ Rollups reconstruídos ({resumo['motivo']}): {resumo['arquivos_novos']} arquivos "
+              f"de {fonte}, {resumo['bytes_novos'] / 1024**2:.1f} MB em {resumo['tempo_s']:.2f}s")
+    elif resumo['arquivos_novos']:
+        particoes = ", ".join(f"{nome}: {n}" for nome, n in resumo['particoes'].items())
+        print(f"✓ Rollups atualizados: {resumo['arquivos_novos']} arquivos novos "
+              f"({resumo['bytes_novos'] / 1024**2:.1f} MB), meses reescritos {particoes}, "
+              f"em {resumo['tempo_s']:.2f}s")
+    else:
+        print(f"✓ Rollups em dia com {fonte} (nenhum arquivo novo)")
+    print()
+    return resumo
+
+
+def comparar_rollups(spark, formatos_info, consultas=ROLLUP_CONSULTAS, fonte=ROLLUP_FONTE,
+                     definicoes=ROLLUP_DEFINICOES, warmup=BENCHMARK_WARMUP, trials=BENCHMARK_TRIALS):
+    """
+    Latência de cada consulta de painel nos dados brutos (cada formato de
+    `formatos_info`) e respondida pelo rollup escolhido, com a conferência
+    dos resultados (rollup x `fonte` bruto) e o custo de armazenamento dos
+    rollups em relação aos arquivos brutos.
+    """
+    print("=" * 80)
+    print("ROLLUPS x DADOS BRUTOS")
+    print("=" * 80)
+    tamanhos = tamanho_rollups(ROLLUP_DIR, definicoes)
+    
+    resultados = {}
+    for nome, (descricao, consulta) in consultas.items():
+        brutos = {
+            formato: executar_benchmark(
+                lambda: consultar_bruto(ler_formato(spark, formato, info['path']), consulta),
+                warmup, trials)['total']['mediana']
+            for formato, info in formatos_info.items()
+        }
+        ler_fonte = lambda: ler_formato(spark, fonte, formatos_info[fonte]['path'])
+        df, rollup = responder(spark, consulta, ROLLUP_DIR, definicoes, ler_fonte, tamanhos)
+        medida = executar_benchmark(
+            lambda: responder(spark, consulta, ROLLUP_DIR, definicoes, ler_fonte, tamanhos)[0],
+            warmup, trials)['total']['mediana']
+        conferido = mesmos_resultados(df.collect(), consultar_bruto(ler_fonte(), consulta).collect(),
+                                      aproximadas=colunas_aproximadas(consulta))
+        melhor = min(brutos, key=brutos.get)
+        resultados[nome] = {
+            'descricao': descricao,
+            'rollup': rollup,
+            'brutos_s': brutos,
+            'melhor_bruto': melhor,
+            'rollup_s': medida,
+            'ganho': brutos[melhor] / medida,
+            'conferido': conferido,
+        }
+        print(f"  {nome:<24} {rollup or 'bruto':<16} {medida:.3f}s "
+              f"(bruto {melhor} {brutos[melhor]:.3f}s) {'✓' if conferido else '❌ resultados diferentes'}")
+    
+    bytes_fonte = formatos_info[fonte]['size']
+    armazenamento = {
+        nome: dict(t, linhas=spark.read.parquet(str(ROLLUP_DIR / nome)).count() if t['arquivos'] else 0,
+                   fracao_fonte=t['bytes'] / bytes_fonte)
+        for nome, t in tamanhos.items()
+    }
+    
+    print()
+    print(f"LATÊNCIA (mediana de {trials} rodadas; ganho sobre o formato bruto mais rápido):")
+    print("-" * 80)
+    print(f"{'Consulta':<24} {'Rollup':<16} " + " ".join(f"{f:>8}" for f in formatos_info)
+          + f" {'Rollup':>8} {'Ganho':>7}")
+    print("-" * 80)
+    for nome, r in resultados.items():
+        print(f"{nome:<24} {(r['rollup'] or '- (bruto)'):<16} "
+              + " ".join(f"{r['brutos_s'][f]:>8.3f}" for f in formatos_info)
+              + f" {r['rollup_s']:>8.3f} {r['ganho']:>6.1f}x")
+    print("(rollup '- (bruto)': nenhum rollup elegível, consulta executada nos arquivos brutos)")
+    print(f"(medidas distinct_aprox são estimativas HLL: conferidas com tolerância de {TOLERANCIA_HLL:.0%})")
+    print()
+    
+    print(f"ARMAZENAMENTO DOS ROLLUPS (fonte: {fonte}, {bytes_fonte / 1024**2:.2f} MB):")
+    print("-" * 80)
+    print(f"{'Rollup':<18} {'Linhas':>12} {'Arquivos':>9} {'Tamanho (MB)':>13} {'% da fonte':>11}")
+    print("-" * 80)
+    for nome, a in armazenamento.items():
+        print(f"{nome:<18} {a['linhas']:>12,} {a['arquivos']:>9} {a['bytes'] / 1024**2:>13.2f} "
+              f"{a['fracao_fonte'] * 100:>10.1f}%")
+    total = sum(a['bytes'] for a in armazenamento.values())
+    print(f"{'Total':<18} {'':>12} {'':>9} {total / 1024**2:>13.2f} {total / bytes_fonte * 100:>10.1f}%")
+    print()
+    if not all(r['conferido'] for r in resultados.values()):
+        print("⚠ Há consultas em que o rollup diverge dos dados brutos (rollups desatualizados?)")
+        print()
+    
+    with open(ROLLUP_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'fonte': fonte, 'definicoes': definicoes,
+                   'consultas': {nome: c for nome, (_, c) in consultas.items()},
+                   'resultados': resultados, 'armazenamento': armazenamento},
+                  f, indent=2, ensure_ascii=False, default=str)
+    print(f"✓ Benchmark de rollups salvo em: {ROLLUP_PATH}")
+    print()
+    return resultados, armazenamento
+
+
+def comparar_esquema_compacto(spark, df, formatos_info, variantes=COMPACT_VALOR, queries=QUERIES,
+                              warmup=BENCHMARK_WARMUP, trials=BENCHMARK_TRIALS):
+    """
+    Grava o dataset no esquema físico compacto (uma variante por tipo de
+    value) em cada formato de `formatos_info` e compara com o esquema atual.
+
+    Por formato e variante: tamanho, varredura completa dos arquivos como
+    estão (esquema físico) e expandida para o esquema original (inclui a
+    decodificação e as derivadas), soma das medianas das `queries` sobre a
+    leitura expandida, e a conferência das linhas expandidas com as
+    originais (hash de todas as colunas).
+    """
+    print("=" * 80)
+    print("ESQUEMA FÍSICO COMPACTO x ESQUEMA ATUAL")
+    print("=" * 80)
+    
+    df, _ = materializar(df, WRITE_STORAGE_LEVEL)
+    try:
+        plano = planejar_esquema(df, COMPACT_CATEGORICAS, EXPRESSOES_DERIVADAS, COMPACT_INTEIROS)
+        print(f"Derivadas removidas: {', '.join(plano['derivadas']) or '-'}")
+        print("Dicionários: " + ", ".join(f"{c} ({len(v)} valores)" for c, v in plano['dicionarios'].items()))
+        print("Inteiros: " + ", ".join(f"{c} -> {t}" for c, t in plano['estreitadas'].items()))
+        
+        resultados = {}
+        for formato, info in formatos_info.items():
+            ler = lambda: ler_formato(spark, formato, info['path'])
+            resultados[formato] = {'atual': {
+                'bytes': info['size'],
+                'varredura_s': executar_benchmark(lambda: varredura_completa(ler()), warmup,
+                                                  trials)['total']['mediana'],
+                'queries_s': sum(executar_benchmark(lambda: query(ler()), warmup, trials)['total']['mediana']
+                                 for _, query in queries.values()),
+                'hash': varredura_completa(ler()).first()['h'],
+            }}
+        
+        esquemas = {}
+        for variante in variantes:
+            esquema = esquema_variante(df, plano, variante, COMPACT_ESCALA_VALOR)
+            compacto, _ = materializar(compactar(df, esquema), WRITE_STORAGE_LEVEL)
+            esquema['ddl_fisico'] = ddl_fisico(compacto)
+            esquemas[variante] = esquema
+            print(f"\nvalue como {variante} ({esquema['valor']['tipo'] or 'double'}, "
+                  f"{esquema['valor']['linhas_com_perda']:,} linhas com perda):")
+            try:
+                for formato in formatos_info:
+                    path = str(COMPACT_DIR / variante / ESCRITORES[formato][0])
+                    escrita = escrever_formato(compacto, formato, path, WRITE_LAYOUT)
+                    gravar_esquema(path, esquema)
+                    ler = lambda fisico=False: ler_formato_compacto(spark, formato, path, fisico)
+                    atual = resultados[formato]['atual']
+                    r = {
+                        'bytes': escrita['size'],
+                        'bytes_dicionarios': tamanho_dicionarios(esquema),
+                        'varredura_fisica_s': executar_benchmark(
+                            lambda: varredura_completa(ler(fisico=True)), warmup, trials)['total']['mediana'],
+                        'varredura_s': executar_benchmark(
+                            lambda: varredura_completa(ler()), warmup, trials)['total']['mediana'],
+                        'queries_s': sum(executar_benchmark(lambda: query(ler()), warmup,
+                                                            trials)['total']['mediana']
+                                         for _, query in queries.values()),
+                        'identico': varredura_completa(ler()).first()['h'] == atual['hash'],
+                    }
+                    r['reducao'] = 1 - (r['bytes'] + r['bytes_dicionarios']) / atual['bytes']
+                    r['ganho_varredura'] = atual['varredura_s'] / r['varredura_s']
+                    resultados[formato][variante] = r
+                    print(f"  {formato:<8} {r['bytes'] / 1024**2:8.2f} MB ({r['reducao'] * 100:+.1f}%) | "
+                          f"varredura {r['varredura_s']:.3f}s (física {r['varredura_fisica_s']:.3f}s) | "
+                          f"{'✓ idêntico' if r['identico'] else '⚠ difere do original'}")
+            finally:
+                compacto.unpersist()
+    finally:
+        df.unpersist()
+    
+    print()
+    print("TAMANHO E VARREDURA (redução inclui os dicionários; ganho = atual / compacto):")
+    print("-" * 80)
+    print(f"{'Formato':<8} {'Esquema':<8} {'MB':>8} {'Redução':>8} {'Física (s)':>10} {'Expand. (s)':>11} "
+          f"{'Ganho':>6} {'Queries (s)':>11} {'Idêntico':>8}")
+    print("-" * 80)
+    for formato, por_esquema in resultados.items():
+        for nome, r in por_esquema.items():
+            if nome == 'atual':
+                print(f"{formato:<8} {'atual':<8} {r['bytes'] / 1024**2:>8.2f} {'-':>8} {'-':>10} "
+                      f"{r['varredura_s']:>11.3f} {'-':>6} {r['queries_s']:>11.3f} {'-':>8}")
+                continue
+            print(f"{formato:<8} {nome:<8} {r['bytes'] / 1024**2:>8.2f} {r['reducao'] * 100:>7.1f}% "
+                  f"{r['varredura_fisica_s']:>10.3f} {r['varredura_s']:>11.3f} {r['ganho_varredura']:>5.2f}x "
+                  f"{r['queries_s']:>11.3f} {('sim' if r['identico'] else 'não'):>8}")
+    print("(Física: varredura dos códigos e tipos estreitados; Expand.: leitura no esquema original)")
+    print()
+    
+    with open(COMPACT_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'queries': list(queries), 'esquemas': esquemas, 'resultados': resultados},
+                  f, indent=2, ensure_ascii=False, default=str)
+    print(f"✓ Esquema compacto salvo em: {COMPACT_PATH}")
+    print()
+    return resultados
+
+
+def carregar_matriz_codecs():
+    """Última matriz de codecs medida (modo "codecs"), se existir."""
+    if not CODEC_MATRIX_PATH.exists():
+        return None
+    with open(CODEC_MATRIX_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def modo_completo(spark, args):
+    """Pipeline completo: dataset -> formatos -> performance -> relatório."""
+    # 2. Carregar ou gerar dataset
+    df = carregar_ou_gerar_dataset(spark)
+    
+    # 3. Salvar em múltiplos formatos
+    layout = dict(WRITE_LAYOUT)
+    if args.particionar:
+        layout['particoes_por'] = args.particionar
+    if args.clusterizar:
+        layout['clusterizacao'] = args.clusterizar
+    if args.bloom_fpp:
+        layout['bloom_filter'] = {'colunas': BLOOM_COLUNAS, 'fpp': args.bloom_fpp}
+    formatos_info = salvar_em_formatos(df, str(DATA_DIR), layout=layout, forcar=args.force)
+    if ROLLUP_AO_SALVAR:
+        manter_rollups(spark)
+    
+    # 4. Analisar performance (queries padrão + workload declarativo)
+    queries = dict(QUERIES)
+    if layout.get('particoes_por'):
+        queries.update(QUERIES_PARTICAO)
+    repeticoes, workload = None, None
+    if args.workload:
+        workload = carregar_workload(args.workload)
+        print(f"✓ Workload: {workload['nome']} ({workload['arquivo']})")
+        queries_workload, repeticoes = queries_do_workload(
+            spark, workload, BENCHMARK_WARMUP, BENCHMARK_TRIALS)
+        queries.update(queries_workload)
+    resultados = analisar_performance(spark, formatos_info, queries=queries, repeticoes=repeticoes,
+                                      motores=args.motores, leitura_lotes=args.leitura_lotes)
+    
+    # 5. Gerar relatório
+    ambiente = impressao_ambiente(
+        spark, {'hash': hash_origem(df), 'linhas': df.count()},
+        {'warmup': BENCHMARK_WARMUP, 'trials': BENCHMARK_TRIALS, 'codecs': WRITE_CODECS, 'layout': layout,
+         'queries': list(queries), 'workload': workload['arquivo'] if workload else None})
+    gerar_relatorio(resultados, formatos_info, carregar_matriz_codecs(), workload,
+                    sessao=getattr(args, 'sessao', None), ambiente=ambiente)
+
+
+def modo_layout(spark, args):
+    """Varredura de layout de arquivos (quantidade e tamanho dos arquivos)."""
+    df = carregar_ou_gerar_dataset(spark)
+    varrer_layouts(spark, df)
+
+
+def modo_codecs(spark, args):
+    """Matriz de codecs de compressão com recomendação por Pareto."""
+    df = carregar_ou_gerar_dataset(spark)
+    matriz = medir_matriz_codecs(spark, df)
+    recomendar_codecs(matriz)
+
+
+def modo_particoes(spark, args):
+    """Comparação de esquemas de particionamento e poda de partições."""
+    df = carregar_ou_gerar_dataset(spark)
+    esquemas = [args.particionar] if args.particionar else PARTITION_SCHEMES
+    comparar_particionamentos(spark, df, esquemas)
+
+
+def modo_clusterizacao(spark, args):
+    """Comparação de estratégias de clusterização (linear, Z-order, Hilbert)."""
+    df = carregar_ou_gerar_dataset(spark)
+    estrategias = [('nenhuma', [])] + [args.clusterizar] if args.clusterizar else CLUSTER_STRATEGIES
+    comparar_clusterizacoes(spark, df, estrategias)
+
+
+def modo_bloom(spark, args):
+    """Bloom filters em sensor_id e consultas pontuais."""
+    df = carregar_ou_gerar_dataset(spark)
+    comparar_bloom_filters(spark, df, fpp=args.bloom_fpp or BLOOM_FPP)
+
+
+def modo_escala(spark, args):
+    """Varredura de escala do pipeline (1M a 100M linhas) com curvas de vazão."""
+    varrer_escala(spark, args.tamanhos or SCALE_SWEEP_TAMANHOS)
+
+
+def modo_ciclo_vida(spark, args):
+    """Ciclo de vida Hot/Warm/Cold com migração incremental e roteamento."""
+    df = carregar_ou_gerar_dataset(spark)
+    comparar_ciclo_vida(spark, df)
+
+
+def modo_ingestao(spark, args):
+    """Ingestão contínua por micro-batches com latência e vazão."""
+    ingerir_streaming(spark, duracao_s=args.duracao or STREAMING_DURACAO_S,
+                      lotes_por_segundo=args.taxa or STREAMING_LOTES_POR_SEGUNDO)
+    if ROLLUP_AO_SALVAR and ROLLUP_FONTE in STREAMING_FORMATOS_DESTINO:
+        manter_rollups(spark)
+
+
+def modo_compactacao(spark, args):
+    """Compactação de arquivos pequenos com medida antes e depois."""
+    compactar_formatos(spark)
+
+
+def queries_com_workload(spark, args):
+    """Queries padrão mais as do workload declarativo (--workload), se houver."""
+    queries = dict(QUERIES)
+    if args.workload:
+        workload = carregar_workload(args.workload)
+        print(f"✓ Workload: {workload['nome']} ({workload['arquivo']})")
+        queries.update(queries_do_workload(spark, workload, BENCHMARK_WARMUP, BENCHMARK_TRIALS)[0])
+    return queries
+
+
+def modo_autoajuste(spark, args):
+    """Busca da configuração de sessão de menor custo por formato."""
+    df = carregar_ou_gerar_dataset(spark)
+    formatos_info = salvar_em_formatos(df, str(DATA_DIR), formatos=TUNING_FORMATOS)
+    ajustar_configuracoes(spark, formatos_info, queries_com_workload(spark, args), estrategia=args.busca)
+
+
+def modo_cache(spark, args):
+    """Workload sobre DataFrames em cache em cada nível de armazenamento."""
+    df = carregar_ou_gerar_dataset(spark)
+    formatos_info = salvar_em_formatos(df, str(DATA_DIR), formatos=CACHE_FORMATOS)
+    comparar_niveis_cache(spark, formatos_info, queries_com_workload(spark, args))
+
+
+def modo_rollups(spark, args):
+    """Rollups mantidos incrementalmente x consultas nos dados brutos."""
+    df = carregar_ou_gerar_dataset(spark)
+    formatos = list(dict.fromkeys(ROLLUP_FORMATOS_BRUTOS + [ROLLUP_FONTE]))
+    formatos_info = salvar_em_formatos(df, str(DATA_DIR), formatos=formatos, forcar=args.force)
+    manter_rollups(spark)
+    comparar_rollups(spark, formatos_info)
+
+
+def modo_esquema_compacto(spark, args):
+    """Esquema físico compacto x esquema atual, em todos os formatos."""
+    df = carregar_ou_gerar_dataset(spark)
+    formatos_info = salvar_em_formatos(df, str(DATA_DIR), formatos=COMPACT_FORMATOS, forcar=args.force)
+    comparar_esquema_compacto(spark, df, formatos_info, args.valor or COMPACT_VALOR)
+
+
+# Modo -> (descrição, função)
+MODOS = {
+    'completo': ("Pipeline completo de comparação de formatos", modo_completo),
+    'layout': ("Varredura de layout de arquivos (repartition x maxRecordsPerFile)", modo_layout),
+    'codecs': ("Matriz de codecs de compressão (tamanho x velocidade)", modo_codecs),
+    'particoes': ("Particionamento Hive-style e poda de partições", modo_particoes),
+    'clusterizacao': ("Clusterização (linear, Z-order, Hilbert) e blocos pulados", modo_clusterizacao),
+    'bloom': ("Bloom filters em sensor_id e consultas pontuais", modo_bloom),
+    'escala': ("Varredura de escala (1M a 100M linhas) e curvas de vazão", modo_escala),
+    'ciclo_vida': ("Camadas Hot/Warm/Cold, migração incremental e roteamento", modo_ciclo_vida),
+    'ingestao': ("Ingestão contínua (Structured Streaming) com latência e vazão", modo_ingestao),
+    'compactacao': ("Compactação de arquivos pequenos com troca atômica", modo_compactacao),
+    'autoajuste': ("Autoajuste de configurações do Spark (grade, aleatória, halving)", modo_autoajuste),
+    'cache': ("Cache em cada nível de armazenamento x leitura dos arquivos", modo_cache),
+    'rollups': ("Agregados materializados (rollups) x consultas nos dados brutos", modo_rollups),
+    'esquema_compacto': ("Esquema físico compacto (dicionários, tipos estreitos) x atual", modo_esquema_compacto),
+}
+
+
+# ============================================================================
+# SESSÃO QUENTE
+# ============================================================================
+
+def sondar_sessao(spark):
+    """Tempo de uma query-sonda fixa (gera, agrega e coleta) na sessão."""
+    inicio = time.perf_counter()
+    spark.range(SESSAO_SONDA_LINHAS).selectExpr("sum(id % 7) AS s", "count(DISTINCT id % 1000) AS d").collect()
+    return time.perf_counter() - inicio
+
+
+def medir_sessao(spark, tipo, partida_s):
+    """
+    Latência até a primeira medição nesta sessão: partida (processo até a
+    SparkSession pronta; zero numa sessão quente) mais a query-sonda.
+    Registra a medida no histórico (SESSAO_LATENCIAS_PATH).
+    """
+    sonda = sondar_sessao(spark)
+    medida = {
+        'sessao': tipo,
+        'instante': datetime.now().isoformat(timespec='seconds'),
+        'partida_s': partida_s,
+        'sonda_s': sonda,
+        'primeira_medicao_s': partida_s + sonda,
+    }
+    historico = carregar_latencias_sessao()
+    historico.append(medida)
+    with open(SESSAO_LATENCIAS_PATH, 'w', encoding='utf-8') as f:
+        json.dump(historico, f, indent=2, ensure_ascii=False)
+    print(f"✓ Sessão {tipo}: partida {partida_s:.2f}s, sonda {sonda:.3f}s")
+    print()
+    return medida
+
+
+def carregar_latencias_sessao():
+    """Histórico de medidas de sessão (lista vazia se não houver)."""
+    if not SESSAO_LATENCIAS_PATH.exists():
+        return []
+    with open(SESSAO_LATENCIAS_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def resumir_latencias_sessao(atual):
+    """Medida atual e medianas do histórico por tipo de sessão (fria/quente)."""
+    historico = {}
+    for medida in carregar_latencias_sessao():
+        historico.setdefault(medida['sessao'], []).append(medida)
+    return {
+        'atual': atual,
+        'historico': {
+            tipo: {
+                'execucoes': len(medidas),
+                **{chave: statistics.median(m[chave] for m in medidas)
+                   for chave in ('partida_s', 'sonda_s', 'primeira_medicao_s')},
+            }
+            for tipo, medidas in sorted(historico.items())
+        },
+    }
+
+
+def executar_modo(spark, args):
+    """Executa o modo de `args` na sessão informada. Retorna o código de saída."""
+    inicio = time.time()
+    try:
+        MODOS[args.modo][1](spark, args)
+        
+        tempo_total = time.time() - inicio
+        print("=" * 80)
+        print("EXECUÇÃO CONCLUÍDA COM SUCESSO!")
+        print(f"Tempo total: {tempo_total:.2f}s ({tempo_total/60:.1f} minutos)")
+        print("=" * 80)
+        return 0
+        
+    except Exception as e:
+        print(f"\n❌ ERRO: {str(e)}")
+        import traceback
+        traceback.print_exc(file=sys.stdout)
+        return 1
+
+
+def config_estatica_servidor():
+    """
+    Configurações estáticas da sessão quente: a união de
+    CONFIG_ESTATICA_MODO, para que cada modo rode no servidor com a mesma
+    sessão que teria a frio. Chaves com valores diferentes entre modos
+    ficam de fora (os modos que dependem delas são recusados pelo servidor).
+    """
+    configuracao, conflitantes = {}, set()
+    for config in CONFIG_ESTATICA_MODO.values():
+        for chave, valor in config.items():
+            if configuracao.setdefault(chave, valor) != valor:
+                conflitantes.add(chave)
+    return {k: v for k, v in configuracao.items() if k not in conflitantes}
+
+
+def servir_sessao(spark, configuracao):
+    """
+    Mantém a sessão aberta e atende execuções de clientes (`--remoto`).
+    Cada execução mede a sonda na sessão já aquecida e roda o modo pedido;
+    o cache é limpo entre execuções. Modos cuja configuração estática
+    (CONFIG_ESTATICA_MODO) difere da `configuracao` da sessão são recusados:
+    a medida não seria a mesma de uma execução a frio.
+    """
+    print(f"Aquecendo a sessão ({SESSAO_AQUECIMENTO} sondas)...")
+    for _ in range(SESSAO_AQUECIMENTO):
+        sondar_sessao(spark)
+    
+    def executar(argv):
+        try:
+            args = parse_args(argv)
+        except SystemExit as e:
+            return (e.code if isinstance(e.code, int) else 2), None
+        if args.servidor:
+            print("❌ ERRO: o servidor não aceita --servidor como execução")
+            return 2, None
+        divergentes = {k: v for k, v in CONFIG_ESTATICA_MODO.get(args.modo, {}).items()
+                       if configuracao.get(k) != v}
+        if divergentes:
+            print(f"❌ ERRO: o modo {args.modo} precisa de "
+                  + ", ".join(f"{k}={v}" for k, v in divergentes.items())
+                  + ", diferente da sessão quente: execute sem --remoto")
+            return 2, None
+        args.sessao = medir_sessao(spark, 'quente', 0.0)
+        try:
+            return executar_modo(spark, args), args.sessao
+        finally:
+            spark.catalog.clearCache()
+    
+    return servir(executar, SESSAO_ENDERECO, str(SESSAO_CHAVE_PATH))
+
+
+# ============================================================================
+# FUNÇÃO PRINCIPAL
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tema B - Otimização de Armazenamento e Consulta",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="Modos:\n" + "\n".join(f"  {m:<12} {d}" for m, (d, _) in MODOS.items())
+    )
+    parser.add_argument("modo", nargs="?", default="completo", choices=list(MODOS),
+                        help="Modo de execução (padrão: completo)")
+    parser.add_argument("--particionar", type=lambda v: [c.strip() for c in v.split(",") if c.strip()],
+                        metavar="COLUNAS",
+                        help="Particiona a escrita por colunas, ex.: city,sensor_type,dia "
+                             "(chaves derivadas: dia, mes)")
+    parser.add_argument("--clusterizar", type=lambda v: (v.split(":")[0], v.split(":")[1].split(",")),
+                        metavar="ESTRATEGIA:COLUNAS",
+                        help="Clusteriza a escrita antes de gravar, ex.: zorder:sensor_id,timestamp "
+                             "(estratégias: linear, zorder, hilbert)")
+    parser.add_argument("--bloom-fpp", type=float, metavar="FPP",
+                        help=f"Grava bloom filters em {', '.join(BLOOM_COLUNAS)} (Parquet/ORC) "
+                             f"com a taxa de falso positivo informada, ex.: {BLOOM_FPP}")
+    parser.add_argument("--tamanhos", type=lambda v: [int(n.replace("_", "")) for n in v.split(",") if n.strip()],
+                        metavar="N1,N2,...",
+                        help="Tamanhos (registros) do modo escala, ex.: 1000000,10000000")
+    parser.add_argument("--taxa", type=float, metavar="LOTES_S",
+                        help=f"Lotes por segundo do gerador no modo ingestao (padrão: {STREAMING_LOTES_POR_SEGUNDO})")
+    parser.add_argument("--duracao", type=float, metavar="SEGUNDOS",
+                        help=f"Duração da geração no modo ingestao (padrão: {STREAMING_DURACAO_S})")
+    parser.add_argument("--motores", default=",".join(BENCHMARK_MOTORES), metavar="M1,M2",
+                        type=lambda v: [m.strip() for m in v.split(",") if m.strip()],
+                        help=f"Motores de nó único comparados ao Spark no modo completo "
+                             f"(disponíveis: {', '.join(MOTORES)}; vazio desativa)")
+    parser.add_argument("--leitura-lotes", action="store_true",
+                        help="Mede no modo completo a leitura em lotes do pyarrow (tempo até o primeiro "
+                             "lote e pico de memória residente) de cada formato")
+    parser.add_argument("--busca", choices=ESTRATEGIAS, default=TUNING_ESTRATEGIA,
+                        help=f"Estratégia de busca do modo autoajuste (padrão: {TUNING_ESTRATEGIA})")
+    parser.add_argument("--valor", type=lambda v: [t.strip() for t in v.split(",") if t.strip()],
+                        metavar="T1,T2",
+                        help=f"Tipos de value medidos no modo esquema_compacto "
+                             f"(disponíveis: {', '.join(TIPOS_VALOR)}; padrão: todos)")
+    parser.add_argument("--force", action="store_true",
+                        help="Reescreve os formatos em DATA_DIR nos modos completo, rollups e "
+                             "esquema_compacto, ignorando os manifestos dos artefatos existentes")
+    parser.add_argument("--servidor", action="store_true",
+                        help="Sobe a sessão quente: mantém a SparkSession aberta e atende execuções "
+                             "enviadas com --remoto (o modo é ignorado)")
+    parser.add_argument("--remoto", action="store_true",
+                        help="Envia a execução para a sessão quente; sem servidor ativo, executa "
+                             "localmente (partida a frio)")
+    parser.add_argument("--parar-servidor", action="store_true",
+                        help="Encerra a sessão quente em execução")
+    parser.add_argument("--workload", default=str(WORKLOAD_PADRAO), metavar="ARQUIVO",
+                        help="Workload de queries (YAML/JSON) somado às queries padrão no modo completo "
+                             "(padrão: workloads/iot_padrao.yaml; vazio desativa)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Executa o modo selecionado (por padrão, o pipeline completo).
+    
+    Com --remoto a execução é enviada à sessão quente (--servidor), sem
+    pagar a partida da JVM e da SparkSession; sem servidor ativo, roda
+    localmente como partida a frio.
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = parse_args(argv)
+    inicio_total = time.time()
+    
+    if args.parar_servidor:
+        if enviar({'comando': 'parar'}, SESSAO_ENDERECO, str(SESSAO_CHAVE_PATH)) is None:
+            print("Nenhuma sessão quente em execução")
+        return 0
+    
+    if args.remoto:
+        resposta = enviar({'argv': [a for a in argv if a != "--remoto"]},
+                          SESSAO_ENDERECO, str(SESSAO_CHAVE_PATH))
+        if resposta is not None:
+            codigo, medida, ida_e_volta = resposta
+            if medida:
+                print(f"✓ Sessão quente: sonda {medida['sonda_s']:.3f}s | "
+                      f"ida e volta {ida_e_volta:.2f}s")
+            return codigo
+        print("⚠ Nenhuma sessão quente em execução: executando localmente (partida a frio)")
+        print()
+    
+    try:
+        # 1. Criar Spark Session
+        configuracao = config_estatica_servidor() if args.servidor else CONFIG_ESTATICA_MODO.get(args.modo)
+        spark = criar_spark_session(configuracao)
+        partida = time.time() - (inicio_processo() or inicio_total)
+    except Exception as e:
+        print(f"\n❌ ERRO: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    
+    try:
+        if args.servidor:
+            return servir_sessao(spark, configuracao)
+        args.sessao = medir_sessao(spark, 'fria', partida)
+        return executar_modo(spark, args)
+    finally:
+        spark.stop()
 
 
 if __name__ == "__main__":
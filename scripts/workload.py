@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+================================================================================
+WORKLOADS DECLARATIVOS DE CONSULTA - TEMA B
+================================================================================
+
+Carrega um workload de consultas descrito em YAML ou JSON (ver
+scripts/workloads/iot_padrao.yaml) e o converte no formato usado por
+`analisar_performance`: nome -> (descrição, função DataFrame -> DataFrame).
+
+Cada query do workload pode ser escrita:
+- em SQL, sobre a view `leituras` (o dataset lido no formato avaliado) e
+  sobre as tabelas de dimensão declaradas no próprio workload
+- como DataFrame, pelo nome de uma função registrada em FUNCOES_DATAFRAME
+
+Parâmetros geram variantes da query (lista de combinações ou produto
+cartesiano de um dict de listas), e cada query pode definir o próprio
+número de rodadas de aquecimento e medidas.
+
+Arquivos YAML exigem PyYAML; JSON não tem dependências.
+
+================================================================================
+"""
+
+import itertools
+import json
+from pathlib import Path
+
+from pyspark.sql import Window
+from pyspark.sql.functions import col, count, row_number
+
+
+VIEW_LEITURAS = "leituras"
+EXTENSOES_YAML = ('.yaml', '.yml')
+
+
+# ============================================================================
+# QUERIES EM DATAFRAME
+# ============================================================================
+
+# Nome -> função (df, **parametros) -> DataFrame
+FUNCOES_DATAFRAME = {}
+
+
+def registrar(nome):
+    """Decorador que registra uma query DataFrame para uso nos workloads."""
+    def decorador(funcao):
+        FUNCOES_DATAFRAME[nome] = funcao
+        return funcao
+    return decorador
+
+
+@registrar("top_n_por_sensor")
+def top_n_por_sensor(df, n=3, sensor_type=None):
+    """As `n` maiores leituras de cada sensor (opcionalmente de um tipo)."""
+    if sensor_type:
+        df = df.filter(col("sensor_type") == sensor_type)
+    janela = Window.partitionBy("sensor_id").orderBy(col("value").desc())
+    return df.withColumn("_posicao", row_number().over(janela)) \
+        .filter(col("_posicao") <= n) \
+        .select("sensor_id", "timestamp", "value", "_posicao")
+
+
+@registrar("anomalia_bateria")
+def anomalia_bateria(df, limite_bateria=20, limite_sinal=-80):
+    """Leituras com bateria baixa e sinal fraco, contadas por cidade e sensor."""
+    return df.filter((col("battery_level") <= limite_bateria)
+                     & (col("signal_strength") < limite_sinal)) \
+        .groupBy("city", "sensor_id") \
+        .agg(count("*").alias("leituras"))
+
+
+# ============================================================================
+# CARGA E VALIDAÇÃO
+# ============================================================================
+
+def carregar_workload(path):
+    """Lê e valida um arquivo de workload (.yaml, .yml ou .json)."""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix.lower() in EXTENSOES_YAML:
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError(f"PyYAML é necessário para ler {path.name} "
+                                   "(pip install pyyaml) — ou use um workload .json")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    validar_workload(spec, path)
+    spec.setdefault('nome', path.stem)
+    spec['arquivo'] = str(path)
+    return spec
+
+
+def validar_workload(spec, origem="workload"):
+    """Verifica a estrutura do workload; levanta ValueError com o problema."""
+    if not isinstance(spec, dict) or not spec.get('queries'):
+        raise ValueError(f"{origem}: o workload precisa de uma lista 'queries'")
+    for nome, dimensao in (spec.get('dimensoes') or {}).items():
+        if 'sql' not in dimensao:
+            raise ValueError(f"{origem}: dimensão '{nome}' sem 'sql'")
+    nomes = set()
+    for query in spec['queries']:
+        nome = query.get('nome')
+        if not nome:
+            raise ValueError(f"{origem}: query sem 'nome'")
+        if nome in nomes:
+            raise ValueError(f"{origem}: query '{nome}' duplicada")
+        nomes.add(nome)
+        if ('sql' in query) == ('dataframe' in query):
+            raise ValueError(f"{origem}: query '{nome}' deve ter 'sql' ou 'dataframe' (apenas um)")
+        if 'dataframe' in query and query['dataframe'] not in FUNCOES_DATAFRAME:
+            raise ValueError(f"{origem}: query '{nome}' usa função desconhecida "
+                             f"'{query['dataframe']}' (disponíveis: {', '.join(FUNCOES_DATAFRAME)})")
+
+
+def expandir_parametros(parametros):
+    """
+    Lista de combinações de parâmetros de uma query.
+
+    Aceita uma lista de dicts (combinações explícitas) ou um dict de listas
+    (produto cartesiano). Sem parâmetros, retorna uma única combinação vazia.
+    """
+    if not parametros:
+        return [{}]
+    if isinstance(parametros, list):
+        return [dict(p) for p in parametros]
+    chaves = list(parametros)
+    valores = [v if isinstance(v, list) else [v] for v in parametros.values()]
+    return [dict(zip(chaves, combinacao)) for combinacao in itertools.product(*valores)]
+
+
+def rotulo_variante(query, parametros):
+    """Rótulo de uma variante: o modelo `rotulo` da query, ou chave=valor."""
+    if query.get('rotulo'):
+        return query['rotulo'].format(**parametros)
+    return ",".join(f"{k}={v}" for k, v in parametros.items())
+
+
+def nome_variante(query, parametros, total):
+    """Nome de uma variante: o nome da query, com sufixo se houver várias."""
+    if total == 1 and not query.get('rotulo'):
+        return query['nome']
+    if query.get('rotulo'):
+        return f"{query['nome']}_{rotulo_variante(query, parametros)}"
+    return f"{query['nome']}[{rotulo_variante(query, parametros)}]"
+
+
+# ============================================================================
+# API
+# ============================================================================
+
+def criar_dimensoes(spark, spec):
+    """
+    Registra as tabelas de dimensão do workload como views temporárias.
+
+    As dimensões são materializadas em cache uma única vez, de modo que sua
+    geração não entra no tempo das queries medidas.
+    """
+    for nome, dimensao in (spec.get('dimensoes') or {}).items():
+        df = spark.sql(dimensao['sql']).cache()
+        df.count()
+        df.createOrReplaceTempView(nome)
+
+
+def _query_sql(sql):
+    """Função DataFrame -> DataFrame que executa `sql` sobre a view de leituras."""
+    def consulta(df):
+        df.createOrReplaceTempView(VIEW_LEITURAS)
+        return df.sparkSession.sql(sql)
+    return consulta
+
+
+def _query_dataframe(funcao, parametros):
+    return lambda df: funcao(df, **parametros)
+
+
+def queries_do_workload(spark, spec, warmup, trials):
+    """
+    Converte o workload em queries para `analisar_performance`.
+
+    Registra as dimensões e retorna (queries, repeticoes):
+    - queries: nome -> (descrição, função DataFrame -> DataFrame)
+    - repeticoes: nome -> (warmup, trials), com os padrões do workload e
+      de cada query sobrepostos aos valores informados
+    """
+    criar_dimensoes(spark, spec)
+    padrao = {'warmup': warmup, 'trials': trials, **(spec.get('repeticoes') or {})}
+
+    queries, repeticoes = {}, {}
+    for query in spec['queries']:
+        rodadas = {**padrao, **(query.get('repeticoes') or {})}
+        combinacoes = expandir_parametros(query.get('parametros'))
+        for parametros in combinacoes:
+            nome = nome_variante(query, parametros, len(combinacoes))
+            descricao = query.get('descricao', query['nome'])
+            if len(combinacoes) > 1 or query.get('rotulo'):
+                descricao = f"{descricao} ({rotulo_variante(query, parametros)})"
+            if 'sql' in query:
+                funcao = _query_sql(query['sql'].format(**parametros))
+            else:
+                funcao = _query_dataframe(FUNCOES_DATAFRAME[query['dataframe']], parametros)
+            queries[nome] = (descricao, funcao)
+            repeticoes[nome] = (rodadas['warmup'], rodadas['trials'])
+    return queries, repeticoes